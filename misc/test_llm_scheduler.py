@@ -0,0 +1,130 @@
+"""
+LLM Scheduler Check Script
+Run this to verify that calls queued behind the concurrency cap are still
+admitted when the request bucket runs dry, and that a call waiting on the rate
+limit sleeps instead of spinning (python misc/test_llm_scheduler.py)
+"""
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.ai.llm_scheduler import LLMScheduler, Priority, _Waiter  # noqa: E402
+
+CALLERS = 5
+TIMEOUT_SECONDS = 8.0
+# A lone call waiting ~1s for the bucket should wake a handful of times, not thousands.
+MAX_WAKEUPS = 5
+
+
+def make_scheduler() -> LLMScheduler:
+    # 60 requests per minute refills one request per second.
+    scheduler = LLMScheduler(
+        max_concurrency=2,
+        requests_per_minute=60,
+        tokens_per_minute=0,
+        max_retries=0,
+        retry_base_seconds=1.0,
+        retry_max_seconds=1.0,
+    )
+    scheduler._requests.level = 3  # drained: 3 calls now, then 1 per second
+    return scheduler
+
+
+def check_threads() -> int:
+    scheduler = make_scheduler()
+    finished = []
+
+    def call():
+        grant = scheduler.acquire(100, Priority.INTERACTIVE)
+        time.sleep(0.05)
+        scheduler.release(grant)
+        finished.append(1)
+
+    threads = [threading.Thread(target=call, daemon=True) for _ in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT_SECONDS)
+    return len(finished)
+
+
+async def check_asyncio() -> int:
+    scheduler = make_scheduler()
+
+    async def call():
+        grant = await scheduler.aacquire(100, Priority.INTERACTIVE)
+        await asyncio.sleep(0.05)
+        scheduler.release(grant)
+
+    done, _ = await asyncio.wait([asyncio.ensure_future(call()) for _ in range(CALLERS)], timeout=TIMEOUT_SECONDS)
+    return len(done)
+
+
+def count_wakeups(wait_name: str, run) -> int:
+    """Runs `run` with `_Waiter.<wait_name>` counting how often a waiter goes back to sleep."""
+    original = getattr(_Waiter, wait_name)
+    calls = []
+
+    def counted(self, timeout):
+        calls.append(timeout)
+        return original(self, timeout)
+
+    setattr(_Waiter, wait_name, counted)
+    try:
+        run()
+    finally:
+        setattr(_Waiter, wait_name, original)
+    return len(calls)
+
+
+def check_rate_limited_wait_threads() -> int:
+    scheduler = make_scheduler()
+    scheduler._requests.level = 0  # the next request is due in 1s
+
+    def call():
+        scheduler.release(scheduler.acquire(100, Priority.INTERACTIVE))
+
+    return count_wakeups("wait", call)
+
+
+def check_rate_limited_wait_asyncio() -> int:
+    scheduler = make_scheduler()
+    scheduler._requests.level = 0
+
+    async def call():
+        scheduler.release(await scheduler.aacquire(100, Priority.INTERACTIVE))
+
+    return count_wakeups("await_wake", lambda: asyncio.run(call()))
+
+
+def main():
+    print("=" * 60)
+    print("LLM SCHEDULER CHECK")
+    print("=" * 60)
+    failed = False
+    for name, run in (("acquire (threads)", check_threads), ("aacquire (asyncio)", lambda: asyncio.run(check_asyncio()))):
+        start = time.monotonic()
+        finished = run()
+        elapsed = time.monotonic() - start
+        ok = finished == CALLERS
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}: {finished}/{CALLERS} calls admitted in {elapsed:.1f}s")
+    for name, run in (
+        ("rate-limited acquire (threads)", check_rate_limited_wait_threads),
+        ("rate-limited aacquire (asyncio)", check_rate_limited_wait_asyncio),
+    ):
+        start = time.monotonic()
+        wakeups = run()
+        elapsed = time.monotonic() - start
+        ok = wakeups <= MAX_WAKEUPS
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}: {wakeups} wake-ups while waiting {elapsed:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from langchain_groq import ChatGroq
-from ..tools.vector_store import get_retriever  # Relative import remains the same
+from ..context import ContextAssembler
+from ..tools.vector_store import DocumentFilter, get_retriever  # Relative import remains the same
 from .shared import llm  # Relative import remains the same
 
 
@@ -26,20 +27,26 @@ ANSWER:
 prompt = ChatPromptTemplate.from_template(prompt_template)
 
 # 3. Get the retriever from our tool
-retriever = get_retriever()
+# Open-ended questions over the whole knowledge base: favour recall.
+# The coordinator sees every source type, narrowed to a region when one is named.
+DEFAULT_FILTER = DocumentFilter(infer_region=True)
+retriever = get_retriever(
+    agent_name="coordinator", k_results=15, ef_search=100, probes=10, doc_filter=DEFAULT_FILTER
+)
+
 
+# 4. Assemble the context: drop near-duplicates, pick a diverse subset (MMR) of
+# the 15 candidates and stay within the coordinator's token budget.
+format_docs = ContextAssembler("coordinator", max_tokens=1500, max_docs=6)
 
-# 4. Define a function to format the retrieved documents
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
 
+# The answer step on its own; the graph feeds it speculatively prefetched documents.
+answer_chain = prompt | llm | StrOutputParser()
 
 # 5. Build the RAG Chain using LangChain Expression Language (LCEL)
 rag_chain = (
     {"context": retriever | format_docs, "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
+    | answer_chain
 )
 
 # Example usage (for testing)
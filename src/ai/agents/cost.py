@@ -25,6 +25,11 @@ class _FallbackExecutor:
         response = self.llm.invoke(user_input)
         return {"output": response.content}
 
+    async def ainvoke(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        user_input = payload.get("input") or ""
+        response = await self.llm.ainvoke(user_input)
+        return {"output": response.content}
+
 
 def get_cost_agent_executor():
     """
@@ -0,0 +1,243 @@
+"""
+Local pre-router that resolves obvious queries without a Groq round trip.
+
+Two stages run before `llm_router_chain`:
+1. Pattern rules: a SKU or a UUID next to a clear intent keyword ("fuel cost for
+   shipment <uuid>") maps straight to an agent.
+2. A nearest-centroid classifier over the MiniLM sentence embeddings. Each agent
+   gets a centroid built from a handful of labelled example queries; the softmax
+   over cosine similarities is used as the confidence.
+
+`classify()` returns None when neither stage is confident enough, in which case
+the caller falls back to the LLM router.
+"""
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ...config import settings
+from ..entities import SKU_PATTERN, UUID_PATTERN
+from ..embeddings import embed_query_normalized, get_embedding_model, get_embeddings
+from .router import Agent
+
+COST_KEYWORDS = re.compile(r"\b(cost|fuel|price|expense|spend)\w*", re.IGNORECASE)
+TRACKING_KEYWORDS = re.compile(
+    r"\b(where|status|locat|track|eta|arriv|deliver|position)\w*", re.IGNORECASE
+)
+
+# Softmax temperature over cosine similarities. MiniLM similarities for related
+# sentences sit in a narrow band, so a low temperature is needed to separate them.
+_SOFTMAX_TEMPERATURE = 0.05
+
+# Labelled examples used to build the per-agent centroids.
+EXAMPLE_QUERIES: Dict[Agent, List[str]] = {
+    Agent.TRACKING: [
+        "Where is my shipment right now?",
+        "What is the status of shipment 5c18fd31-8be8-4f42-92ac-85209d2f187f?",
+        "When will my package arrive?",
+        "Track the vehicle carrying my order.",
+        "What is the current location of the delivery truck?",
+        "Has my shipment been delivered yet?",
+        "Give me the ETA for this delivery.",
+    ],
+    Agent.WAREHOUSE: [
+        "How many units of PROD0001 are in stock?",
+        "What is the inventory level for this SKU?",
+        "Which warehouse has the most stock of this product?",
+        "Find the best box for items of 500 and 1200 cubic centimetres.",
+        "What packaging should I use for these items?",
+        "Are we running low on any products?",
+        "Check quantity on hand for PROD0042.",
+    ],
+    Agent.COST: [
+        "What is the fuel cost of this shipment?",
+        "How much will this delivery cost?",
+        "Calculate the transport expenses for shipment X.",
+        "What did we spend on fuel for this route?",
+        "Estimate the shipping price for this order.",
+        "How expensive is it to run this delivery with a diesel truck?",
+    ],
+    Agent.MOBILITY: [
+        "Is there traffic on the Delhi to Jaipur highway?",
+        "Are there any road closures on the route to Mumbai?",
+        "What is the fastest route to the Chennai hub?",
+        "Is there congestion near the Bangalore warehouse?",
+        "Are roads clear for deliveries this evening?",
+        "Suggest an alternative route avoiding the accident.",
+    ],
+    Agent.SUPPLIER: [
+        "Which suppliers have the shortest lead times?",
+        "What are the terms of our contract with the packaging vendor?",
+        "Who supplies raw materials in the south region?",
+        "How long does the vendor take to restock this item?",
+        "List suppliers with contracts expiring this quarter.",
+        "What is the lead time for materials from our supplier?",
+    ],
+    Agent.COORDINATOR: [
+        "What was the issue with yesterday's delayed deliveries?",
+        "Summarise recent incidents across our operations.",
+        "What is our policy on damaged goods?",
+        "Explain why deliveries in the west region are slow.",
+        "Give me an overview of logistics performance this week.",
+        "What should I do if a customer reports a missing package?",
+    ],
+}
+
+
+@dataclass
+class FastRouteDecision:
+    """The outcome of a local routing decision."""
+    agents: List[Agent]
+    confidence: float
+    method: str  # "pattern" or "centroid"
+
+
+class _CentroidClassifier:
+    """Nearest-centroid classifier over L2-normalized sentence embeddings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Optional[List[Agent]] = None
+        self._centroids: Optional[np.ndarray] = None
+
+    def _ensure_fitted(self):
+        if self._centroids is not None:
+            return
+        with self._lock:
+            if self._centroids is not None:
+                return
+            model = get_embedding_model()
+            labels, centroids = [], []
+            for agent, examples in EXAMPLE_QUERIES.items():
+                vectors = model.encode(examples, normalize_embeddings=True)
+                centroid = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+                centroids.append(centroid / np.linalg.norm(centroid))
+                labels.append(agent)
+            self._labels = labels
+            self._centroids = np.vstack(centroids)
+
+    def predict(self, query: str) -> FastRouteDecision:
+        return self.predict_many([query])[0]
+
+    def predict_many(self, queries: List[str]) -> List[FastRouteDecision]:
+        """Classifies several queries with a single batched `encode` call."""
+        self._ensure_fitted()
+        # Through the shared query cache: the response cache and the retrievers
+        # embed the same query, and `prime` keeps a batch to one `encode` call.
+        if len(queries) > 1:
+            get_embeddings().prime(queries)
+        vectors = np.vstack([embed_query_normalized(query) for query in queries])
+        similarities = vectors @ self._centroids.T
+        logits = (similarities - similarities.max(axis=1, keepdims=True)) / _SOFTMAX_TEMPERATURE
+        probabilities = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+        decisions = []
+        for row in probabilities:
+            best = int(np.argmax(row))
+            decisions.append(
+                FastRouteDecision(
+                    agents=[self._labels[best]],
+                    confidence=float(row[best]),
+                    method="centroid",
+                )
+            )
+        return decisions
+
+
+_classifier = _CentroidClassifier()
+
+
+def _match_patterns(query: str) -> Optional[FastRouteDecision]:
+    """Deterministic rules for queries that carry an ID plus an unambiguous intent."""
+    has_uuid = bool(UUID_PATTERN.search(query))
+    has_sku = bool(SKU_PATTERN.search(query))
+    wants_cost = bool(COST_KEYWORDS.search(query))
+    wants_tracking = bool(TRACKING_KEYWORDS.search(query))
+
+    if has_sku and not wants_cost:
+        return FastRouteDecision(agents=[Agent.WAREHOUSE], confidence=1.0, method="pattern")
+    if has_uuid and wants_cost and wants_tracking:
+        # Compound question ("status and fuel cost of shipment X"): fan out to both.
+        return FastRouteDecision(agents=[Agent.TRACKING, Agent.COST], confidence=1.0, method="pattern")
+    if has_uuid and wants_cost:
+        return FastRouteDecision(agents=[Agent.COST], confidence=1.0, method="pattern")
+    if has_uuid and wants_tracking:
+        return FastRouteDecision(agents=[Agent.TRACKING], confidence=1.0, method="pattern")
+    return None
+
+
+def classify(query: str, threshold: Optional[float] = None) -> Optional[FastRouteDecision]:
+    """
+    Tries to route a query locally. Returns None when the caller should fall back
+    to the LLM router.
+    """
+    return classify_many([query], threshold)[0]
+
+
+def classify_many(
+    queries: List[str], threshold: Optional[float] = None
+) -> List[Optional[FastRouteDecision]]:
+    """
+    Batched `classify`: pattern rules per query, then one embedding batch for the
+    queries the rules did not resolve.
+    """
+    if not settings.ROUTER_FAST_PATH_ENABLED:
+        return [None] * len(queries)
+    threshold = settings.ROUTER_CONFIDENCE_THRESHOLD if threshold is None else threshold
+
+    decisions = [_match_patterns(query) for query in queries]
+    pending = [index for index, decision in enumerate(decisions) if decision is None]
+    if not pending:
+        return decisions
+
+    try:
+        predictions = _classifier.predict_many([queries[index] for index in pending])
+    except Exception as exc:
+        print(f"[warning] local router classifier failed, falling back to LLM: {exc}")
+        return decisions
+    for index, prediction in zip(pending, predictions):
+        if prediction.confidence >= threshold:
+            decisions[index] = prediction
+    return decisions
+
+
+# --- Routing statistics ---
+
+class RouterStats:
+    """Thread-safe counters and recent latencies for fast-path vs LLM routing."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._counts = {"fast_path": 0, "llm": 0}
+        self._latencies = {"fast_path": deque(maxlen=window), "llm": deque(maxlen=window)}
+
+    def record(self, path: str, elapsed_seconds: float):
+        with self._lock:
+            self._counts[path] += 1
+            self._latencies[path].append(elapsed_seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = {path: list(values) for path, values in self._latencies.items()}
+        total = sum(counts.values())
+        p50 = {
+            path: round(float(np.median(values)) * 1000, 2) if values else None
+            for path, values in latencies.items()
+        }
+        saved = None
+        if p50["fast_path"] is not None and p50["llm"] is not None:
+            saved = round(p50["llm"] - p50["fast_path"], 2)
+        return {
+            "fast_path_queries": counts["fast_path"],
+            "llm_routed_queries": counts["llm"],
+            "fast_path_ratio": round(counts["fast_path"] / total, 3) if total else 0.0,
+            "p50_latency_ms": p50,
+            "p50_latency_saved_ms": saved,
+        }
+
+
+router_stats = RouterStats()
@@ -1,7 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from ..tools.vector_store import get_retriever  # Relative import remains the same
+from ..context import ContextAssembler
+from ..tools.vector_store import DocumentFilter, get_retriever  # Relative import remains the same
 from .shared import llm  # Relative import remains the same
 
 # A more specific prompt for the Mobility Agent
@@ -20,17 +21,25 @@ ANALYSIS:
 """
 prompt = ChatPromptTemplate.from_template(prompt_template)
 
-retriever = get_retriever()
+# Route checks only care about incident reports and shipment records.
+DEFAULT_FILTER = DocumentFilter(source_types=("incident_report", "shipment"), infer_region=True)
 
+# Route checks are latency-sensitive and only need the few closest incidents.
+retriever = get_retriever(
+    agent_name="mobility", k_results=10, ef_search=40, probes=4, doc_filter=DEFAULT_FILTER
+)
+
+
+# Repeated reports of the same incident are collapsed; a route check needs a
+# handful of distinct incidents, not ten copies of one.
+format_docs = ContextAssembler("mobility", max_tokens=600, max_docs=4)
 
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
 
+# The answer step on its own; the graph feeds it speculatively prefetched documents.
+answer_chain = prompt | llm | StrOutputParser()
 
 # Define the specific chain for this agent
 mobility_rag_chain = (
     {"context": retriever | format_docs, "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
+    | answer_chain
 )
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import List
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from .shared import llm
@@ -15,15 +16,20 @@ class Agent(str, Enum):
 # 2. Create a Pydantic model for the LLM's output
 # This forces the LLM to give us a clean, predictable response.
 class RouterChoice(BaseModel):
-    """The choice of the next agent to route the user's query to."""
-    agent_name: Agent = Field(
+    """The choice of the agents to route the user's query to."""
+    agent_names: List[Agent] = Field(
         ...,
-        description="The name of the agent that is best suited to handle the user's query."
+        description=(
+            "The agents best suited to handle the user's query. Usually a single agent; "
+            "list several only when the query asks for distinct pieces of information "
+            "that different agents own."
+        ),
     )
 
 # 3. Create the prompt template
 # This is where we describe the agents to the LLM so it can make an informed choice.
-prompt_template = """
+# The description is shared by the single-query and batch router prompts.
+agent_descriptions = """
 You are an expert dispatcher for a logistics AI system called LogiMAS. Your job is to analyze a user's query and route it to the most appropriate specialized agent.
 
 Here are the available agents and their capabilities:
@@ -35,7 +41,12 @@ Here are the available agents and their capabilities:
 - **mobility**: Use this for questions about traffic conditions, road closures, congestion, or route optimization.
 - **supplier**: Use this for questions about suppliers, vendors, contracts, or material lead times.
 
-Based on the user's query below, choose the single best agent to handle the request.
+If a query asks for several distinct things owned by different agents (e.g. "what's the status and fuel cost of shipment X" needs both tracking and cost), choose each of those agents; they will run in parallel.
+Do not add agents that are not needed.
+"""
+
+prompt_template = agent_descriptions + """
+Based on the user's query below, choose the best agent to handle the request.
 
 Query:
 {query}
@@ -46,4 +57,30 @@ prompt = ChatPromptTemplate.from_template(prompt_template)
 # 4. Create the LLM router chain
 # We chain the prompt to the LLM and tell the LLM to structure its output
 # according to our RouterChoice model.
-llm_router_chain = prompt | llm.with_structured_output(RouterChoice)
\ No newline at end of file
+llm_router_chain = prompt | llm.with_structured_output(RouterChoice)
+
+
+# 5. Batch routing
+# Routes many queries with one structured LLM call, used by the batch endpoint.
+class BatchRoute(BaseModel):
+    """The routing decision for one numbered query."""
+    index: int = Field(..., description="The number of the query, as given in the list.")
+    agent_names: List[Agent] = Field(..., description="The agents best suited to handle this query.")
+
+
+class BatchRouterChoice(BaseModel):
+    """Routing decisions for a numbered list of queries."""
+    routes: List[BatchRoute] = Field(..., description="One entry per query in the list.")
+
+
+batch_prompt_template = agent_descriptions + """
+Below is a numbered list of independent user queries. For every query, choose the agents that should handle it.
+Return exactly one entry per query, using the query's number as its index.
+
+Queries:
+{queries}
+"""
+
+batch_prompt = ChatPromptTemplate.from_template(batch_prompt_template)
+
+llm_batch_router_chain = batch_prompt | llm.with_structured_output(BatchRouterChoice)
@@ -6,12 +6,21 @@ import os
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
 from ...config import settings  # Adjusted to use project's config.py
+from ...metrics import LLMLatencyCallback
+from ..llm_scheduler import ScheduledChatModelMixin
 
 # Load .env if not already loaded (though project's config.py handles most env vars)
 load_dotenv()
 
-llm = ChatGroq(
+
+class ScheduledChatGroq(ScheduledChatModelMixin, ChatGroq):
+    """ChatGroq whose calls are admitted by the priority scheduler in `llm_scheduler`."""
+
+
+llm = ScheduledChatGroq(
     model="llama-3.3-70b-versatile",  # Common model from your code patterns; adjust if different
     api_key=settings.GROQ_API_KEY,  # Use from config
     temperature=0.0,  # Default for deterministic responses; adjust as needed
+    callbacks=[LLMLatencyCallback()],  # Per-node LLM latency histograms
+    max_retries=0,  # 429s are retried by the scheduler, which also pauses other calls
 )
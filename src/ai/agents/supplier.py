@@ -1,7 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from ..tools.vector_store import get_retriever  # Relative import remains the same
+from ..context import ContextAssembler
+from ..tools.vector_store import DocumentFilter, get_retriever  # Relative import remains the same
 from .shared import llm  # Relative import remains the same
 
 # A prompt specifically for supplier-related queries
@@ -20,17 +21,24 @@ ANSWER:
 """
 prompt = ChatPromptTemplate.from_template(prompt_template)
 
-retriever = get_retriever()
+# Supplier answers come from policies and FAQs, never incident reports.
+DEFAULT_FILTER = DocumentFilter(source_types=("faq", "policy"), infer_region=True)
 
+# Contract lookups need the right clause more than speed.
+retriever = get_retriever(
+    agent_name="supplier", k_results=12, ef_search=80, probes=8, doc_filter=DEFAULT_FILTER
+)
+
+
+# Contract clauses can be long, so the budget is larger than the mobility chain's.
+format_docs = ContextAssembler("supplier", max_tokens=1200, max_docs=5)
 
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
 
+# The answer step on its own; the graph feeds it speculatively prefetched documents.
+answer_chain = prompt | llm | StrOutputParser()
 
 # Define the specific chain for this agent
 supplier_rag_chain = (
     {"context": retriever | format_docs, "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
+    | answer_chain
 )
@@ -0,0 +1,307 @@
+"""
+Deterministic tool calls for ID-bearing tracking, cost and inventory queries.
+
+For "where is shipment <uuid>?" the tracking `AgentExecutor` spends one Groq call
+deciding which tool to call and another to phrase the answer. When a query names
+the IDs or SKUs and asks one of the common questions, this module calls the
+tools directly and answers from a template, or from a single summarizing LLM
+call when `TOOL_FAST_PATH_SUMMARIZE` is on.
+
+`arun()` returns None for anything open-ended (why / compare / suggest ...),
+for queries it cannot map to a tool, and for tools this module does not cover
+(orders, packaging); the caller then runs the full agent loop. It also hands
+over when every tool call failed or found nothing, since the IDs may have been
+misread and the agent can still work out what the user meant.
+"""
+import asyncio
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from ...config import settings
+from ...metrics import TOOL_FAST_PATH_QUERIES
+from ..entities import SKU_PATTERN, UUID_PATTERN, normalize_entity
+from ..tools.database import (
+    calculate_route_fuel_cost,
+    get_bulk_shipment_tracking,
+    get_inventory_level,
+    get_shipment_tracking,
+    get_vehicle_location,
+)
+from .fast_router import COST_KEYWORDS, TRACKING_KEYWORDS
+
+# More IDs than this in one query is a report, not a lookup.
+MAX_ENTITIES = 3
+
+OPEN_ENDED = re.compile(
+    r"\b(why|how come|explain|compare|should|recommend|suggest|could|would|what if|"
+    r"reason|optimi[sz]|reduce|cheaper|alternative|improve|predict|forecast|trend)\w*",
+    re.IGNORECASE,
+)
+LOCATION_KEYWORDS = re.compile(r"\b(where|locat|position|gps|coordinat|speed|moving)\w*", re.IGNORECASE)
+VEHICLE_KEYWORDS = re.compile(r"\b(vehicle|truck|van|driver)s?\b", re.IGNORECASE)
+# Not "delivery": "the delivery truck <id>" is about a vehicle.
+SHIPMENT_KEYWORDS = re.compile(r"\b(shipment|consignment|parcel|package)s?\b", re.IGNORECASE)
+ORDER_KEYWORDS = re.compile(r"\borders?\b", re.IGNORECASE)
+INVENTORY_KEYWORDS = re.compile(
+    r"\b(stock|inventor|units?|how many|quantit|availab|on hand|level|left)\w*", re.IGNORECASE
+)
+PACKAGING_KEYWORDS = re.compile(r"\b(box|pack|carton|volume)\w*", re.IGNORECASE)
+
+SUMMARY_PROMPT = """You are a LogiMAS {agent_name} assistant. Answer the user's question in one or two sentences using only the tool results below. If a result contains an error, say the data could not be retrieved.
+
+Question: {query}
+
+Tool results:
+{results}"""
+
+
+@dataclass
+class ToolCall:
+    """One direct tool invocation and its result."""
+    tool_name: str
+    func: Callable[..., dict]
+    kwargs: Dict[str, Any]
+    result: Optional[dict] = None
+
+
+@dataclass
+class FastPathPlan:
+    """The tool calls for a query plus the template that phrases their results."""
+    agent_name: str
+    calls: List[ToolCall]
+    render: Callable[[List[ToolCall]], str]
+
+
+def _ids(query: str) -> List[str]:
+    return list(dict.fromkeys(normalize_entity(value) for value in UUID_PATTERN.findall(query)))
+
+
+def _skus(query: str) -> List[str]:
+    return list(dict.fromkeys(normalize_entity(value) for value in SKU_PATTERN.findall(query)))
+
+
+def _error(call: ToolCall) -> Optional[str]:
+    if not isinstance(call.result, dict):
+        return "no data returned"
+    return call.result.get("error")
+
+
+def _found_nothing(call: ToolCall) -> bool:
+    if _error(call):
+        return True
+    return call.tool_name == "bulk-shipment-tracking-lookup" and not call.result.get("shipments")
+
+
+# --- Templates ---
+
+def _render_position(vehicle_id, telemetry: dict) -> str:
+    line = (
+        f"Vehicle {vehicle_id} was last reported at ({telemetry.get('lat')}, {telemetry.get('lon')}), "
+        f"travelling at {telemetry.get('speed_kmph')} km/h"
+    )
+    if telemetry.get("fuel_pct") is not None:
+        line += f" with {telemetry['fuel_pct']}% fuel"
+    return line + f" (as of {telemetry.get('ts')})."
+
+
+def _render_shipment(shipment_id: str, data: dict) -> List[str]:
+    line = f"Shipment {shipment_id} is {data.get('status')}"
+    if data.get("current_eta"):
+        line += f", with an estimated arrival of {data['current_eta']}"
+    if data.get("vehicle_id"):
+        line += f". It is assigned to vehicle {data['vehicle_id']}"
+    lines = [line + "."]
+    if data.get("latest_telemetry"):
+        lines.append(_render_position(data["vehicle_id"], data["latest_telemetry"]))
+    return lines
+
+
+def _render_tracking(calls: List[ToolCall]) -> str:
+    lines = []
+    for call in calls:
+        error = _error(call)
+        if call.tool_name == "vehicle-location-lookup":
+            vehicle_id = call.kwargs["vehicle_id"]
+            if error:
+                lines.append(f"I could not retrieve the location of vehicle {vehicle_id}: {error}")
+            else:
+                lines.append(_render_position(vehicle_id, call.result))
+        elif call.tool_name == "shipment-tracking-lookup":
+            shipment_id = call.kwargs["shipment_id"]
+            if error:
+                lines.append(f"I could not retrieve shipment {shipment_id}: {error}")
+            else:
+                lines.extend(_render_shipment(shipment_id, call.result))
+        elif error:
+            lines.append(f"I could not retrieve these shipments: {error}")
+        else:
+            for record in call.result.get("shipments", []):
+                lines.extend(_render_shipment(record.get("shipment_id"), record))
+            for shipment_id in call.result.get("not_found", []):
+                lines.append(f"I could not retrieve shipment {shipment_id}: Shipment not found.")
+    return " ".join(lines)
+
+
+def _render_cost(calls: List[ToolCall]) -> str:
+    lines = []
+    for call in calls:
+        shipment_id = call.kwargs["shipment_id"]
+        error = _error(call)
+        if error:
+            lines.append(f"I could not calculate the fuel cost for shipment {shipment_id}: {error}")
+            continue
+        data = call.result
+        unit = "kWh" if "total_fuel_kWh" in data else "liters"
+        lines.append(
+            f"The estimated fuel cost for shipment {shipment_id} is {data.get('estimated_fuel_cost')}: "
+            f"{data.get('distance_km')} km on {data.get('fuel_type')}, using about "
+            f"{data.get(f'total_fuel_{unit}')} {unit}."
+        )
+    return " ".join(lines)
+
+
+def _render_inventory(calls: List[ToolCall]) -> str:
+    lines = []
+    for call in calls:
+        sku = call.kwargs["sku"]
+        error = _error(call)
+        if error:
+            lines.append(f"I could not retrieve stock for {sku}: {error}")
+            continue
+        data = call.result
+        breakdown = ", ".join(
+            f"{quantity} in warehouse {warehouse}"
+            for warehouse, quantity in (data.get("stock_by_warehouse") or {}).items()
+        )
+        line = f"We have {data.get('total_quantity_on_hand')} units of {sku} in stock"
+        lines.append(f"{line}: {breakdown}." if breakdown else f"{line}.")
+    return " ".join(lines)
+
+
+# --- Planning ---
+
+def _plan_tracking(query: str) -> Optional[FastPathPlan]:
+    ids = _ids(query)
+    if not ids or len(ids) > MAX_ENTITIES or ORDER_KEYWORDS.search(query):
+        return None
+    if not (TRACKING_KEYWORDS.search(query) or LOCATION_KEYWORDS.search(query)):
+        return None
+    if VEHICLE_KEYWORDS.search(query) and not SHIPMENT_KEYWORDS.search(query):
+        calls = [ToolCall("vehicle-location-lookup", get_vehicle_location.func, {"vehicle_id": i}) for i in ids]
+        return FastPathPlan("tracking", calls, _render_tracking)
+    # Status and the vehicle's latest telemetry come back from one query.
+    if len(ids) == 1:
+        calls = [ToolCall("shipment-tracking-lookup", get_shipment_tracking.func, {"shipment_id": ids[0]})]
+    else:
+        calls = [ToolCall("bulk-shipment-tracking-lookup", get_bulk_shipment_tracking.func, {"shipment_ids": ids})]
+    return FastPathPlan("tracking", calls, _render_tracking)
+
+
+def _plan_cost(query: str) -> Optional[FastPathPlan]:
+    ids = _ids(query)
+    if not ids or len(ids) > MAX_ENTITIES or not COST_KEYWORDS.search(query):
+        return None
+    if ORDER_KEYWORDS.search(query) or (VEHICLE_KEYWORDS.search(query) and not SHIPMENT_KEYWORDS.search(query)):
+        return None
+    calls = [ToolCall("route-fuel-cost-calculator", calculate_route_fuel_cost.func, {"shipment_id": i}) for i in ids]
+    return FastPathPlan("cost", calls, _render_cost)
+
+
+def _plan_warehouse(query: str) -> Optional[FastPathPlan]:
+    skus = _skus(query)
+    if not skus or len(skus) > MAX_ENTITIES or PACKAGING_KEYWORDS.search(query):
+        return None
+    if not INVENTORY_KEYWORDS.search(query):
+        return None
+    calls = [ToolCall("inventory-level-lookup", get_inventory_level.func, {"sku": sku}) for sku in skus]
+    return FastPathPlan("warehouse", calls, _render_inventory)
+
+
+_PLANNERS = {
+    "tracking": _plan_tracking,
+    "cost": _plan_cost,
+    "warehouse": _plan_warehouse,
+}
+
+
+def plan(agent_name: str, query: str) -> Optional[FastPathPlan]:
+    """The direct tool calls that answer the query, or None for the agent loop."""
+    if not settings.TOOL_FAST_PATH_ENABLED or agent_name not in _PLANNERS:
+        return None
+    if OPEN_ENDED.search(query):
+        return None
+    return _PLANNERS[agent_name](query)
+
+
+# --- Execution ---
+
+async def _execute(calls: List[ToolCall]):
+    results = await asyncio.gather(
+        *(asyncio.to_thread(call.func, **call.kwargs) for call in calls), return_exceptions=True
+    )
+    for call, result in zip(calls, results):
+        call.result = {"error": f"An unexpected error occurred: {result}"} if isinstance(result, Exception) else result
+
+
+async def _summarize(agent_name: str, query: str, calls: List[ToolCall]) -> str:
+    from .shared import llm
+
+    results = "\n".join(f"- {call.tool_name} {call.kwargs}: {call.result}" for call in calls)
+    response = await llm.ainvoke(SUMMARY_PROMPT.format(agent_name=agent_name, query=query, results=results))
+    return response.content
+
+
+async def arun(agent_name: str, query: str) -> Optional[Dict[str, Any]]:
+    """
+    Answers the query with direct tool calls. Returns an executor-style
+    `{"output": ...}` dict, or None when the full agent loop should run.
+    """
+    fast_plan = plan(agent_name, query)
+    if fast_plan is None:
+        fast_path_stats.record(agent_name, "agent")
+        return None
+
+    calls = fast_plan.calls
+    await _execute(calls)
+    if all(_found_nothing(call) for call in calls):
+        fast_path_stats.record(agent_name, "agent")
+        print(f"--- Tool fast path [{agent_name}]: no results, handing over to the agent ---")
+        return None
+
+    if settings.TOOL_FAST_PATH_SUMMARIZE:
+        output = await _summarize(agent_name, query, calls)
+    else:
+        output = fast_plan.render(calls)
+    fast_path_stats.record(agent_name, "fast_path")
+    print(f"--- Tool fast path [{agent_name}]: {', '.join(call.tool_name for call in calls)} ---")
+    return {
+        "output": output,
+        "tool_calls": [{"tool": call.tool_name, "input": call.kwargs, "output": call.result} for call in calls],
+    }
+
+
+class FastPathStats:
+    """Per-agent counts of queries answered directly vs by the agent loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent_name: str, path: str):
+        TOOL_FAST_PATH_QUERIES.labels(agent=agent_name, path=path).inc()
+        with self._lock:
+            counts = self._counts.setdefault(agent_name, {"fast_path": 0, "agent": 0})
+            counts[path] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = {agent: dict(values) for agent, values in self._counts.items()}
+        for values in counts.values():
+            total = values["fast_path"] + values["agent"]
+            values["fast_path_ratio"] = round(values["fast_path"] / total, 3) if total else 0.0
+        return {"summarize": settings.TOOL_FAST_PATH_SUMMARIZE, "agents": counts}
+
+
+fast_path_stats = FastPathStats()
@@ -1,10 +1,16 @@
 from typing import Any, Dict
 from .shared import llm
 # Import the specific tools for this agent, including the new one
-from ..tools.database import get_shipment_status, get_vehicle_location
+from ..tools.database import (
+    get_bulk_shipment_tracking,
+    get_shipment_status,
+    get_shipment_tracking,
+    get_vehicle_location,
+)
 
-# The list of tools this agent can use is now expanded
-tools = [get_shipment_status, get_vehicle_location]
+# The combined tracking tools answer most questions in one call; the single-purpose
+# lookups remain for vehicles asked about directly.
+tools = [get_shipment_tracking, get_bulk_shipment_tracking, get_shipment_status, get_vehicle_location]
 
 
 class _FallbackExecutor:
@@ -17,6 +23,11 @@ class _FallbackExecutor:
         response = self.llm.invoke(user_input)
         return {"output": response.content}
 
+    async def ainvoke(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        user_input = payload.get("input") or ""
+        response = await self.llm.ainvoke(user_input)
+        return {"output": response.content}
+
 
 def get_tracking_agent_executor():
     """
@@ -31,8 +42,9 @@ def get_tracking_agent_executor():
                 "system",
                 """You are a helpful tracking assistant for the LogiMAS system.
 - Your job is to provide shipment status and vehicle location updates.
-- Use the 'shipment-status-lookup' tool to find the status and vehicle ID for a shipment.
-- Use the 'vehicle-location-lookup' tool to find the current GPS coordinates of a vehicle."""
+- Use the 'shipment-tracking-lookup' tool for a shipment: it returns the status, ETA, vehicle and the vehicle's latest position, speed and fuel level in one call.
+- Use the 'bulk-shipment-tracking-lookup' tool when the user asks about several shipments.
+- Use the 'vehicle-location-lookup' tool only when the user gives a vehicle ID rather than a shipment ID."""
             ),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
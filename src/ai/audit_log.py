@@ -0,0 +1,304 @@
+"""
+Buffered background writer for `agent_audit_logs`.
+
+Agent nodes used to insert their audit record synchronously on the request
+path. Records are now put on a bounded in-memory queue and a daemon thread
+bulk-inserts them into Supabase whenever `AUDIT_LOG_BATCH_SIZE` records are
+waiting or `AUDIT_LOG_FLUSH_SECONDS` have passed. The FastAPI lifespan starts
+the writer and flushes whatever is left on shutdown.
+
+When the queue is full, `AUDIT_LOG_OVERFLOW_POLICY` decides what happens:
+- "block":       the caller waits up to `AUDIT_LOG_BLOCK_TIMEOUT_SECONDS` for room
+                 (async callers wait on a worker thread, never on the event loop);
+- "drop_oldest": the oldest queued record is discarded to make room;
+- "spill":       the record is appended to a JSON-lines spill file.
+Batches whose insert failed are spilled too. Each process spills to its own file,
+`AUDIT_LOG_SPILL_PATH` with the pid inserted before the extension, so uvicorn
+workers never share one. When the worker starts it replays the spill files of
+processes that are no longer running (including a `.replay` file left behind by
+a crash mid-replay); unreadable lines are logged and skipped.
+"""
+import asyncio
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from ..config import settings
+from ..metrics import AUDIT_LOG_FLUSH_LATENCY, AUDIT_LOG_OVERFLOWS, AUDIT_LOG_QUEUE_DEPTH, timed
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+
+
+class AuditLogWriter:
+    """Bounded queue of audit records drained by a background bulk-insert thread."""
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        flush_seconds: float,
+        overflow_policy: str,
+        spill_path: Optional[str] = None,
+        block_timeout_seconds: float = 1.0,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            print(f"[warning] unknown audit log overflow policy '{overflow_policy}', using 'drop_oldest'")
+            overflow_policy = "drop_oldest"
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.overflow_policy = overflow_policy
+        self.spill_path = _process_spill_path(spill_path) if spill_path else None
+        self._spill_root = os.path.splitext(spill_path)[0] if spill_path else None
+        self.block_timeout_seconds = block_timeout_seconds
+
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue_size)
+        self._overflow_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "spilled": 0, "failed_batches": 0}
+
+    # --- Producer side ---
+
+    def submit(self, record: dict):
+        """Queues a record without waiting, applying the overflow policy when full."""
+        if self._try_put(record):
+            return
+        if self.overflow_policy == "block":
+            self._put_blocking(record)
+        else:
+            self._overflow(record)
+
+    async def asubmit(self, record: dict):
+        """Like `submit`, but a "block" wait happens on a worker thread."""
+        if self._try_put(record):
+            return
+        if self.overflow_policy == "block":
+            await asyncio.to_thread(self._put_blocking, record)
+        else:
+            self._overflow(record)
+
+    def _try_put(self, record: dict) -> bool:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            return False
+        self._stats["enqueued"] += 1
+        AUDIT_LOG_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def _put_blocking(self, record: dict):
+        try:
+            self._queue.put(record, timeout=self.block_timeout_seconds)
+        except queue.Full:
+            # Never hold a chat response hostage to the audit log.
+            self._count_overflow("dropped")
+            print("[warning] audit log queue still full after waiting, dropping record")
+            return
+        self._stats["enqueued"] += 1
+        AUDIT_LOG_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _overflow(self, record: dict):
+        if self.overflow_policy == "spill" and self.spill_path:
+            self._spill([record])
+            self._count_overflow("spilled")
+            return
+        with self._overflow_lock:
+            try:
+                self._queue.get_nowait()
+                self._count_overflow("dropped")
+            except queue.Empty:
+                pass
+            if not self._try_put(record):
+                self._count_overflow("dropped")
+
+    def _count_overflow(self, outcome: str):
+        self._stats[outcome] += 1
+        AUDIT_LOG_OVERFLOWS.labels(policy=self.overflow_policy, outcome=outcome).inc()
+
+    # --- Worker side ---
+
+    def start(self) -> threading.Thread:
+        """Starts the background flusher (idempotent) and replays any spilled records."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the flusher after writing everything still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # Covers the case where the writer was never started, or the join timed out.
+        self.flush()
+
+    def flush(self):
+        """Synchronously writes every queued record."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _run(self):
+        try:
+            self._replay_spilled()
+        except Exception as exc:
+            print(f"[warning] could not replay spilled audit log records: {exc}")
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+        self.flush()
+
+    def _collect_batch(self) -> List[dict]:
+        """Waits for a first record, then gathers more until the batch is full or the window ends."""
+        try:
+            first = self._queue.get(timeout=self.flush_seconds)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        AUDIT_LOG_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _drain(self, limit: int) -> List[dict]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        AUDIT_LOG_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _write(self, batch: List[dict]):
+        # Imported lazily so this module can be loaded without a Supabase client.
+        from .tools.database import supabase_client
+
+        try:
+            with timed(AUDIT_LOG_FLUSH_LATENCY):
+                supabase_client.from_("agent_audit_logs").insert(batch).execute()
+        except Exception as exc:
+            self._stats["failed_batches"] += 1
+            print(f"!!! WARNING: Failed to write {len(batch)} audit log records: {exc}")
+            if self.spill_path:
+                self._spill(batch)
+            return
+        self._stats["written"] += len(batch)
+
+    # --- Spill file ---
+
+    def _spill(self, records: List[dict]):
+        try:
+            with self._spill_lock:
+                directory = os.path.dirname(self.spill_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                    for record in records:
+                        spill_file.write(json.dumps(record, default=str) + "\n")
+        except Exception as exc:
+            print(f"[warning] could not spill audit log records to {self.spill_path}: {exc}")
+
+    def _replay_spilled(self):
+        """Replays the spill files of processes that are gone, one claimed file at a time."""
+        if not self.spill_path:
+            return
+        for path in self._orphaned_spill_files():
+            if path.startswith(f"{self._spill_root}.{os.getpid()}.") and path.endswith(".replay"):
+                replay_path = path  # already claimed by this process
+            else:
+                # Renaming claims the file; when another worker got there first it is gone.
+                replay_path = f"{self._spill_root}.{os.getpid()}.{uuid.uuid4().hex[:8]}.replay"
+                try:
+                    os.replace(path, replay_path)
+                except FileNotFoundError:
+                    continue
+            try:
+                self._replay_file(replay_path)
+            except Exception as exc:
+                print(f"[warning] could not replay audit log spill file {replay_path}: {exc}")
+
+    def _orphaned_spill_files(self) -> List[str]:
+        paths = []
+        for path in sorted(glob.glob(f"{glob.escape(self._spill_root)}.*")):
+            if path == self.spill_path:
+                continue
+            owner = os.path.basename(path)[len(os.path.basename(self._spill_root)) + 1:].split(".")[0]
+            # Files without a pid predate per-process spill files.
+            if owner.isdigit() and _process_alive(int(owner)):
+                continue
+            paths.append(path)
+        return paths
+
+    def _replay_file(self, replay_path: str):
+        records, skipped = [], 0
+        with open(replay_path, encoding="utf-8") as spill_file:
+            for line_number, line in enumerate(spill_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError as exc:
+                    skipped += 1
+                    print(f"[warning] skipping unreadable audit log record {replay_path}:{line_number}: {exc}")
+        print(f"--- Replaying {len(records)} spilled audit log records ({skipped} unreadable) ---")
+        for start in range(0, len(records), self.batch_size):
+            # A failed batch is spilled again, to this process's spill file.
+            self._write(records[start:start + self.batch_size])
+        os.remove(replay_path)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "queued": self._queue.qsize(),
+            "overflow_policy": self.overflow_policy,
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+def _process_spill_path(spill_path: str) -> str:
+    """`data/audit_log_spill.jsonl` -> `data/audit_log_spill.<pid>.jsonl`."""
+    root, extension = os.path.splitext(spill_path)
+    return f"{root}.{os.getpid()}{extension}"
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        # Our own files are left over from an earlier writer in this process.
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+    return True
+
+
+audit_log_writer = AuditLogWriter(
+    max_queue_size=settings.AUDIT_LOG_QUEUE_SIZE,
+    batch_size=settings.AUDIT_LOG_BATCH_SIZE,
+    flush_seconds=settings.AUDIT_LOG_FLUSH_SECONDS,
+    overflow_policy=settings.AUDIT_LOG_OVERFLOW_POLICY,
+    spill_path=settings.AUDIT_LOG_SPILL_PATH,
+    block_timeout_seconds=settings.AUDIT_LOG_BLOCK_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,207 @@
+"""
+Context assembly for the RAG chains and for large tool outputs.
+
+The chains used to join every retrieved snippet verbatim, so near-duplicate
+incident reports were sent to Groq several times over. `ContextAssembler`
+replaces `format_docs`:
+
+1. near-identical snippets are dropped (same normalized text, or embedding
+   cosine similarity above `CONTEXT_DUPLICATE_THRESHOLD`);
+2. the rest are reranked by maximal marginal relevance, computed with NumPy
+   over the candidate embeddings the retrievers return in `metadata["embedding"]`;
+3. snippets are taken in that order until the agent's token budget is spent.
+
+Retrievers therefore fetch more candidates than a chain uses, and the
+assembler picks the relevant, diverse subset that fits. `fit_tool_output`
+applies the same kind of budget to tool results with long lists, such as the
+items of `get_order_details`.
+
+Token counts are estimates (`CONTEXT_CHARS_PER_TOKEN` characters per token);
+no tokenizer for the Groq models ships with the app.
+"""
+import json
+import math
+import re
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ..config import settings
+from ..metrics import CONTEXT_TOKENS, CONTEXT_TOKENS_SAVED
+
+SEPARATOR = "\n\n"
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / settings.CONTEXT_CHARS_PER_TOKEN) if text else 0
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cuts text to about max_tokens, at a word boundary when there is one."""
+    limit = max_tokens * settings.CONTEXT_CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[: max(limit - 3, 0)]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + "..."
+
+
+def mmr_select(relevance: np.ndarray, embeddings: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """
+    Maximal marginal relevance: repeatedly picks the candidate maximising
+    lambda * relevance - (1 - lambda) * max similarity to those already picked.
+    Returns candidate positions in selection order.
+    """
+    count = len(relevance)
+    if count == 0 or k <= 0:
+        return []
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit = embeddings / norms
+    pairwise = unit @ unit.T
+    redundancy = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected: List[int] = []
+    while len(selected) < min(k, count):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, pairwise[pick]) if len(selected) > 1 else pairwise[pick].copy()
+    return selected
+
+
+class ContextAssembler:
+    """
+    Formats retrieved documents into a prompt context within a token budget.
+    Instances are plain callables, so a chain uses `retriever | assembler`.
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        max_tokens: int,
+        max_docs: int,
+        lambda_mult: Optional[float] = None,
+        duplicate_threshold: Optional[float] = None,
+    ):
+        self.agent_name = agent_name
+        self.max_tokens = max_tokens
+        self.max_docs = max_docs
+        self.lambda_mult = settings.CONTEXT_MMR_LAMBDA if lambda_mult is None else lambda_mult
+        self.duplicate_threshold = (
+            settings.CONTEXT_DUPLICATE_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+        )
+
+    def __call__(self, docs: Sequence[Document]) -> str:
+        return self.assemble(docs)
+
+    def assemble(self, docs: Sequence[Document]) -> str:
+        docs = [doc for doc in docs if doc.page_content]
+        baseline = estimate_tokens(SEPARATOR.join(doc.page_content for doc in docs))
+        if not docs:
+            return ""
+
+        embeddings = self._embeddings(docs)
+        unique = self._deduplicate(docs, embeddings)
+        relevance = np.array(
+            [docs[i].metadata.get("similarity_score") or 0.0 for i in unique], dtype=np.float32
+        )
+        if embeddings is not None:
+            order = [unique[i] for i in mmr_select(relevance, embeddings[unique], self.max_docs, self.lambda_mult)]
+        else:
+            order = [unique[i] for i in np.argsort(-relevance, kind="stable")[: self.max_docs]]
+
+        parts: List[str] = []
+        used = 0
+        for i in order:
+            text = docs[i].page_content
+            cost = estimate_tokens(text) + (estimate_tokens(SEPARATOR) if parts else 0)
+            if used + cost > self.max_tokens:
+                if parts:
+                    continue  # a shorter snippet further down may still fit
+                text = _truncate(text, self.max_tokens)
+                cost = estimate_tokens(text)
+            parts.append(text)
+            used += cost
+        context = SEPARATOR.join(parts)
+
+        tokens = estimate_tokens(context)
+        duplicates = len(docs) - len(unique)
+        CONTEXT_TOKENS.labels(source=self.agent_name).observe(tokens)
+        CONTEXT_TOKENS_SAVED.labels(source=self.agent_name).inc(max(baseline - tokens, 0))
+        print(
+            f"--- Context [{self.agent_name}]: {len(parts)}/{len(docs)} snippets, ~{tokens} tokens "
+            f"(saved ~{max(baseline - tokens, 0)}; {duplicates} duplicates dropped) ---"
+        )
+        return context
+
+    def _embeddings(self, docs: Sequence[Document]) -> Optional[np.ndarray]:
+        vectors = [doc.metadata.get("embedding") for doc in docs]
+        if any(vector is None for vector in vectors):
+            return None
+        return np.vstack([np.asarray(vector, dtype=np.float32) for vector in vectors])
+
+    def _deduplicate(self, docs: Sequence[Document], embeddings: Optional[np.ndarray]) -> List[int]:
+        """Positions of the documents to keep, most relevant copy first."""
+        by_relevance = sorted(range(len(docs)), key=lambda i: -(docs[i].metadata.get("similarity_score") or 0.0))
+        seen_texts = set()
+        kept: List[int] = []
+        if embeddings is not None:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            unit = embeddings / norms
+        for i in by_relevance:
+            text = _WHITESPACE.sub(" ", docs[i].page_content).strip().lower()
+            if text in seen_texts:
+                continue
+            if embeddings is not None and kept and float(np.max(unit[kept] @ unit[i])) >= self.duplicate_threshold:
+                continue
+            seen_texts.add(text)
+            kept.append(i)
+        return kept
+
+
+def fit_tool_output(tool_name: str, result: Any, max_tokens: Optional[int] = None) -> Any:
+    """
+    Shrinks a tool result that would blow the prompt budget by dropping trailing
+    entries of its longest list field (e.g. order items). The result records
+    how many entries were left out so the agent can say so.
+    """
+    max_tokens = settings.TOOL_OUTPUT_MAX_TOKENS if max_tokens is None else max_tokens
+    if not isinstance(result, dict):
+        return result
+    baseline = estimate_tokens(json.dumps(result, default=str))
+    if baseline <= max_tokens:
+        return result
+
+    lists = [key for key, value in result.items() if isinstance(value, list) and value]
+    if not lists:
+        return result
+    key = max(lists, key=lambda name: len(json.dumps(result[name], default=str)))
+    items = result[key]
+    fitted = dict(result)
+    # Binary search for the longest prefix that fits.
+    low, high = 0, len(items)
+    while low < high:
+        middle = (low + high + 1) // 2
+        fitted[key] = items[:middle]
+        fitted[f"{key}_omitted"] = len(items) - middle
+        if estimate_tokens(json.dumps(fitted, default=str)) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    fitted[key] = items[:low]
+    fitted[f"{key}_omitted"] = len(items) - low
+
+    tokens = estimate_tokens(json.dumps(fitted, default=str))
+    CONTEXT_TOKENS_SAVED.labels(source=tool_name).inc(max(baseline - tokens, 0))
+    print(
+        f"--- Tool output [{tool_name}]: kept {low}/{len(items)} {key}, ~{tokens} tokens "
+        f"(saved ~{baseline - tokens}) ---"
+    )
+    return fitted
@@ -0,0 +1,224 @@
+"""
+Process-wide registry for the sentence embedding model.
+
+Every component that needs embeddings (the pgvector retrievers, incident
+ingestion, `create_embedding`, the fast-path router and the response cache)
+goes through this module, so each worker loads the SentenceTransformer weights
+exactly once. The model name comes from `settings.EMBEDDING_MODEL_NAME`.
+Query embeddings are cached and micro-batched by `SharedEmbeddings`; the router,
+the response cache and the retrievers all embed a user query through it, so one
+request encodes its query once.
+"""
+import queue
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+
+from ..config import settings
+from ..metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_LOOKUPS
+
+DEFAULT_MODEL_NAME = settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2"
+
+_models: Dict[str, SentenceTransformer] = {}
+_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: Optional[str] = None) -> SentenceTransformer:
+    """Returns the shared SentenceTransformer for `model_name`, loading it on first use."""
+    model_name = model_name or DEFAULT_MODEL_NAME
+    model = _models.get(model_name)
+    if model is None:
+        with _lock:
+            model = _models.get(model_name)
+            if model is None:
+                print(f"--- Loading embedding model ({model_name}) ---")
+                model = SentenceTransformer(model_name)
+                _models[model_name] = model
+    return model
+
+
+def loaded_models() -> List[str]:
+    """Names of the models currently held in memory."""
+    return list(_models)
+
+
+def normalize_query_text(text: str) -> str:
+    """
+    Cache key for a query: NFKC, collapsed whitespace, lower case. The default
+    MiniLM model is uncased, so case does not change its embedding. Only the key
+    is normalized; the text that gets encoded is the caller's own.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split()).lower()
+
+
+class MicroBatchEmbedder:
+    """
+    Groups concurrent single-query encodes into one batched `encode` call.
+
+    Retrievers call `embed_query` from many worker threads at once; encoding 16
+    queries in one call costs little more than encoding one on CPU. A daemon
+    thread takes the first waiting query, collects more for up to `max_wait_ms`
+    (or until `max_batch_size`), encodes the unique texts together and resolves
+    every caller's future.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]], max_batch_size: int, max_wait_ms: float):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def embed(self, text: str) -> List[float]:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            EMBEDDING_BATCH_SIZE.observe(len(texts))
+            try:
+                vectors = dict(zip(texts, self._encode(texts)))
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for text, future in batch:
+                future.set_result(vectors[text])
+
+
+class SharedEmbeddings(Embeddings):
+    """
+    LangChain `Embeddings` adapter over the shared SentenceTransformer.
+
+    `embed_query` is served from an LRU cache keyed by `normalize_query_text`, so
+    the same question embedded by several agents, on a retry, or by another user
+    costs one encode. Misses go through a `MicroBatchEmbedder` so concurrent
+    requests share an `encode` call. `prime()` lets batch callers fill the cache
+    for many queries in one call ahead of time.
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        max_cached: Optional[int] = None,
+        batching: Optional[bool] = None,
+    ):
+        self.model_name = model_name or DEFAULT_MODEL_NAME
+        self.max_cached = settings.EMBEDDING_CACHE_MAX_ENTRIES if max_cached is None else max_cached
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+        batching = settings.EMBEDDING_BATCH_ENABLED if batching is None else batching
+        self._batcher = (
+            MicroBatchEmbedder(
+                self._encode_many,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            )
+            if batching
+            else None
+        )
+
+    @property
+    def model(self) -> SentenceTransformer:
+        return get_embedding_model(self.model_name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query_text(text)
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+        if vector is not None:
+            EMBEDDING_CACHE_LOOKUPS.labels(result="hit").inc()
+            return vector
+
+        with self._cache_lock:
+            self._stats["misses"] += 1
+        EMBEDDING_CACHE_LOOKUPS.labels(result="miss").inc()
+        vector = self._batcher.embed(text) if self._batcher else self._encode_many([text])[0]
+        self._remember([(key, vector)])
+        return vector
+
+    def prime(self, texts: Iterable[str], batch_size: int = 64):
+        """Embeds `texts` in one batched `encode` call for later `embed_query` calls."""
+        # First spelling of each key wins, as it would for sequential `embed_query` calls.
+        first_text: Dict[str, str] = {}
+        for text in texts:
+            first_text.setdefault(normalize_query_text(text), text)
+        with self._cache_lock:
+            missing = [(key, text) for key, text in first_text.items() if key not in self._cache]
+        if not missing:
+            return
+        vectors = self._encode_many([text for _, text in missing], batch_size=batch_size)
+        self._remember(zip([key for key, _ in missing], vectors))
+
+    def _encode_many(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=batch_size).tolist()
+
+    def _remember(self, items: Iterable[Tuple[str, List[float]]]):
+        with self._cache_lock:
+            for key, vector in items:
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+    def cache_stats(self) -> dict:
+        with self._cache_lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._cache),
+                "max_entries": self.max_cached,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "batching": self._batcher is not None,
+            }
+
+
+_shared_embeddings = SharedEmbeddings()
+
+
+def get_embeddings() -> SharedEmbeddings:
+    """The `Embeddings` instance shared by every retriever."""
+    return _shared_embeddings
+
+
+def embed_query_normalized(text: str) -> np.ndarray:
+    """`get_embeddings().embed_query` as an L2-normalized float32 vector, for cosine similarity."""
+    vector = np.asarray(get_embeddings().embed_query(text), dtype=np.float32)
+    return vector / np.linalg.norm(vector)
@@ -0,0 +1,25 @@
+"""
+Helpers for spotting the IDs that logistics queries refer to.
+
+Shipment, order and vehicle IDs are UUIDs; products are referenced by SKUs such
+as PROD0001. Used by the fast-path router and the response cache.
+"""
+import re
+from typing import FrozenSet
+
+UUID_PATTERN = re.compile(
+    r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE
+)
+SKU_PATTERN = re.compile(r"\bPROD\d{3,}\b", re.IGNORECASE)
+
+
+def normalize_entity(entity_id) -> str:
+    """Canonical form used for comparisons (UUIDs lower-case, SKUs upper-case)."""
+    value = str(entity_id).strip()
+    return value.upper() if SKU_PATTERN.fullmatch(value) else value.lower()
+
+
+def extract_entities(text: str) -> FrozenSet[str]:
+    """Returns every UUID and SKU mentioned in the text, normalized."""
+    found = UUID_PATTERN.findall(text) + SKU_PATTERN.findall(text)
+    return frozenset(normalize_entity(value) for value in found)
@@ -1,11 +1,35 @@
+import asyncio
+import functools
 import importlib
+import threading
+import time
+from typing import Dict, List
 from langgraph.graph import StateGraph, END
 from .schemas.graph_state import AgentState
-from .tools.database import log_agent_decision
+from .tools.database import alog_agent_decision
+from .. import metrics
+from ..config import settings
 
 # --- Import the new LLM-powered router ---
 # This replaces the old keyword-based logic.
-from .agents.router import llm_router_chain
+from .agents.router import Agent, llm_batch_router_chain, llm_router_chain
+from .agents import fast_router, tool_fast_path
+
+# Upper bound on the agents one query can fan out to.
+MAX_PARALLEL_AGENTS = 3
+
+# Lazily-loaded agent components. The warm-up task builds them at startup via the
+# same helpers, so the first user does not pay for imports or executor construction.
+_RAG_CHAINS = {
+    "coordinator": (".agents.coordinator", "rag_chain"),
+    "mobility": (".agents.mobility", "mobility_rag_chain"),
+    "supplier": (".agents.supplier", "supplier_rag_chain"),
+}
+_EXECUTOR_FACTORIES = {
+    "tracking": (".agents.tracking", "get_tracking_agent_executor"),
+    "warehouse": (".agents.warehouse", "get_warehouse_agent_executor"),
+    "cost": (".agents.cost", "get_cost_agent_executor"),
+}
 
 # Caches for lazily-built agent executors
 _cached_executors = {
@@ -13,152 +37,279 @@ _cached_executors = {
     "warehouse": None,
     "cost": None,
 }
+_executor_lock = threading.Lock()
+
+
+def get_rag_module(agent_name: str):
+    """Imports (once) the module of a retrieval-based agent: retriever, format_docs, answer_chain."""
+    module_name, _ = _RAG_CHAINS[agent_name]
+    # Importing lazily avoids circular dependencies and defers retriever construction
+    return importlib.import_module(module_name, package=__package__)
+
+
+def get_rag_chain(agent_name: str):
+    """Imports (once) and returns the RAG chain for a retrieval-based agent."""
+    _, attribute = _RAG_CHAINS[agent_name]
+    return getattr(get_rag_module(agent_name), attribute)
+
+
+def get_agent_executor(agent_name: str):
+    """Builds (once) and returns the tool-calling executor for an agent, or None."""
+    if _cached_executors[agent_name] is None:
+        with _executor_lock:
+            if _cached_executors[agent_name] is None:
+                module_name, factory = _EXECUTOR_FACTORIES[agent_name]
+                try:
+                    mod = importlib.import_module(module_name, package=__package__)
+                    _cached_executors[agent_name] = getattr(mod, factory)()
+                except Exception as exc:
+                    print(f"[warning] could not import {agent_name} agent module: {exc}")
+    return _cached_executors[agent_name]
+
 
 # --- Agent Node Definitions ---
-# These nodes are the destinations for our router. Their internal logic is unchanged.
+# These nodes are the destinations for our router. They are coroutines so the graph
+# can be driven with `ainvoke` without blocking the event loop on LLM, pgvector or
+# Supabase round trips. Component loading runs on a worker thread for the same reason.
 
-def coordinator_node(state: AgentState) -> AgentState:
-    print("--- Calling Coordinator Agent ---")
+# Nodes return partial state updates rather than the mutated state: when several
+# agents run as parallel branches, LangGraph merges their `intermediate_steps`
+# through the reducer declared on AgentState.
+
+async def _run_rag_agent(state: AgentState, agent_name: str) -> dict:
     query = state.initial_query
-    # Lazily import the chain to avoid circular dependencies
-    from .agents.coordinator import rag_chain as coordinator_chain
-    response = coordinator_chain.invoke(query)
-    log_agent_decision(agent_name="coordinator", query=query, decision=response)
-    state.intermediate_steps.append(f"Coordinator response: {response}")
-    return state
+    docs = state.prefetched_docs.get(agent_name)
+    if docs is not None:
+        # Retrieved while the router was deciding; only the answer step is left.
+        module = await asyncio.to_thread(get_rag_module, agent_name)
+        response = await module.answer_chain.ainvoke({"context": module.format_docs(docs), "question": query})
+    else:
+        chain = await asyncio.to_thread(get_rag_chain, agent_name)
+        response = await chain.ainvoke(query)
+    await alog_agent_decision(agent_name=agent_name, query=query, decision=response)
+    return {"intermediate_steps": [f"{agent_name.capitalize()} response: {response}"]}
 
 
-def mobility_node(state: AgentState) -> AgentState:
-    print("--- Calling Mobility Agent ---")
+async def _run_tool_agent(state: AgentState, agent_name: str) -> dict:
     query = state.initial_query
-    # Lazily import the chain
-    from .agents.mobility import mobility_rag_chain
-    response = mobility_rag_chain.invoke(query)
-    log_agent_decision(agent_name="mobility", query=query, decision=response)
-    state.intermediate_steps.append(f"Mobility response: {response}")
-    return state
+    label = agent_name.capitalize()
+    # Plain ID lookups skip the tool-calling loop; open-ended questions still use it.
+    response = await tool_fast_path.arun(agent_name, query)
+    if response is None:
+        executor = await asyncio.to_thread(get_agent_executor, agent_name)
+        response = await executor.ainvoke({"input": query}) if executor else {"output": f"{label} agent unavailable."}
 
+    await alog_agent_decision(agent_name=agent_name, query=query, decision=response)
+    agent_output = response.get("output", f"The {agent_name} agent did not provide a response.")
+    return {"intermediate_steps": [f"{label} response: {agent_output}"]}
 
-def tracking_node(state: AgentState) -> AgentState:
+
+async def coordinator_node(state: AgentState) -> dict:
+    print("--- Calling Coordinator Agent ---")
+    return await _run_rag_agent(state, "coordinator")
+
+
+async def mobility_node(state: AgentState) -> dict:
+    print("--- Calling Mobility Agent ---")
+    return await _run_rag_agent(state, "mobility")
+
+
+async def tracking_node(state: AgentState) -> dict:
     print("--- Calling Tracking Agent ---")
-    query = state.initial_query
-    if _cached_executors["tracking"] is None:
-        try:
-            mod = importlib.import_module(".agents.tracking", package=__package__)
-            _cached_executors["tracking"] = mod.get_tracking_agent_executor()
-        except Exception as exc:
-            print(f"[warning] could not import tracking agent module: {exc}")
-    
-    executor = _cached_executors["tracking"]
-    response = executor.invoke({"input": query}) if executor else {"output": "Tracking agent unavailable."}
-    
-    log_agent_decision(agent_name="tracking", query=query, decision=response)
-    agent_output = response.get("output", "The tracking agent did not provide a response.")
-    state.intermediate_steps.append(f"Tracking response: {agent_output}")
-    return state
-
-
-def warehouse_node(state: AgentState) -> AgentState:
-    print("--- Calling Warehouse Agent ---")
-    query = state.initial_query
-    if _cached_executors["warehouse"] is None:
-        try:
-            mod = importlib.import_module(".agents.warehouse", package=__package__)
-            _cached_executors["warehouse"] = mod.get_warehouse_agent_executor()
-        except Exception as exc:
-            print(f"[warning] could not import warehouse agent module: {exc}")
-    
-    executor = _cached_executors["warehouse"]
-    response = executor.invoke({"input": query}) if executor else {"output": "Warehouse agent unavailable."}
+    return await _run_tool_agent(state, "tracking")
 
-    log_agent_decision(agent_name="warehouse", query=query, decision=response)
-    agent_output = response.get("output", "The warehouse agent did not provide a response.")
-    state.intermediate_steps.append(f"Warehouse response: {agent_output}")
-    return state
 
+async def warehouse_node(state: AgentState) -> dict:
+    print("--- Calling Warehouse Agent ---")
+    return await _run_tool_agent(state, "warehouse")
 
-def cost_node(state: AgentState) -> AgentState:
-    print("--- Calling Cost Agent ---")
-    query = state.initial_query
-    if _cached_executors["cost"] is None:
-        try:
-            mod = importlib.import_module(".agents.cost", package=__package__)
-            _cached_executors["cost"] = mod.get_cost_agent_executor()
-        except Exception as exc:
-            print(f"[warning] could not import cost agent module: {exc}")
 
-    executor = _cached_executors["cost"]
-    response = executor.invoke({"input": query}) if executor else {"output": "Cost agent unavailable."}
-    
-    log_agent_decision(agent_name="cost", query=query, decision=response)
-    agent_output = response.get("output", "The cost agent did not provide a response.")
-    state.intermediate_steps.append(f"Cost response: {agent_output}")
-    return state
+async def cost_node(state: AgentState) -> dict:
+    print("--- Calling Cost Agent ---")
+    return await _run_tool_agent(state, "cost")
 
 
-def supplier_node(state: AgentState) -> AgentState:
+async def supplier_node(state: AgentState) -> dict:
     print("--- Calling Supplier Agent ---")
-    query = state.initial_query
-    # Lazily import the chain
-    from .agents.supplier import supplier_rag_chain
-    response = supplier_rag_chain.invoke(query)
-    log_agent_decision(agent_name="supplier", query=query, decision=response)
-    state.intermediate_steps.append(f"Supplier response: {response}")
-    return state
+    return await _run_rag_agent(state, "supplier")
 
 
-def final_responder_node(state: AgentState) -> AgentState:
-    """Generates the final response to the user."""
+async def final_responder_node(state: AgentState) -> dict:
+    """Generates the final response to the user, merging the outputs of every agent that ran."""
     print("--- Generating Final Response ---")
-    final_response = state.intermediate_steps[-1]
-    state.final_response = final_response
-    return state
+    if len(state.intermediate_steps) == 1:
+        final_response = state.intermediate_steps[0]
+    else:
+        final_response = "\n\n".join(state.intermediate_steps)
+    return {"final_response": final_response}
+
+
+# --- Speculative Retrieval ---
+# The LLM router is the slowest step before any agent runs. While it decides,
+# retrieval for the RAG agents already runs; the chosen agents get the documents
+# through `prefetched_docs` and the rest are cancelled or thrown away.
+
+async def _prefetch(agent_name: str, query: str):
+    module = await asyncio.to_thread(get_rag_module, agent_name)
+    return await module.retriever.ainvoke(query)
+
+
+def _consume_result(task: asyncio.Task):
+    # A discarded prefetch that failed must not log "exception was never retrieved".
+    if not task.cancelled():
+        task.exception()
+
+
+def start_speculative_retrieval(query: str) -> Dict[str, asyncio.Task]:
+    """Starts retrieval for the configured RAG agents; returns the tasks by agent."""
+    if not settings.SPECULATIVE_RETRIEVAL_ENABLED:
+        return {}
+    agent_names = dict.fromkeys(name.strip() for name in settings.SPECULATIVE_RETRIEVAL_AGENTS)
+    tasks = {}
+    for agent_name in agent_names:
+        if agent_name in _RAG_CHAINS:
+            tasks[agent_name] = asyncio.create_task(_prefetch(agent_name, query))
+            tasks[agent_name].add_done_callback(_consume_result)
+    return tasks
+
+
+async def collect_speculative_retrieval(
+    tasks: Dict[str, asyncio.Task], chosen_agents: List[str]
+) -> Dict[str, list]:
+    """Waits for the prefetches of the chosen agents and cancels the others."""
+    prefetched = {}
+    for agent_name, task in tasks.items():
+        if agent_name not in chosen_agents:
+            task.cancel()
+            metrics.SPECULATIVE_RETRIEVALS.labels(agent=agent_name, outcome="discarded").inc()
+            continue
+        try:
+            prefetched[agent_name] = await task
+        except Exception as exc:
+            # The agent retrieves again itself.
+            print(f"[warning] speculative retrieval for {agent_name} failed: {exc}")
+            metrics.SPECULATIVE_RETRIEVALS.labels(agent=agent_name, outcome="failed").inc()
+            continue
+        metrics.SPECULATIVE_RETRIEVALS.labels(agent=agent_name, outcome="used").inc()
+    return prefetched
 
 
 # --- Intelligent Router Node ---
-def route_logic(state: AgentState) -> AgentState:
+async def route_logic(state: AgentState) -> dict:
     """
-    Routes the query to the appropriate agent by asking an LLM for its recommendation.
-    This is more robust than keyword-based routing.
+    Routes the query to one or more agents. Obvious queries are resolved by the
+    local fast-path router; everything else is sent to the LLM router, with
+    retrieval for the RAG agents running speculatively alongside it.
     """
-    print("--- Routing Query with LLM Router ---")
+    if state.next_agents:
+        # Already routed, e.g. by `route_batch` for the batch endpoint.
+        return {}
+
     query = state.initial_query
+    start = time.perf_counter()
+
+    # The local classifier runs an embedding, so keep it off the event loop.
+    decision = await asyncio.to_thread(fast_router.classify, query)
+    if decision:
+        chosen_agents = [agent.value for agent in decision.agents]
+        fast_router.router_stats.record("fast_path", time.perf_counter() - start)
+        print(f"Fast-path router chose: {chosen_agents} ({decision.method}, confidence={decision.confidence:.2f})")
+    else:
+        print("--- Routing Query with LLM Router ---")
+        prefetches = start_speculative_retrieval(query)
+        try:
+            # Call the intelligent router chain, which returns a structured Pydantic object
+            router_choice = await llm_router_chain.ainvoke({"query": query})
+        except BaseException:
+            for task in prefetches.values():
+                task.cancel()
+            raise
+        # Get the chosen agent names from the structured output, dropping duplicates
+        chosen_agents = list(dict.fromkeys(agent.value for agent in router_choice.agent_names))
+        chosen_agents = chosen_agents[:MAX_PARALLEL_AGENTS] or [Agent.COORDINATOR.value]
+        fast_router.router_stats.record("llm", time.perf_counter() - start)
+        print(f"LLM Router chose: {chosen_agents}")
+        prefetched = await collect_speculative_retrieval(prefetches, chosen_agents)
+        if prefetched:
+            print(f"--- Using speculatively retrieved documents for: {list(prefetched)} ---")
+            return {"next_agents": chosen_agents, "prefetched_docs": prefetched}
+
+    return {"next_agents": chosen_agents}
+
+
+async def route_batch(queries: List[str]) -> List[List[str]]:
+    """
+    Routes many queries at once: the local classifier handles the whole batch with a
+    single `encode` call, and whatever it cannot resolve goes to the LLM router in
+    one structured call. Returns the chosen agents per query, in input order.
+    """
+    start = time.perf_counter()
+    routes: List[List[str]] = [[] for _ in queries]
+
+    decisions = await asyncio.to_thread(fast_router.classify_many, queries)
+    for index, decision in enumerate(decisions):
+        if decision:
+            routes[index] = [agent.value for agent in decision.agents]
+    fast_count = sum(1 for decision in decisions if decision)
+
+    pending = [index for index, decision in enumerate(decisions) if not decision]
+    if pending:
+        numbered = "\n".join(f"{position}. {queries[index]}" for position, index in enumerate(pending))
+        try:
+            choice = await llm_batch_router_chain.ainvoke({"queries": numbered})
+            for route in choice.routes:
+                if 0 <= route.index < len(pending):
+                    agents = list(dict.fromkeys(agent.value for agent in route.agent_names))
+                    routes[pending[route.index]] = agents[:MAX_PARALLEL_AGENTS]
+        except Exception as exc:
+            print(f"[warning] batch LLM routing failed, using the coordinator: {exc}")
+
+    # Queries the LLM skipped fall back to the generalist agent.
+    routes = [agents or [Agent.COORDINATOR.value] for agents in routes]
+
+    elapsed = time.perf_counter() - start
+    # Attribute the batch latency evenly so the per-query stats stay comparable.
+    for _ in range(fast_count):
+        fast_router.router_stats.record("fast_path", elapsed / len(queries))
+    for _ in pending:
+        fast_router.router_stats.record("llm", elapsed / len(queries))
+    print(f"Batch router: {fast_count} fast-path, {len(pending)} LLM-routed")
+    return routes
+
 
-    # Call the intelligent router chain, which returns a structured Pydantic object
-    router_choice = llm_router_chain.invoke({"query": query})
-    
-    # Get the chosen agent name from the structured output
-    chosen_agent = router_choice.agent_name.value
-    print(f"LLM Router chose: {chosen_agent}")
-    
-    state.next_agent = chosen_agent
-    return state
+def get_next_agents(state: AgentState) -> List[str]:
+    # Returning several node names makes LangGraph run them as parallel branches
+    return state.next_agents
 
 
-def get_next_agent(state: AgentState) -> str:
-    # This helper function reads the decision from the state and returns it
-    return state.next_agent
+def _instrumented(agent_name: str, node):
+    """Wraps a node so its latency and outcome are recorded per agent."""
+    @functools.wraps(node)
+    async def wrapper(state: AgentState):
+        with metrics.timed(metrics.AGENT_NODE_LATENCY, agent=agent_name):
+            return await node(state)
+    return wrapper
 
 
 # --- Graph Construction ---
 # This defines the structure and flow of the agentic system.
 workflow = StateGraph(AgentState)
 
-workflow.add_node("router", route_logic)
-workflow.add_node("coordinator", coordinator_node)
-workflow.add_node("mobility", mobility_node)
-workflow.add_node("tracking", tracking_node)
-workflow.add_node("warehouse", warehouse_node)
-workflow.add_node("cost", cost_node)
-workflow.add_node("supplier", supplier_node)
-workflow.add_node("final_responder", final_responder_node)
+workflow.add_node("router", _instrumented("router", route_logic))
+workflow.add_node("coordinator", _instrumented("coordinator", coordinator_node))
+workflow.add_node("mobility", _instrumented("mobility", mobility_node))
+workflow.add_node("tracking", _instrumented("tracking", tracking_node))
+workflow.add_node("warehouse", _instrumented("warehouse", warehouse_node))
+workflow.add_node("cost", _instrumented("cost", cost_node))
+workflow.add_node("supplier", _instrumented("supplier", supplier_node))
+workflow.add_node("final_responder", _instrumented("final_responder", final_responder_node))
 
 workflow.set_entry_point("router")
 
-# Based on the router's decision, conditionally call the chosen agent.
+# Based on the router's decision, conditionally call the chosen agents concurrently.
 workflow.add_conditional_edges(
     "router",
-    get_next_agent,
+    get_next_agents,
     {
         "coordinator": "coordinator",
         "mobility": "mobility",
@@ -169,7 +320,8 @@ workflow.add_conditional_edges(
     },
 )
 
-# After any agent runs, its output goes to the final responder.
+# After the agents run, their outputs go to the final responder. Parallel branches
+# finish in the same step, so the final responder runs once with all of them.
 workflow.add_edge("coordinator", "final_responder")
 workflow.add_edge("mobility", "final_responder")
 workflow.add_edge("tracking", "final_responder")
@@ -0,0 +1,270 @@
+"""
+Background embedding of incident reports.
+
+`POST /delivery/report-incident` used to run the SentenceTransformer and a
+blocking commit inside the request. It now stores the report with a NULL
+embedding, hands `(doc_id, text)` to this worker and returns. A daemon thread
+collects pending reports into micro-batches (up to `INCIDENT_EMBEDDING_BATCH_SIZE`
+reports, or whatever arrived within `INCIDENT_EMBEDDING_MAX_WAIT_MS` of the
+first one), embeds each batch with one `encode` call and backfills
+`documents.embedding` with one UPDATE. Only rows that UPDATE actually changed
+are added to the in-process NumPy index, so when several workers embed the same
+report, one of them indexes it.
+
+The table is the durable record of what is still pending: on start, and after
+the queue overflowed, the worker re-queues incident reports whose embedding is
+NULL. After a failed batch the sweep waits for an exponential backoff, so an
+unavailable database is not hammered with encode-and-query loops. Reports are stored with the full `incident_text()` as their
+`text_snippet`, so recovered rows embed the same string as live submissions.
+A doc_id is queued at most once until its batch finishes, so a sweep racing a
+submission does not embed (and index) a report twice.
+
+Until its embedding lands, a report is invisible to similarity search.
+"""
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+from ..metrics import INCIDENT_EMBEDDING_BATCH_SIZE, INCIDENT_EMBEDDING_LAG, INCIDENT_EMBEDDING_QUEUE_DEPTH
+
+# (index record with doc_id and metadata, text to embed, time queued)
+PendingReport = Tuple[Dict[str, Any], str, float]
+
+
+def incident_text(incident_type: str, severity: str, description: str) -> str:
+    """The text embedded for an incident report."""
+    return f"Incident Type: {incident_type}. Severity: {severity}. Description: {description}"
+
+
+class IncidentEmbeddingWorker:
+    """Micro-batches pending incident reports through the embedding model."""
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        max_wait_ms: float,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 60.0,
+    ):
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._failures = 0
+        self._sweep_after = 0.0
+        self._queue: "queue.Queue[PendingReport]" = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._needs_sweep = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # doc_ids queued or in the batch being embedded.
+        self._pending_ids: Set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "embedded": 0, "overflowed": 0, "recovered": 0, "failed_batches": 0}
+
+    def submit(self, record: Dict[str, Any], text: str):
+        """
+        Queues a stored report for embedding; never blocks the caller. `record`
+        carries the doc_id and the metadata fields of `numpy_index.METADATA_FIELDS`.
+        """
+        if not self._enqueue(record, text):
+            # The row is already stored with a NULL embedding; the next sweep finds it.
+            self._stats["overflowed"] += 1
+            self._needs_sweep.set()
+            return
+        self._stats["enqueued"] += 1
+        INCIDENT_EMBEDDING_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _enqueue(self, record: Dict[str, Any], text: str) -> bool:
+        """Queues a report unless its doc_id is already pending; False only when the queue is full."""
+        doc_id = record["doc_id"]
+        with self._pending_lock:
+            if doc_id in self._pending_ids:
+                return True
+            try:
+                self._queue.put_nowait((record, text, time.monotonic()))
+            except queue.Full:
+                return False
+            self._pending_ids.add(doc_id)
+        return True
+
+    def _finish(self, batch: List[PendingReport]):
+        with self._pending_lock:
+            self._pending_ids.difference_update(record["doc_id"] for record, _, _ in batch)
+
+    # --- Worker side ---
+
+    def start(self) -> threading.Thread:
+        """Starts the worker (idempotent); it first picks up reports left unembedded."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._needs_sweep.set()
+        self._thread = threading.Thread(target=self._run, name="incident-embedder", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the worker after embedding what is already queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._needs_sweep.is_set() and self._queue.empty() and time.monotonic() >= self._sweep_after:
+                self._needs_sweep.clear()
+                self._recover_pending()
+            batch = self._collect_batch()
+            if batch:
+                self._embed(batch)
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._embed(batch)
+
+    def _collect_batch(self) -> List[PendingReport]:
+        try:
+            first = self._queue.get(timeout=1.0)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        INCIDENT_EMBEDDING_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _drain(self) -> List[PendingReport]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        INCIDENT_EMBEDDING_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _embed(self, batch: List[PendingReport]):
+        try:
+            self._embed_batch(batch)
+        finally:
+            self._finish(batch)
+
+    def _embed_batch(self, batch: List[PendingReport]):
+        from .embeddings import get_embedding_model
+
+        try:
+            vectors = get_embedding_model().encode([text for _, text, _ in batch], batch_size=self.batch_size)
+            written = self._backfill([record["doc_id"] for record, _, _ in batch], vectors)
+        except Exception as exc:
+            # The rows keep their NULL embedding and are retried by a later sweep.
+            self._stats["failed_batches"] += 1
+            self._retry_later()
+            print(f"!!! WARNING: Failed to embed {len(batch)} incident reports: {exc}")
+            return
+        self._failures = 0
+        INCIDENT_EMBEDDING_BATCH_SIZE.observe(len(batch))
+        now = time.monotonic()
+        for _, _, queued_at in batch:
+            INCIDENT_EMBEDDING_LAG.observe(now - queued_at)
+        self._stats["embedded"] += len(written)
+
+        # Make the reports searchable right away when the in-process index is in use.
+        from .tools.numpy_index import loaded_numpy_index
+
+        numpy_index = loaded_numpy_index()
+        if numpy_index is not None:
+            for (record, _, _), vector in zip(batch, vectors):
+                if record["doc_id"] in written:
+                    numpy_index.append(vector, record)
+
+    def _retry_later(self):
+        """Schedules a sweep after an exponential backoff."""
+        self._failures += 1
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (self._failures - 1))
+        self._sweep_after = time.monotonic() + delay
+        self._needs_sweep.set()
+
+    def _backfill(self, doc_ids: List[str], vectors) -> Set[str]:
+        """
+        Writes a batch of embeddings with one UPDATE and returns the doc_ids it
+        changed; rows another worker embedded first are left alone and omitted.
+        """
+        from sqlalchemy import text
+
+        from ..database import engine
+
+        statement = text(
+            "UPDATE public.documents AS d SET embedding = CAST(v.embedding AS vector) "
+            "FROM unnest(CAST(:doc_ids AS uuid[]), CAST(:embeddings AS text[])) AS v(doc_id, embedding) "
+            "WHERE d.doc_id = v.doc_id AND d.embedding IS NULL "
+            "RETURNING d.doc_id"
+        )
+        embeddings = ["[" + ",".join(map(str, vector.tolist())) + "]" for vector in vectors]
+        with engine.begin() as connection:
+            rows = connection.execute(statement, {"doc_ids": list(doc_ids), "embeddings": embeddings})
+            return {str(row.doc_id) for row in rows}
+
+    def _recover_pending(self):
+        """Queues incident reports that were stored but never embedded."""
+        from ..database import SessionLocal
+        from ..models.document import Document
+
+        db = SessionLocal()
+        try:
+            pending = (
+                db.query(Document.doc_id, Document.region_id, Document.ts, Document.text_snippet)
+                .filter(Document.source_type == "incident_report", Document.embedding.is_(None))
+                .limit(self._queue.maxsize or 1000)
+                .all()
+            )
+        except Exception as exc:
+            print(f"[warning] could not look up unembedded incident reports: {exc}")
+            self._retry_later()
+            return
+        finally:
+            db.close()
+        with self._pending_lock:
+            pending = [row for row in pending if str(row.doc_id) not in self._pending_ids]
+        for doc_id, region_id, ts, text_snippet in pending:
+            record = {
+                "doc_id": str(doc_id),
+                "source_type": "incident_report",
+                "region_id": region_id,
+                "ts": ts.isoformat() if ts else None,
+                "text_snippet": text_snippet,
+            }
+            if not self._enqueue(record, text_snippet or ""):
+                self._needs_sweep.set()
+                break
+            self._stats["recovered"] += 1
+        if pending:
+            print(f"--- Re-queued {len(pending)} unembedded incident reports ---")
+        INCIDENT_EMBEDDING_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "queued": self._queue.qsize(),
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+incident_embedder = IncidentEmbeddingWorker(
+    max_queue_size=settings.INCIDENT_EMBEDDING_QUEUE_SIZE,
+    batch_size=settings.INCIDENT_EMBEDDING_BATCH_SIZE,
+    max_wait_ms=settings.INCIDENT_EMBEDDING_MAX_WAIT_MS,
+    retry_base_seconds=settings.INCIDENT_EMBEDDING_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.INCIDENT_EMBEDDING_RETRY_MAX_SECONDS,
+)
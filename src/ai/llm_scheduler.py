@@ -0,0 +1,485 @@
+"""
+Priority-aware admission control for the shared Groq chat model.
+
+Every agent, router and RAG chain shares one `ChatGroq`. Without coordination a
+burst sends every call to Groq at once, the provider answers 429 and the
+`AgentExecutor`s surface the errors. `LLMScheduler` sits in front of the model:
+
+- two token buckets cap requests per minute (`LLM_REQUESTS_PER_MINUTE`) and
+  tokens per minute (`LLM_TOKENS_PER_MINUTE`, estimated from the prompt plus
+  `LLM_COMPLETION_TOKENS_ESTIMATE` and corrected with the reported usage);
+- at most `LLM_MAX_CONCURRENCY` calls are in flight;
+- waiting calls are admitted strictly by priority, FIFO within a priority:
+  interactive chat before batch jobs before background work;
+- a 429 pauses admission for the provider's `retry-after` (or a jittered
+  exponential backoff) and the call is retried, up to `LLM_MAX_RETRIES` times.
+
+Under load, calls queue and latency grows instead of requests failing.
+
+The priority of a call comes from `llm_priority()`, a context variable, so it
+follows the request through LangGraph nodes, tasks and worker threads:
+
+    with llm_priority(Priority.BATCH):
+        await agent_graph.ainvoke(state)
+
+Calls made outside any `llm_priority` block are interactive.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from ..config import settings
+from ..metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_RATE_LIMITED
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+    BACKGROUND = 2
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "llm_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """Runs the enclosed LLM calls at `priority`."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+# Set while a call holds a grant, so a model whose async path delegates to its
+# sync one (LangChain's default `_agenerate`) is not admitted twice.
+_admitted: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_admitted", default=False)
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute / 60` per second up to `per_minute`. 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 when it already is)."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        # A single call larger than the bucket only has to wait for a full bucket.
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) / self.rate
+
+    def take(self, amount: float):
+        if self.capacity:
+            self.level -= amount
+
+    def give_back(self, amount: float):
+        """Corrects an estimate; a negative amount charges extra usage."""
+        if self.capacity:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    """One queued call. `wake` is thread-safe for both thread and event-loop waiters."""
+
+    def __init__(self, priority: Priority, tokens: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.priority = priority
+        self.tokens = tokens
+        self.granted = False
+        self.cancelled = False
+        self._loop = loop
+        self._event = asyncio.Event() if loop is not None else threading.Event()
+
+    def wake(self):
+        if self._loop is None:
+            self._event.set()
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            # Set it now: a deferred set would land after the waiter's own
+            # `reset()` and end its next timed wait immediately.
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    def reset(self):
+        self._event.clear()
+
+    def wait(self, timeout: Optional[float]):
+        self._event.wait(timeout)
+
+    async def await_wake(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class Grant:
+    """An admitted call; hand it back to `LLMScheduler.release`."""
+
+    def __init__(self, priority: Priority, tokens: int):
+        self.priority = priority
+        self.tokens = tokens
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_retries: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._queue: List[tuple] = []  # (priority, sequence, waiter)
+        self._sequence = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+        self._stats = {"admitted": 0, "rate_limited": 0, "retried": 0, "gave_up": 0}
+        self._depths = {priority: 0 for priority in Priority}
+
+    # --- Admission ---
+
+    def acquire(self, tokens: int, priority: Optional[Priority] = None) -> Grant:
+        """Blocks the calling thread until the call may go out."""
+        waiter = self._enqueue(tokens, priority, loop=None)
+        start = time.monotonic()
+        try:
+            while True:
+                with self._lock:
+                    delay = self._dispatch_locked(caller=waiter)
+                    if waiter.granted:
+                        break
+                    waiter.reset()
+                waiter.wait(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return self._admitted(waiter, start)
+
+    async def aacquire(self, tokens: int, priority: Optional[Priority] = None) -> Grant:
+        """Waits on the event loop until the call may go out."""
+        waiter = self._enqueue(tokens, priority, loop=asyncio.get_running_loop())
+        start = time.monotonic()
+        try:
+            while True:
+                with self._lock:
+                    delay = self._dispatch_locked(caller=waiter)
+                    if waiter.granted:
+                        break
+                    waiter.reset()
+                await waiter.await_wake(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return self._admitted(waiter, start)
+
+    def release(self, grant: Grant, used_tokens: Optional[int] = None):
+        """Frees the concurrency slot; `used_tokens` corrects the token estimate."""
+        with self._lock:
+            self._active -= 1
+            if used_tokens is not None:
+                self._tokens.give_back(grant.tokens - used_tokens)
+            self._dispatch_locked()
+
+    def _enqueue(self, tokens: int, priority: Optional[Priority], loop) -> _Waiter:
+        priority = current_priority() if priority is None else priority
+        waiter = _Waiter(priority, tokens, loop)
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            self._depths[priority] += 1
+            LLM_QUEUE_DEPTH.labels(priority=priority.name.lower()).set(self._depths[priority])
+        return waiter
+
+    def _admitted(self, waiter: _Waiter, start: float) -> Grant:
+        LLM_QUEUE_WAIT.labels(priority=waiter.priority.name.lower()).observe(time.monotonic() - start)
+        return Grant(waiter.priority, waiter.tokens)
+
+    def _abandon(self, waiter: _Waiter):
+        """A waiter was cancelled: drop it from the queue, or give back its slot."""
+        with self._lock:
+            if waiter.granted:
+                self._active -= 1
+                self._tokens.give_back(waiter.tokens)
+            elif not waiter.cancelled:
+                waiter.cancelled = True
+                self._depths[waiter.priority] -= 1
+                LLM_QUEUE_DEPTH.labels(priority=waiter.priority.name.lower()).set(self._depths[waiter.priority])
+            self._dispatch_locked()
+
+    def _dispatch_locked(self, caller: Optional[_Waiter] = None) -> Optional[float]:
+        """
+        Admits waiters from the head of the queue while capacity allows. Returns
+        how long until the head could be admitted, or None when only a release
+        can unblock it. When the head has to wait for the rate limits it is
+        woken, so that it always sleeps with a timeout and nobody is stranded
+        after a release that could not admit anyone. `caller` is the waiter
+        dispatching for itself; it sleeps for the returned delay and is not woken.
+        """
+        while self._queue:
+            _, _, head = self._queue[0]
+            if head.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            if self._active >= self.max_concurrency:
+                return None
+            now = time.monotonic()
+            delay = max(
+                self._paused_until - now,
+                self._requests.wait_time(1, now),
+                self._tokens.wait_time(head.tokens, now),
+            )
+            if delay > 0:
+                # The head may be parked without a timeout (it was blocked on the
+                # concurrency cap); wake it so it re-waits for exactly this delay.
+                if head is not caller:
+                    head.wake()
+                return delay
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(head.tokens)
+            self._active += 1
+            self._stats["admitted"] += 1
+            self._depths[head.priority] -= 1
+            LLM_QUEUE_DEPTH.labels(priority=head.priority.name.lower()).set(self._depths[head.priority])
+            head.granted = True
+            head.wake()
+        return None
+
+    # --- Rate limits ---
+
+    def retry_delay(self, exc: BaseException, attempt: int, priority: Priority) -> Optional[float]:
+        """
+        Seconds to sleep before retrying a call that failed with `exc`, or None
+        to give up. A 429 also pauses admission for everyone, since the other
+        queued calls would be rejected too.
+        """
+        if not is_rate_limit_error(exc):
+            return None
+        gave_up = attempt >= self.max_retries
+        retry_after = retry_after_seconds(exc)
+        if retry_after is None:
+            retry_after = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt)
+        # Jitter spreads the retries of calls that were rejected together.
+        delay = retry_after * random.uniform(0.8, 1.2)
+        with self._lock:
+            self._stats["rate_limited"] += 1
+            self._stats["gave_up" if gave_up else "retried"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        LLM_RATE_LIMITED.labels(priority=priority.name.lower(), outcome="gave_up" if gave_up else "retried").inc()
+        return None if gave_up else delay
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                **self._stats,
+                "in_flight": self._active,
+                "queued": {priority.name.lower(): depth for priority, depth in self._depths.items()},
+                "paused_seconds": round(max(self._paused_until - now, 0.0), 2),
+                "max_concurrency": self.max_concurrency,
+            }
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """The provider's `retry-after` header, if the error carries one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_call_tokens(messages: List[Any]) -> int:
+    from .context import estimate_tokens
+
+    prompt = sum(estimate_tokens(str(getattr(message, "content", message))) for message in messages)
+    return prompt + settings.LLM_COMPLETION_TOKENS_ESTIMATE
+
+
+def _used_tokens(result) -> Optional[int]:
+    usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+_END = object()
+
+
+# Streams set `_admitted` only while the wrapped stream advances, never across a
+# `yield`: the consumer must not see the flag, and a generator may be closed
+# from another context, where resetting a ContextVar token raises.
+
+def _admitted_next(chunks: Iterator):
+    admitted = _admitted.set(True)
+    try:
+        return next(chunks, _END)
+    finally:
+        _admitted.reset(admitted)
+
+
+async def _admitted_anext(chunks: AsyncIterator):
+    admitted = _admitted.set(True)
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return _END
+    finally:
+        _admitted.reset(admitted)
+
+
+class ScheduledChatModelMixin:
+    """
+    Routes a chat model's calls through `llm_scheduler`. Mix in before the model
+    class; the model's own retries should be disabled (`max_retries=0`).
+    Streams are only retried when the 429 arrives before the first chunk.
+    """
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _admitted.get():
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        tokens, priority = estimate_call_tokens(messages), current_priority()
+        for attempt in itertools.count():
+            grant = llm_scheduler.acquire(tokens, priority)
+            used = None
+            admitted = _admitted.set(True)
+            try:
+                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                used = _used_tokens(result)
+                return result
+            except Exception as exc:
+                delay = llm_scheduler.retry_delay(exc, attempt, priority)
+                if delay is None:
+                    raise
+            finally:
+                try:
+                    llm_scheduler.release(grant, used)
+                finally:
+                    _admitted.reset(admitted)
+            time.sleep(delay)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _admitted.get():
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        tokens, priority = estimate_call_tokens(messages), current_priority()
+        for attempt in itertools.count():
+            grant = await llm_scheduler.aacquire(tokens, priority)
+            used = None
+            admitted = _admitted.set(True)
+            try:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                used = _used_tokens(result)
+                return result
+            except Exception as exc:
+                delay = llm_scheduler.retry_delay(exc, attempt, priority)
+                if delay is None:
+                    raise
+            finally:
+                try:
+                    llm_scheduler.release(grant, used)
+                finally:
+                    _admitted.reset(admitted)
+            await asyncio.sleep(delay)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator:
+        if _admitted.get():
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        tokens, priority = estimate_call_tokens(messages), current_priority()
+        for attempt in itertools.count():
+            grant = llm_scheduler.acquire(tokens, priority)
+            started = False
+            chunks = super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            try:
+                while True:
+                    chunk = _admitted_next(chunks)
+                    if chunk is _END:
+                        return
+                    started = True
+                    yield chunk
+            except Exception as exc:
+                delay = None if started else llm_scheduler.retry_delay(exc, attempt, priority)
+                if delay is None:
+                    raise
+            finally:
+                try:
+                    llm_scheduler.release(grant)
+                finally:
+                    chunks.close()
+            time.sleep(delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if _admitted.get():
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        tokens, priority = estimate_call_tokens(messages), current_priority()
+        for attempt in itertools.count():
+            grant = await llm_scheduler.aacquire(tokens, priority)
+            started = False
+            chunks = super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            try:
+                while True:
+                    chunk = await _admitted_anext(chunks)
+                    if chunk is _END:
+                        return
+                    started = True
+                    yield chunk
+            except Exception as exc:
+                delay = None if started else llm_scheduler.retry_delay(exc, attempt, priority)
+                if delay is None:
+                    raise
+            finally:
+                try:
+                    llm_scheduler.release(grant)
+                finally:
+                    await chunks.aclose()
+            await asyncio.sleep(delay)
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_base_seconds=settings.LLM_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.LLM_RETRY_MAX_SECONDS,
+)
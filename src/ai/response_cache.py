@@ -0,0 +1,253 @@
+"""
+Semantic response cache in front of the agent graph.
+
+A query is embedded and compared against the embeddings of previously answered
+queries. When a stored query is within the similarity threshold, mentions exactly
+the same entity IDs and has not expired, its `final_response` is returned without
+running routing, retrieval or any LLM call.
+
+Entries are scoped by the caller's role, the same scope single-flight coalescing
+uses: an answer produced for one role is only ever served to callers with that
+role. The graph does not yet answer differently per role, so this keeps answers
+from crossing roles rather than changing what any role is told.
+
+Entries are tagged with the shipment/order/vehicle UUIDs and SKUs found in the
+query, so services that mutate those entities can invalidate every answer that
+mentions them. Only IDs in the query text are tagged: an answer to an ID-less
+question ("which shipments are delayed?") is never invalidated, so such entries
+expire after the shorter `AI_CACHE_UNTAGGED_TTL_SECONDS`.
+
+Entries live in an in-process LRU with a TTL and can optionally be mirrored to
+an on-disk `shelve` store so they survive restarts. `shelve` does not support
+concurrent writers, so the mirror is for single-worker deployments; with
+`WEB_CONCURRENCY` > 1 (uvicorn's default worker count) it is disabled and each
+worker keeps its cache in memory only.
+"""
+import os
+import shelve
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+import numpy as np
+
+from ..config import settings
+from .entities import extract_entities, normalize_entity
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    embedding: np.ndarray
+    response: str
+    entities: FrozenSet[str]
+    created_at: float
+    latency_seconds: float
+    role: str = "anonymous"
+
+
+class SemanticResponseCache:
+    """Thread-safe LRU + TTL cache keyed by query embedding similarity."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+        disk_path: Optional[str] = None,
+        untagged_ttl_seconds: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.untagged_ttl_seconds = ttl_seconds if untagged_ttl_seconds is None else untagged_ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.disk_path = disk_path
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._by_entity: Dict[str, Set[str]] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "latency_saved_seconds": 0.0}
+
+        if self.disk_path:
+            self._load_from_disk()
+
+    # --- Public API ---
+
+    def lookup(self, query: str, role: str = "anonymous", embedding: Optional[np.ndarray] = None) -> Optional[str]:
+        """
+        Returns a cached response for a semantically equivalent query asked with
+        the same role, if any. Pass the vector from `embed()` to reuse it for `store()`.
+        """
+        entities = extract_entities(query)
+        if embedding is None:
+            embedding = self.embed(query)
+        with self._lock:
+            self._evict_expired()
+            best_key, best_similarity = None, -1.0
+            for key, entry in self._entries.items():
+                # "stock of PROD0001" and "stock of PROD0002" are nearly identical
+                # sentences, so the entity sets must match exactly.
+                if entry.entities != entities or entry.role != role:
+                    continue
+                similarity = float(np.dot(entry.embedding, embedding))
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None or best_similarity < self.similarity_threshold:
+                self._stats["misses"] += 1
+                return None
+
+            entry = self._entries[best_key]
+            self._entries.move_to_end(best_key)
+            self._stats["hits"] += 1
+            self._stats["latency_saved_seconds"] += entry.latency_seconds
+            return entry.response
+
+    def store(
+        self,
+        query: str,
+        response: str,
+        latency_seconds: float,
+        role: str = "anonymous",
+        embedding: Optional[np.ndarray] = None,
+    ):
+        """Caches the response produced for a query asked with the given role."""
+        entry = CacheEntry(
+            query=query,
+            embedding=self.embed(query) if embedding is None else embedding,
+            response=response,
+            entities=extract_entities(query),
+            created_at=time.time(),
+            latency_seconds=latency_seconds,
+            role=role,
+        )
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._insert(key, entry)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+            self._persist(key, entry)
+
+    def invalidate_entities(self, entity_ids: Iterable) -> int:
+        """Drops every cached answer that mentions any of the given IDs."""
+        removed = 0
+        with self._lock:
+            for entity_id in entity_ids:
+                if entity_id is None:
+                    continue
+                for key in list(self._by_entity.get(normalize_entity(entity_id), ())):
+                    self._remove(key)
+                    removed += 1
+            self._stats["invalidations"] += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "invalidations": self._stats["invalidations"],
+                "latency_saved_seconds": round(self._stats["latency_saved_seconds"], 3),
+            }
+
+    @staticmethod
+    def embed(query: str) -> np.ndarray:
+        """
+        The normalized query vector `lookup` and `store` compare. It comes from the
+        shared query-embedding cache, so the router and the retrievers reuse it.
+        """
+        # Imported lazily so services can import this module without loading the model.
+        from .embeddings import embed_query_normalized
+
+        return embed_query_normalized(query)
+
+    # --- Internals ---
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        ttl = self.ttl_seconds if entry.entities else self.untagged_ttl_seconds
+        return entry.created_at < now - ttl
+
+    def _insert(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        for entity in entry.entities:
+            self._by_entity.setdefault(entity, set()).add(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for entity in entry.entities:
+            keys = self._by_entity.get(entity)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_entity[entity]
+        self._unpersist(key)
+
+    def _evict_expired(self):
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if self._expired(entry, now)]:
+            self._remove(key)
+
+    def _persist(self, key: str, entry: CacheEntry):
+        if not self.disk_path:
+            return
+        try:
+            with shelve.open(self.disk_path) as db:
+                db[key] = entry
+        except Exception as exc:
+            print(f"[warning] could not persist AI response cache entry: {exc}")
+
+    def _unpersist(self, key: str):
+        if not self.disk_path:
+            return
+        try:
+            with shelve.open(self.disk_path) as db:
+                db.pop(key, None)
+        except Exception as exc:
+            print(f"[warning] could not remove AI response cache entry from disk: {exc}")
+
+    def _load_from_disk(self):
+        now = time.time()
+        try:
+            with shelve.open(self.disk_path) as db:
+                stored = sorted(db.items(), key=lambda item: item[1].created_at)
+                keep = [(key, entry) for key, entry in stored if not self._expired(entry, now)]
+                keep = keep[-self.max_entries:]
+                kept_keys = {key for key, _ in keep}
+                for key, _ in stored:
+                    if key not in kept_keys:
+                        del db[key]
+        except Exception as exc:
+            print(f"[warning] could not load AI response cache from {self.disk_path}: {exc}")
+            return
+        for key, entry in keep:
+            self._insert(key, entry)
+
+
+def _disk_path() -> Optional[str]:
+    if settings.AI_CACHE_PATH and int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+        print("[warning] AI_CACHE_PATH ignored: the on-disk response cache supports a single worker only")
+        return None
+    return settings.AI_CACHE_PATH
+
+
+response_cache = SemanticResponseCache(
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+    similarity_threshold=settings.AI_CACHE_SIMILARITY_THRESHOLD,
+    disk_path=_disk_path(),
+    untagged_ttl_seconds=settings.AI_CACHE_UNTAGGED_TTL_SECONDS,
+)
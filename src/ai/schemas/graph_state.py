@@ -1,4 +1,6 @@
-from typing import List, Optional
+import operator
+from typing import Annotated, Dict, List
+from langchain_core.documents import Document
 from pydantic import BaseModel, Field
 
 
@@ -9,13 +11,20 @@ class AgentState(BaseModel):
 
     initial_query: str = Field(description="The original user query.")
 
-    # The agent router will populate this field
-    next_agent: Optional[str] = Field(
-        default=None, description="The name of the next agent to be called."
+    # The agent router will populate this field. Several agents run as parallel branches.
+    next_agents: List[str] = Field(
+        default_factory=list, description="The names of the agents to be called."
     )
 
-    # Each agent will append its output to this list
-    intermediate_steps: List[str] = Field(
+    # Documents retrieved speculatively while the router was deciding, keyed by the
+    # RAG agent they were retrieved for. Agents without an entry retrieve themselves.
+    prefetched_docs: Dict[str, List[Document]] = Field(
+        default_factory=dict, description="Speculatively retrieved documents per RAG agent."
+    )
+
+    # Each agent appends its output to this list. The reducer merges the updates of
+    # agents that run concurrently instead of letting one overwrite the other.
+    intermediate_steps: Annotated[List[str], operator.add] = Field(
         default_factory=list, description="A log of all agent outputs."
     )
 
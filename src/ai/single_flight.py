@@ -0,0 +1,104 @@
+"""
+Single-flight coalescing of identical concurrent AI queries.
+
+When a shipment is late, many users ask the same question within seconds. The
+response cache only helps once the first answer is stored; until then every
+request would start its own graph run. `SingleFlight` keeps one in-flight
+execution per key (normalized query plus the caller's role), and concurrent
+requests with the same key await that execution and get the same result,
+including its exception.
+
+The execution runs as its own task, so it completes for the remaining waiters
+even if the request that started it disconnects. Streaming requests lead with
+`lead()` and publish the final answer themselves; if such a leader goes away
+before finishing, its followers run the query on their own.
+"""
+import asyncio
+import re
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Tuple
+
+from ..metrics import AI_QUERIES_COALESCED
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class FlightAbandoned(Exception):
+    """The leading request went away before producing a result."""
+
+
+def flight_key(query: str, role: str) -> Tuple[str, str]:
+    """Queries differing only in case, spacing or trailing punctuation share a key."""
+    return role or "anonymous", _WHITESPACE.sub(" ", query).strip().rstrip("?!. ").lower()
+
+
+def _consume_exception(future: asyncio.Future):
+    # Nobody may be left to await a failed flight; don't log it as unretrieved.
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    """One in-flight execution per key; concurrent callers share its result."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {"executions": 0, "coalesced": 0, "abandoned": 0}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the result of the execution in flight for `key`, or starts
+        `func()` as that execution when there is none.
+        """
+        while key in self._flights:
+            self._stats["coalesced"] += 1
+            AI_QUERIES_COALESCED.labels(role=key[0] if isinstance(key, tuple) else "unknown").inc()
+            try:
+                return await asyncio.shield(self._flights[key])
+            except FlightAbandoned:
+                self._stats["abandoned"] += 1
+                continue  # another follower may have taken over; otherwise run it here
+
+        task = asyncio.ensure_future(func())
+        self._register(key, task)
+        return await asyncio.shield(task)
+
+    @contextmanager
+    def lead(self, key: Hashable) -> Iterator[asyncio.Future]:
+        """
+        Registers the caller as the execution for `key` when it produces the
+        result itself (e.g. while streaming). The caller sets the result on the
+        yielded future; leaving without doing so releases the followers.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._register(key, future)
+        try:
+            yield future
+        finally:
+            if not future.done():
+                future.set_exception(FlightAbandoned())
+
+    def _register(self, key: Hashable, future: asyncio.Future):
+        self._flights[key] = future
+        self._stats["executions"] += 1
+
+        def _release(done: asyncio.Future):
+            if self._flights.get(key) is done:
+                del self._flights[key]
+            _consume_exception(done)
+
+        future.add_done_callback(_release)
+
+    def stats(self) -> dict:
+        requests = self._stats["executions"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "in_flight": len(self._flights),
+            "coalesced_ratio": round(self._stats["coalesced"] / requests, 3) if requests else 0.0,
+        }
+
+
+single_flight = SingleFlight()
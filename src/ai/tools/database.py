@@ -1,6 +1,5 @@
 import os
-import traceback
-import json
+import asyncio
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from pydantic import BaseModel, Field
@@ -8,12 +7,31 @@ from langchain.tools import tool
 from ...config import (
     settings,
 )
+from .tool_cache import tool_cache
+from ..context import fit_tool_output
+from ..entities import UUID_PATTERN
+from ..audit_log import audit_log_writer
+from ...metrics import AUDIT_LOG_LATENCY, timed, timed_tool
 
 SUPABASE_URL = settings.SUPABASE_URL
 SUPABASE_KEY = settings.SUPABASE_KEY
 supabase_client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 
+def _in_thread(func):
+    """
+    Wraps a blocking function in a coroutine that runs it on the default executor.
+    The Supabase client is synchronous, so this is what lets the async agent
+    executors call our tools without stalling the event loop.
+    """
+    async def _async(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    _async.__name__ = f"a{func.__name__}"
+    _async.__doc__ = func.__doc__
+    return _async
+
+
 # --- Tool: Shipment Status Lookup ---
 class ShipmentLookupSchema(BaseModel):
     """Input schema for the shipment lookup tool."""
@@ -21,6 +39,8 @@ class ShipmentLookupSchema(BaseModel):
 
 
 @tool("shipment-status-lookup", args_schema=ShipmentLookupSchema)
+@timed_tool("shipment-status-lookup")
+@tool_cache.cached("shipment-status-lookup")
 def get_shipment_status(shipment_id: str) -> dict:
     """Looks up the status and current ETA of a specific shipment by its ID."""
     print(f"--- Tool Executing: get_shipment_status for ID: {shipment_id} ---")
@@ -47,6 +67,8 @@ class InventoryLookupSchema(BaseModel):
 
 
 @tool("inventory-level-lookup", args_schema=InventoryLookupSchema)
+@timed_tool("inventory-level-lookup")
+@tool_cache.cached("inventory-level-lookup")
 def get_inventory_level(sku: str) -> dict:
     """Looks up the quantity on hand for a specific product SKU across all warehouses."""
     print(f"--- Tool Executing: get_inventory_level for SKU: {sku} ---")
@@ -79,6 +101,8 @@ class PackagingOptimizerSchema(BaseModel):
 
 
 @tool("packaging-optimizer", args_schema=PackagingOptimizerSchema)
+@timed_tool("packaging-optimizer")
+@tool_cache.cached("packaging-optimizer")
 def find_best_packaging(item_volumes: list[float]) -> dict:
     """Calculates the total volume from a list of item volumes and finds the smallest box that can fit them."""
     print(f"--- Tool Executing: find_best_packaging for volumes: {item_volumes} ---")
@@ -122,6 +146,7 @@ class CostCalculationSchema(BaseModel):
 
 
 @tool("route-fuel-cost-calculator", args_schema=CostCalculationSchema)
+@timed_tool("route-fuel-cost-calculator")
 def calculate_route_fuel_cost(shipment_id: str) -> dict:
     """Calculates the total estimated fuel cost for a given shipment ID."""
     print(f"--- Tool Executing: calculate_route_fuel_cost for Shipment: {shipment_id} ---")
@@ -179,6 +204,8 @@ class OrderLookupSchema(BaseModel):
     order_id: str = Field(description="The UUID of the order to look up.")
 
 @tool("order-details-lookup", args_schema=OrderLookupSchema)
+@timed_tool("order-details-lookup")
+@tool_cache.cached("order-details-lookup")
 def get_order_details(order_id: str) -> dict:
     """Looks up the details of a specific order, including items, destination, and status."""
     print(f"--- Tool Executing: get_order_details for Order ID: {order_id} ---")
@@ -191,7 +218,8 @@ def get_order_details(order_id: str) -> dict:
             .execute()
         )
         if response.data:
-            return response.data
+            # Large orders would otherwise put every line item into the prompt.
+            return fit_tool_output("order-details-lookup", response.data)
         else:
             return {"error": "Order not found."}
     except Exception as e:
@@ -204,6 +232,8 @@ class VehicleLocationSchema(BaseModel):
     vehicle_id: str = Field(description="The UUID of the vehicle to locate.")
 
 @tool("vehicle-location-lookup", args_schema=VehicleLocationSchema)
+@timed_tool("vehicle-location-lookup")
+@tool_cache.cached("vehicle-location-lookup")
 def get_vehicle_location(vehicle_id: str) -> dict:
     """Finds the most recent telemetry data (location and speed) for a specific vehicle."""
     print(f"--- Tool Executing: get_vehicle_location for Vehicle ID: {vehicle_id} ---")
@@ -224,29 +254,123 @@ def get_vehicle_location(vehicle_id: str) -> dict:
     except Exception as e:
         return {"error": f"Database error: {str(e)}"}
 
-# --- Utility Function for Audit Logging (NOT a tool for the LLM) ---
-def log_agent_decision(agent_name: str, query: str, decision: dict | str):
-    """Logs the final output of an agent to the 'agent_audit_logs' table in Supabase."""
-    print(f"--- Logging decision for agent: {agent_name} ---")
-    try:
-        decision_json = (
-            json.dumps(decision)
-            if isinstance(decision, dict)
-            else json.dumps({"output": decision})
-        )
-        log_entry = {
-            "agent_name": agent_name,
-            "input_context": {"query": query},
-            "decision_json": json.loads(decision_json),
-            "confidence": 0.95,  # Placeholder
+# --- Tool: Shipment Tracking (status + latest telemetry) ---
+# Backed by the get_shipment_tracking RPC (supabase/migrations/20251103000000_shipment_tracking_rpc.sql):
+# one round trip with a lateral join on vehicle_telemetry (vehicle_id, ts DESC),
+# instead of shipment-status-lookup followed by vehicle-location-lookup.
+MAX_BULK_SHIPMENTS = 100
+
+
+def _tracking_record(row: dict) -> dict:
+    telemetry = None
+    if row.get("telemetry_ts") is not None:
+        telemetry = {
+            "lat": row.get("lat"),
+            "lon": row.get("lon"),
+            "speed_kmph": row.get("speed_kmph"),
+            "fuel_pct": row.get("fuel_pct"),
+            "ts": row.get("telemetry_ts"),
         }
-        response = supabase_client.from_("agent_audit_logs").insert(log_entry).execute()
-        if response.data:
-            print(f"--- Successfully logged decision for {agent_name} ---")
+    return {
+        "shipment_id": row.get("shipment_id"),
+        "status": row.get("status"),
+        "current_eta": row.get("current_eta"),
+        "expected_arrival": row.get("expected_arrival"),
+        "vehicle_id": row.get("vehicle_id"),
+        "latest_telemetry": telemetry,
+    }
+
+
+def _fetch_tracking(shipment_ids: list[str]) -> list[dict]:
+    response = supabase_client.rpc("get_shipment_tracking", {"shipment_ids": shipment_ids}).execute()
+    return [_tracking_record(row) for row in response.data or []]
+
+
+class ShipmentTrackingSchema(BaseModel):
+    """Input schema for the shipment tracking tool."""
+    shipment_id: str = Field(description="The UUID of the shipment to track.")
+
+
+@tool("shipment-tracking-lookup", args_schema=ShipmentTrackingSchema)
+@timed_tool("shipment-tracking-lookup")
+@tool_cache.cached("shipment-tracking-lookup")
+def get_shipment_tracking(shipment_id: str) -> dict:
+    """Looks up a shipment's status, ETA and vehicle together with the vehicle's latest position, speed and fuel level."""
+    print(f"--- Tool Executing: get_shipment_tracking for ID: {shipment_id} ---")
+    try:
+        records = _fetch_tracking([shipment_id])
+        if records:
+            return records[0]
         else:
-            print(
-                f"!!! WARNING: Failed to log decision for {agent_name}. Response: {response.error or 'No data returned'}"
-            )
+            return {"error": "Shipment not found."}
     except Exception as e:
-        print(f"!!! CRITICAL WARNING: An exception occurred during audit logging: {e}")
-        print(traceback.format_exc())
+        return {"error": f"Database error: {str(e)}"}
+
+
+class BulkShipmentTrackingSchema(BaseModel):
+    """Input schema for the bulk shipment tracking tool."""
+    shipment_ids: list[str] = Field(description="The UUIDs of the shipments to track.")
+
+
+@tool("bulk-shipment-tracking-lookup", args_schema=BulkShipmentTrackingSchema)
+@timed_tool("bulk-shipment-tracking-lookup")
+@tool_cache.cached("bulk-shipment-tracking-lookup")
+def get_bulk_shipment_tracking(shipment_ids: list[str]) -> dict:
+    """Tracks several shipments at once: status, ETA, vehicle and the vehicle's latest position for each."""
+    print(f"--- Tool Executing: get_bulk_shipment_tracking for {len(shipment_ids)} shipments ---")
+    try:
+        if not shipment_ids:
+            return {"error": "No shipment IDs provided."}
+        if len(shipment_ids) > MAX_BULK_SHIPMENTS:
+            return {"error": f"At most {MAX_BULK_SHIPMENTS} shipments can be tracked at once."}
+        requested = list(dict.fromkeys(shipment_ids))
+        # One malformed ID would make Postgres reject the whole uuid[] argument.
+        valid = [shipment_id for shipment_id in requested if UUID_PATTERN.fullmatch(shipment_id.strip())]
+        records = _fetch_tracking([shipment_id.strip() for shipment_id in valid]) if valid else []
+        found = {str(record["shipment_id"]).lower() for record in records}
+        result = {
+            "shipments": records,
+            "not_found": [shipment_id for shipment_id in requested if shipment_id.strip().lower() not in found],
+        }
+        return fit_tool_output("bulk-shipment-tracking-lookup", result)
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
+
+# --- Async counterparts ---
+# Each tool gets an explicit coroutine so `AgentExecutor.ainvoke` never runs a
+# blocking Supabase call on the event loop.
+for _tool in (
+    get_shipment_status,
+    get_inventory_level,
+    find_best_packaging,
+    calculate_route_fuel_cost,
+    get_order_details,
+    get_vehicle_location,
+    get_shipment_tracking,
+    get_bulk_shipment_tracking,
+):
+    _tool.coroutine = _in_thread(_tool.func)
+
+
+# --- Utility Function for Audit Logging (NOT a tool for the LLM) ---
+def _audit_record(agent_name: str, query: str, decision: dict | str) -> dict:
+    return {
+        "agent_name": agent_name,
+        "input_context": {"query": query},
+        "decision_json": decision if isinstance(decision, dict) else {"output": decision},
+        "confidence": 0.95,  # Placeholder
+    }
+
+
+def log_agent_decision(agent_name: str, query: str, decision: dict | str):
+    """
+    Queues the final output of an agent for the 'agent_audit_logs' table in Supabase.
+    The background `audit_log_writer` bulk-inserts queued records.
+    """
+    audit_log_writer.submit(_audit_record(agent_name, query, decision))
+
+
+async def alog_agent_decision(agent_name: str, query: str, decision: dict | str):
+    """Async variant of `log_agent_decision` for use inside the async graph nodes."""
+    with timed(AUDIT_LOG_LATENCY, agent=agent_name):
+        await audit_log_writer.asubmit(_audit_record(agent_name, query, decision))
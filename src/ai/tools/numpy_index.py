@@ -0,0 +1,367 @@
+"""
+In-process NumPy vector index over `documents`.
+
+For a knowledge base of a few thousand to a few hundred thousand snippets, a
+brute-force scan of a float32 matrix is faster than a network round trip to
+pgvector. The index holds L2-normalized embeddings, so cosine similarity is a
+single matrix-vector product, and it picks the top k with `argpartition`.
+
+On disk the index is two files in `settings.NUMPY_INDEX_DIR`:
+- `embeddings.npy`: the (n, dim) float32 matrix, opened with `mmap_mode="r"` so
+  every worker on the host shares the same page cache;
+- `documents.json`: the ID sidecar with doc_id and the metadata used for
+  filtering and for building `Document`s, in matrix row order.
+
+The index loads from those files, or else from the `documents` table, or else
+from `data/documents.json` (embedding the snippets with the shared model).
+Documents stored at runtime (e.g. embedded incident reports) are added with `append`,
+which keeps them in a growable in-memory block next to the read-only memmap.
+Rebuild the files with `python -m src.scripts.build_numpy_index`.
+
+With `quantization="int8"` (NUMPY_INDEX_QUANTIZATION) the scan runs over an
+int8 copy of the base rows with one float32 scale per row, a quarter of the
+float32 size. The best `k * RETRIEVER_RERANK_FACTOR` candidates are then
+rescored against the float32 rows, which for a memmapped index only pages in
+those rows.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ...config import settings
+
+EMBEDDINGS_FILE = "embeddings.npy"
+SIDECAR_FILE = "documents.json"
+METADATA_FIELDS = ("doc_id", "source_type", "region_id", "ts", "text_snippet")
+DOCUMENTS_JSON_PATH = os.path.join("data", "documents.json")
+DEFAULT_DIM = 384  # documents.embedding is vector(384)
+QUANTIZATIONS = ("none", "int8")
+SCAN_BLOCK_ROWS = 1024  # int8 rows widened to float32 per step of a quantized scan
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _parse_ts(value) -> Optional[np.datetime64]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "us")
+
+
+def _quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: row ~= codes * scale."""
+    codes = np.empty(matrix.shape, dtype=np.int8)
+    scales = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], SCAN_BLOCK_ROWS):
+        block = np.asarray(matrix[start: start + SCAN_BLOCK_ROWS], dtype=np.float32)
+        block_scales = np.abs(block).max(axis=1) / 127.0
+        block_scales[block_scales == 0] = 1.0
+        codes[start: start + len(block)] = np.rint(block / block_scales[:, None])
+        scales[start: start + len(block)] = block_scales
+    return codes, scales
+
+
+class NumpyVectorIndex:
+    """Thread-safe brute-force cosine index: memmapped base rows plus appended rows."""
+
+    def __init__(self, dim: int, model_name: str, quantization: str = "none"):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}, got {quantization!r}")
+        self.dim = dim
+        self.model_name = model_name
+        self.quantization = quantization
+        self._lock = threading.Lock()
+        self._base = np.zeros((0, dim), dtype=np.float32)
+        # int8 codes and per-row scales of `_base` when quantized.
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._tail = np.zeros((64, dim), dtype=np.float32)
+        self._tail_size = 0
+        self._records: List[Dict[str, Any]] = []
+        # Column arrays for vectorized filtering, built on the first filtered
+        # search and extended in place by `append`; rows past len(_records) are spare.
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # --- Construction ---
+
+    @classmethod
+    def from_arrays(
+        cls, embeddings: np.ndarray, records: List[Dict[str, Any]], model_name: str, quantization: str = "none"
+    ) -> "NumpyVectorIndex":
+        embeddings = _normalize(embeddings).reshape(len(records), -1)
+        index = cls(dim=embeddings.shape[1], model_name=model_name, quantization=quantization)
+        index._set_base(embeddings)
+        index._records = [{field: record.get(field) for field in METADATA_FIELDS} for record in records]
+        return index
+
+    @classmethod
+    def load(cls, directory: str, quantization: str = "none") -> "NumpyVectorIndex":
+        """Opens a saved index; the embedding matrix is memory-mapped, not read."""
+        with open(os.path.join(directory, SIDECAR_FILE), encoding="utf-8") as sidecar:
+            header = json.load(sidecar)
+        base = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        if base.shape[0] != len(header["documents"]):
+            raise ValueError(
+                f"{EMBEDDINGS_FILE} has {base.shape[0]} rows but {SIDECAR_FILE} lists {len(header['documents'])} documents"
+            )
+        index = cls(dim=base.shape[1], model_name=header.get("model"), quantization=quantization)
+        index._set_base(base)
+        index._records = header["documents"]
+        return index
+
+    @classmethod
+    def from_database(cls, db_uri: str, model_name: str, quantization: str = "none") -> "NumpyVectorIndex":
+        """Reads every embedded row of `documents`."""
+        from .pg_pool import get_vector_pool
+
+        with get_vector_pool(db_uri).connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT doc_id, source_type, region_id, ts, text_snippet, embedding "
+                    "FROM documents WHERE embedding IS NOT NULL ORDER BY doc_id"
+                )
+                rows = cur.fetchall()
+        records = [
+            {
+                "doc_id": str(doc_id),
+                "source_type": source_type,
+                "region_id": region_id,
+                "ts": ts.isoformat() if ts else None,
+                "text_snippet": text_snippet,
+            }
+            for doc_id, source_type, region_id, ts, text_snippet, _ in rows
+        ]
+        if not rows:
+            return cls(dim=DEFAULT_DIM, model_name=model_name, quantization=quantization)
+        # Newer pgvector releases return `Vector` objects rather than arrays.
+        embeddings = np.vstack([
+            np.asarray(row[5].to_numpy() if hasattr(row[5], "to_numpy") else row[5], dtype=np.float32)
+            for row in rows
+        ])
+        return cls.from_arrays(embeddings, records, model_name, quantization)
+
+    @classmethod
+    def from_json(cls, path: str, model_name: str, quantization: str = "none") -> "NumpyVectorIndex":
+        """Builds the index from a seed file such as `data/documents.json`, embedding the snippets."""
+        from ..embeddings import get_embedding_model
+
+        with open(path, encoding="utf-8") as source:
+            records = json.load(source)
+        if not records:
+            return cls(dim=DEFAULT_DIM, model_name=model_name, quantization=quantization)
+        texts = [record.get("text_snippet") or "" for record in records]
+        embeddings = get_embedding_model(model_name).encode(texts, batch_size=64, normalize_embeddings=True)
+        return cls.from_arrays(embeddings, records, model_name, quantization)
+
+    def _set_base(self, base: np.ndarray):
+        self._base = base
+        if self.quantization == "int8":
+            self._codes, self._scales = _quantize_int8(base)
+
+    def save(self, directory: str):
+        """Writes the index atomically so workers never map a half-written file."""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            matrix = np.vstack([self._base, self._tail[: self._tail_size]])
+            records = list(self._records)
+        embeddings_path = os.path.join(directory, EMBEDDINGS_FILE)
+        sidecar_path = os.path.join(directory, SIDECAR_FILE)
+        np.save(f"{embeddings_path}.tmp.npy", matrix)
+        with open(f"{sidecar_path}.tmp", "w", encoding="utf-8") as sidecar:
+            json.dump({"model": self.model_name, "dim": self.dim, "documents": records}, sidecar)
+        os.replace(f"{embeddings_path}.tmp.npy", embeddings_path)
+        os.replace(f"{sidecar_path}.tmp", sidecar_path)
+
+    # --- Updates ---
+
+    def append(self, embedding, record: Dict[str, Any]):
+        """Adds one document; rows live in memory until the next `save`."""
+        vector = _normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"expected a {self.dim}-dimensional embedding, got {vector.shape[0]}")
+        with self._lock:
+            if self._tail_size == len(self._tail):
+                grown = np.zeros((len(self._tail) * 2, self.dim), dtype=np.float32)
+                grown[: self._tail_size] = self._tail
+                self._tail = grown
+            self._tail[self._tail_size] = vector
+            self._tail_size += 1
+            self._records.append({field: record.get(field) for field in METADATA_FIELDS})
+            if self._columns is not None:
+                self._append_columns_locked(self._records[-1])
+
+    # --- Search ---
+
+    def search(
+        self,
+        query_embedding,
+        k: int,
+        doc_filter=None,
+        with_vectors: bool = False,
+    ) -> List[tuple]:
+        """
+        Returns up to k (record, cosine similarity) pairs, best first; with
+        `with_vectors`, (record, similarity, normalized float32 embedding) triples.
+        """
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        with self._lock:
+            base, tail = self._base, self._tail[: self._tail_size]
+            codes, scales = self._codes, self._scales
+            records = self._records  # append-only, so rows [0, count) stay valid
+            count = len(records)
+            mask = self._filter_mask(doc_filter) if doc_filter is not None else None
+        if not count:
+            return []
+
+        scores = np.empty(count, dtype=np.float32)
+        if codes is not None:
+            # Blocks small enough for the widened copy to stay in cache.
+            widened = np.empty((min(SCAN_BLOCK_ROWS, len(codes)), self.dim), dtype=np.float32)
+            for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+                block = codes[start: start + SCAN_BLOCK_ROWS]
+                rows = widened[: len(block)]
+                rows[...] = block
+                scores[start: start + len(block)] = (rows @ query) * scales[start: start + len(block)]
+        else:
+            scores[: len(base)] = base @ query
+        scores[len(base):] = tail @ query
+        if mask is not None:
+            scores[~mask] = -np.inf
+            candidates = int(mask.sum())
+        else:
+            candidates = len(scores)
+        k = min(k, candidates)
+        if k <= 0:
+            return []
+
+        if codes is not None:
+            # Rescore the best approximate candidates against the float32 rows.
+            shortlist = _top_k(scores, min(k * settings.RETRIEVER_RERANK_FACTOR, candidates))
+            exact = scores[shortlist]
+            in_base = shortlist < len(base)
+            exact[in_base] = base[shortlist[in_base]] @ query
+            order = np.argsort(-exact)[:k]
+            top, top_scores = shortlist[order], exact[order]
+        else:
+            top = _top_k(scores, k)
+            top_scores = scores[top]
+
+        if not with_vectors:
+            return [(records[i], float(score)) for i, score in zip(top, top_scores)]
+        return [
+            (records[i], float(score), np.array(base[i] if i < len(base) else tail[i - len(base)]))
+            for i, score in zip(top, top_scores)
+        ]
+
+    def _columns_locked(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            self._columns = {
+                "source_type": np.array([r.get("source_type") for r in self._records], dtype=object),
+                "region_id": np.array([r.get("region_id") for r in self._records], dtype=object),
+                "ts": np.array(
+                    [_parse_ts(r.get("ts")) for r in self._records], dtype="datetime64[us]"
+                ),
+            }
+        size = len(self._records)
+        return {name: column[:size] for name, column in self._columns.items()}
+
+    def _append_columns_locked(self, record: Dict[str, Any]):
+        """Adds the last appended record to the filter columns, doubling them when full."""
+        row = len(self._records) - 1
+        for name, column in self._columns.items():
+            if row == len(column):
+                grown = np.empty(max(2 * len(column), 64), dtype=column.dtype)
+                grown[:row] = column
+                self._columns[name] = grown
+        self._columns["source_type"][row] = record.get("source_type")
+        self._columns["region_id"][row] = record.get("region_id")
+        self._columns["ts"][row] = _parse_ts(record.get("ts"))
+
+    def _filter_mask(self, doc_filter) -> np.ndarray:
+        """Vectorized equivalent of the WHERE clause built by `_similarity_query`."""
+        columns = self._columns_locked()
+        mask = np.ones(len(self._records), dtype=bool)
+        if doc_filter.source_types:
+            mask &= np.isin(columns["source_type"], list(doc_filter.source_types))
+        if doc_filter.region_ids:
+            region = columns["region_id"]
+            mask &= np.isin(region, list(doc_filter.region_ids)) | np.equal(region, None)
+        if doc_filter.ts_from is not None:
+            mask &= columns["ts"] >= _parse_ts(doc_filter.ts_from)
+        if doc_filter.ts_to is not None:
+            mask &= columns["ts"] < _parse_ts(doc_filter.ts_to)
+        return mask
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._records),
+                "memory_mapped_rows": len(self._base),
+                "appended_rows": self._tail_size,
+                "dim": self.dim,
+                "model": self.model_name,
+                "quantization": self.quantization,
+                # Bytes scanned per query for the base rows.
+                "scan_bytes": int(self._codes.nbytes + self._scales.nbytes)
+                if self._codes is not None else int(self._base.nbytes),
+            }
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+
+# --- Process-wide index ---
+
+_index: Optional[NumpyVectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def load_numpy_index() -> NumpyVectorIndex:
+    """Loads the saved index, falling back to the database and then the JSON seed file."""
+    directory = settings.NUMPY_INDEX_DIR
+    model_name = settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2"
+    quantization = settings.NUMPY_INDEX_QUANTIZATION
+    if os.path.exists(os.path.join(directory, SIDECAR_FILE)):
+        index = NumpyVectorIndex.load(directory, quantization)
+        if index.model_name == model_name:
+            return index
+        print(f"[warning] NumPy index in {directory} was built with {index.model_name}, not {model_name}; rebuilding")
+    try:
+        return NumpyVectorIndex.from_database(settings.DB_CONNECTION_STRING, model_name, quantization)
+    except Exception as exc:
+        print(f"[warning] could not load the NumPy index from the database, using {DOCUMENTS_JSON_PATH}: {exc}")
+    return NumpyVectorIndex.from_json(DOCUMENTS_JSON_PATH, model_name, quantization)
+
+
+def get_numpy_index() -> NumpyVectorIndex:
+    """The shared index, loaded on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_numpy_index()
+                print(f"--- NumPy vector index loaded with {len(_index)} documents ---")
+    return _index
+
+
+def loaded_numpy_index() -> Optional[NumpyVectorIndex]:
+    """The shared index if something has loaded it, without triggering a load."""
+    return _index
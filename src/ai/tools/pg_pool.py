@@ -0,0 +1,165 @@
+"""
+psycopg2 connection pool for the pgvector retrievers.
+
+Opening a connection per retrieval costs a TCP + TLS handshake to Supabase and a
+`register_vector` catalog lookup on every RAG question. Connections here are
+opened once, have `register_vector` run once, and remember which statements
+they have already PREPAREd, so each query after the first only sends an EXECUTE.
+
+Named prepared statements do not survive a transaction-mode pooler (Supabase's
+port 6543 PgBouncer). Point DB_CONNECTION_STRING at the session pooler or the
+direct port, or set RETRIEVER_PREPARED_STATEMENTS=false.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+from pgvector.psycopg2 import register_vector
+
+from ...config import settings
+
+
+class VectorConnection(psycopg2.extensions.connection):
+    """A connection that tracks its one-time setup and prepared statements."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.initialized = False
+        self.prepared_statements: Dict[str, str] = {}
+        self.search_settings: Dict[str, Optional[int]] = {}
+
+
+def _setup(conn: VectorConnection):
+    """One-time per-connection setup."""
+    if conn.initialized:
+        return
+    conn.autocommit = True
+    register_vector(conn)
+    with conn.cursor() as cur:
+        # Prepared statements would otherwise switch to a generic plan after five
+        # executions, and a generic plan cannot prove that `source_type = ANY($3)`
+        # matches a partial index predicate. Planning this query is cheap.
+        cur.execute("SET plan_cache_mode = force_custom_plan")
+    conn.initialized = True
+
+
+class VectorConnectionPool:
+    """
+    Thread-safe pool of `VectorConnection`s. `ThreadedConnectionPool` raises when
+    it is exhausted, so a semaphore makes callers wait for a free connection instead.
+    """
+
+    def __init__(self, db_uri: str, min_connections: int, max_connections: int):
+        self.db_uri = db_uri
+        self.max_connections = max_connections
+        self._pool = ThreadedConnectionPool(
+            min_connections,
+            max_connections,
+            db_uri,
+            connection_factory=VectorConnection,
+        )
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    @contextmanager
+    def connection(self) -> Iterator[VectorConnection]:
+        """Checks out a ready connection; broken connections are discarded, not reused."""
+        with self._slots:
+            conn = self._pool.getconn()
+            broken = False
+            try:
+                _setup(conn)
+                yield conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True
+                raise
+            finally:
+                self._pool.putconn(conn, close=broken or conn.closed != 0)
+
+    def warm(self, connections: int = None):
+        """Opens and sets up `connections` pooled connections ahead of the first query."""
+        count = min(connections or self.max_connections, self.max_connections)
+        conns = []
+        try:
+            for _ in range(count):
+                conn = self._pool.getconn()
+                conns.append(conn)
+                _setup(conn)
+        finally:
+            for conn in conns:
+                self._pool.putconn(conn)
+
+    def close(self):
+        self._pool.closeall()
+
+
+def execute_prepared(cursor, conn: VectorConnection, name: str, sql: str, params: tuple):
+    """
+    Runs `sql` (written with $1, $2... placeholders) as a named prepared statement,
+    preparing it the first time this connection sees it.
+    """
+    if not settings.RETRIEVER_PREPARED_STATEMENTS:
+        named = {f"p{index}": value for index, value in enumerate(params, start=1)}
+        cursor.execute(_inline_placeholders(sql, len(params)), named)
+        return
+    if conn.prepared_statements.get(name) != sql:
+        if name in conn.prepared_statements:
+            cursor.execute(f"DEALLOCATE {name}")
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared_statements[name] = sql
+    placeholders = ", ".join(["%s"] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", params)
+
+
+def apply_search_settings(cursor, conn: VectorConnection, search_settings: Dict[str, Optional[int]]):
+    """
+    Sets session-level index search parameters (e.g. `hnsw.ef_search`) for this
+    query, skipping the round trip when the connection already has those values.
+    None restores the server default. Values are only recorded once applied.
+    """
+    statements, changed = [], {}
+    for name, value in search_settings.items():
+        if conn.search_settings.get(name) == value:
+            continue
+        statements.append(f"RESET {name}" if value is None else f"SET {name} = {int(value)}")
+        changed[name] = value
+    if not statements:
+        return
+    try:
+        cursor.execute("; ".join(statements))
+    except Exception:
+        # Some of the statements may have run; forget these so the next query sends them again.
+        for name in changed:
+            conn.search_settings.pop(name, None)
+        raise
+    conn.search_settings.update(changed)
+
+
+def _inline_placeholders(sql: str, count: int) -> str:
+    """Rewrites $n placeholders to psycopg2's %(pn)s style for unprepared execution."""
+    sql = sql.replace("%", "%%")
+    for index in range(count, 0, -1):
+        sql = sql.replace(f"${index}", f"%(p{index})s")
+    return sql
+
+
+_pools: Dict[str, VectorConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_vector_pool(db_uri: str) -> VectorConnectionPool:
+    """Returns the process-wide pool for `db_uri`, creating it on first use."""
+    pool = _pools.get(db_uri)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_uri)
+            if pool is None:
+                pool = VectorConnectionPool(
+                    db_uri,
+                    min_connections=settings.RETRIEVER_POOL_MIN_CONNECTIONS,
+                    max_connections=settings.RETRIEVER_POOL_MAX_CONNECTIONS,
+                )
+                _pools[db_uri] = pool
+    return pool
@@ -0,0 +1,134 @@
+"""
+Per-tool TTL memoization for the Supabase-backed LangChain tools.
+
+Agents often call the same tool with the same arguments several times within a
+conversation, and many users ask about the same shipments. Each tool gets its
+own TTL, matched to how quickly the underlying data changes: seconds for
+vehicle telemetry, minutes for shipments and orders, an hour for packaging
+types. Services that mutate the data call `tool_cache.invalidate(...)` so
+answers never outlive a write made through this API.
+"""
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+from ...config import settings
+
+# Time-to-live in seconds per tool name.
+TOOL_TTLS: Dict[str, float] = {
+    "vehicle-location-lookup": 5,
+    "shipment-status-lookup": 30,
+    # Status plus live telemetry, so the telemetry TTL applies.
+    "shipment-tracking-lookup": 5,
+    "bulk-shipment-tracking-lookup": 5,
+    "inventory-level-lookup": 60,
+    "order-details-lookup": 120,
+    "packaging-optimizer": 3600,
+}
+
+
+def _freeze(value: Any):
+    """Turns tool arguments into a hashable cache key component."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return str(value)
+
+
+class ToolCache:
+    """Thread-safe TTL caches, one per tool, with hit/miss counters."""
+
+    def __init__(self, max_entries_per_tool: int = 1024):
+        self.max_entries_per_tool = max_entries_per_tool
+        self._lock = threading.Lock()
+        self._stores: Dict[str, "OrderedDict[Tuple, Tuple[float, Any]]"] = {}
+        self._signatures: Dict[str, inspect.Signature] = {}
+        self._ttls: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def cached(self, tool_name: str, ttl: float = None) -> Callable:
+        """Decorator memoizing a tool function by its arguments for `ttl` seconds."""
+        ttl = TOOL_TTLS.get(tool_name, 30) if ttl is None else ttl
+
+        def decorator(func: Callable) -> Callable:
+            signature = inspect.signature(func)
+            with self._lock:
+                self._stores[tool_name] = OrderedDict()
+                self._signatures[tool_name] = signature
+                self._ttls[tool_name] = ttl
+                self._stats[tool_name] = {"hits": 0, "misses": 0, "invalidations": 0}
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not settings.TOOL_CACHE_ENABLED:
+                    return func(*args, **kwargs)
+                key = self._key(tool_name, *args, **kwargs)
+                now = time.monotonic()
+                with self._lock:
+                    store = self._stores[tool_name]
+                    entry = store.get(key)
+                    if entry is not None and entry[0] > now:
+                        store.move_to_end(key)
+                        self._stats[tool_name]["hits"] += 1
+                        return copy.deepcopy(entry[1])
+                    self._stats[tool_name]["misses"] += 1
+
+                result = func(*args, **kwargs)
+
+                # Errors (e.g. a transient database failure) are not worth remembering.
+                if not (isinstance(result, dict) and "error" in result):
+                    with self._lock:
+                        store = self._stores[tool_name]
+                        store[key] = (time.monotonic() + ttl, copy.deepcopy(result))
+                        store.move_to_end(key)
+                        while len(store) > self.max_entries_per_tool:
+                            store.popitem(last=False)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, tool_name: str, **arguments) -> bool:
+        """Drops the cached result of `tool_name` for the given arguments."""
+        with self._lock:
+            if tool_name not in self._stores:
+                return False
+            key = self._key(tool_name, **arguments)
+            removed = self._stores[tool_name].pop(key, None) is not None
+            if removed:
+                self._stats[tool_name]["invalidations"] += 1
+            return removed
+
+    def clear(self, tool_name: str = None):
+        """Drops every cached result, or only those of one tool."""
+        with self._lock:
+            for name, store in self._stores.items():
+                if tool_name is None or name == tool_name:
+                    store.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for name, counters in self._stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                result[name] = {
+                    **counters,
+                    "entries": len(self._stores[name]),
+                    "ttl_seconds": self._ttls[name],
+                    "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+                }
+            return result
+
+    def _key(self, tool_name: str, *args, **kwargs) -> Tuple:
+        bound = self._signatures[tool_name].bind(*args, **kwargs)
+        bound.apply_defaults()
+        return tuple((name, _freeze(value)) for name, value in bound.arguments.items())
+
+
+tool_cache = ToolCache()
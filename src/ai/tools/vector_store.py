@@ -1,99 +1,312 @@
 import os
-from typing import List, Any
+import re
+import asyncio
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import List, Any, Optional, Tuple
 from dotenv import load_dotenv
-import psycopg2
-from pgvector.psycopg2 import register_vector
+import numpy as np
 
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from sentence_transformers import SentenceTransformer
 from ...config import settings
+from ..embeddings import get_embedding_model, get_embeddings
+from ...metrics import RETRIEVAL_LATENCY, timed
+from .numpy_index import DEFAULT_DIM, get_numpy_index
+from .pg_pool import apply_search_settings, execute_prepared, get_vector_pool
 
 DB_CONNECTION_STRING = settings.DB_CONNECTION_STRING
-EMBEDDING_MODEL_NAME = settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2"
+
+# Regions used by documents.region_id; "deliveries in the west region" narrows
+# retrieval to region_id = 'west' when a filter has `infer_region` set.
+REGION_PATTERN = re.compile(r"\b(north|south|east|west)(?:ern)?\s+(?:region|zone)\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DocumentFilter:
+    """
+    Metadata restrictions applied before the similarity ranking. Empty fields
+    mean "no restriction". `max_age` is a rolling window relative to query time.
+    A region restriction still matches rows whose region_id is NULL, since
+    incident reports are stored without one.
+    """
+    source_types: Optional[Tuple[str, ...]] = None
+    region_ids: Optional[Tuple[str, ...]] = None
+    ts_from: Optional[datetime] = None
+    ts_to: Optional[datetime] = None
+    max_age: Optional[timedelta] = None
+    infer_region: bool = False
+
+    def for_query(self, query: str) -> "DocumentFilter":
+        """Resolves the rolling window and, if enabled, a region mentioned in the query."""
+        resolved = self
+        if self.max_age is not None:
+            window_start = datetime.now(timezone.utc) - self.max_age
+            ts_from = max(self.ts_from, window_start) if self.ts_from else window_start
+            resolved = replace(resolved, ts_from=ts_from, max_age=None)
+        if self.infer_region and not self.region_ids:
+            regions = tuple(sorted({match.lower() for match in REGION_PATTERN.findall(query)}))
+            if regions:
+                resolved = replace(resolved, region_ids=regions)
+        return resolved
+
+
+# Orderings for `RETRIEVER_QUANTIZATION`; each must match the expression of the
+# index built by `manage_vector_index --quantization` to be served by it.
+QUANTIZED_ORDERINGS = {
+    "halfvec": f"embedding::halfvec({DEFAULT_DIM}) <=> $1::vector::halfvec({DEFAULT_DIM})",
+    "binary": f"binary_quantize(embedding)::bit({DEFAULT_DIM}) <~> binary_quantize($1::vector)",
+}
+
+
+def _similarity_query(
+    doc_filter: Optional[DocumentFilter],
+    quantization: str = "none",
+    candidates: Optional[int] = None,
+) -> Tuple[str, str, list]:
+    """
+    Builds the similarity search for a filter. Returns the prepared statement name,
+    the SQL and the extra parameters; $1 is always the query embedding (used for
+    both the score and the ordering) and $2 is k. Rows carry their embedding for
+    the MMR step of `ContextAssembler`.
+
+    Each combination of filters gets its own statement name, so a pooled connection
+    keeps all the shapes it has seen prepared. `source_type = ANY($n)` matches the
+    predicate of the partial indexes built by `manage_vector_index --source-types`.
+
+    With a `quantization` from `QUANTIZED_ORDERINGS`, the index scan ranks
+    `candidates` rows on the compact vectors and the outer query reranks them
+    by the full-precision distance.
+    """
+    conditions, params, shape = [], [], ""
+    if doc_filter is not None:
+        for column, value, operator, code in (
+            ("source_type", doc_filter.source_types, "= ANY", "s"),
+            ("region_id", doc_filter.region_ids, "= ANY", "r"),
+            ("ts", doc_filter.ts_from, ">=", "f"),
+            ("ts", doc_filter.ts_to, "<", "t"),
+        ):
+            if value is None or value == ():
+                continue
+            params.append(list(value) if isinstance(value, tuple) else value)
+            placeholder = f"${len(params) + 2}"
+            if column == "region_id":
+                # Rows without a region (e.g. incident reports) are not tied to one; keep them.
+                conditions.append(f"(region_id = ANY({placeholder}) OR region_id IS NULL)")
+            elif operator == "= ANY":
+                conditions.append(f"{column} = ANY({placeholder})")
+            else:
+                conditions.append(f"{column} {operator} {placeholder}")
+            shape += code
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    name = f"doc_similarity{'_' + shape if shape else ''}"
+
+    if quantization in QUANTIZED_ORDERINGS:
+        params.append(candidates)
+        sql = f"""
+    SELECT
+        doc_id,
+        text_snippet,
+        source_type,
+        1 - (embedding <=> $1) AS similarity,
+        embedding
+    FROM (
+        SELECT doc_id, text_snippet, source_type, embedding
+        FROM documents
+        {where}
+        ORDER BY {QUANTIZED_ORDERINGS[quantization]}
+        LIMIT ${len(params) + 2}
+    ) AS candidates
+    ORDER BY
+        embedding <=> $1
+    LIMIT $2
+"""
+        return f"{name}_{quantization}", sql, params
+
+    sql = f"""
+    SELECT
+        doc_id,
+        text_snippet,
+        source_type,
+        1 - (embedding <=> $1) AS similarity,
+        embedding
+    FROM
+        documents
+    {where}
+    ORDER BY
+        embedding <=> $1
+    LIMIT $2
+"""
+    return name, sql, params
+
 
 # --- Custom Retriever Definition ---
 
 class DirectPostgresRetriever(BaseRetriever):
     """
-    A custom retriever that connects directly to PostgreSQL using psycopg2
+    A custom retriever that queries PostgreSQL directly using psycopg2
     to execute a vector similarity search with the correct column names.
+    Connections come from a shared pool (see `pg_pool`) and the query is
+    prepared once per connection.
     """
 
     embedding_model: Any
     db_uri: str
     k_results: int = 5
+    agent_name: str = "shared"  # Label for the retrieval latency histogram
+    # Recall vs latency knobs for the ANN index (see src/scripts/manage_vector_index.py).
+    # None keeps the server default (hnsw.ef_search = 40, ivfflat.probes = 1).
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+    # Each RAG chain narrows the candidate set to its own slice of `documents`.
+    doc_filter: Optional[DocumentFilter] = None
+    # Serves the query when PostgreSQL fails (see RETRIEVER_NUMPY_FALLBACK).
+    fallback: Optional[BaseRetriever] = None
+    # "halfvec" or "binary" searches the compact index and reranks
+    # k_results * rerank_factor candidates at full precision.
+    quantization: str = "none"
+    rerank_factor: int = 4
 
     def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> List[Document]:
+        with timed(RETRIEVAL_LATENCY, agent=self.agent_name):
+            return self._search(query)
 
-        query_embedding = self.embedding_model.embed_query(query)
-        conn = None
+    def _search(self, query: str) -> List[Document]:
+        query_embedding = np.asarray(self.embedding_model.embed_query(query), dtype=np.float32)
+        doc_filter = self.doc_filter.for_query(query) if self.doc_filter else None
+        statement, sql, filter_params = _similarity_query(
+            doc_filter, self.quantization, self.k_results * self.rerank_factor
+        )
         try:
-            conn = psycopg2.connect(self.db_uri)
-            register_vector(conn)
-            cur = conn.cursor()
-            sql_query = """
-                SELECT
-                    doc_id,
-                    text_snippet,
-                    source_type,
-                    1 - (embedding <=> %s::vector) AS similarity
-                FROM
-                    documents
-                ORDER BY
-                    embedding <=> %s::vector
-                LIMIT %s;
-            """
-
-            cur.execute(sql_query, (query_embedding, query_embedding, self.k_results))
-
-            results = cur.fetchall()
-            documents = []
-            for row in results:
-                doc_id, content, source, similarity = row
-                metadata = {
-                    "doc_id": str(doc_id),
-                    "source": source,
-                    "similarity_score": similarity,
-                }
-                doc = Document(page_content=content, metadata=metadata)
-                documents.append(doc)
-            return documents
+            with get_vector_pool(self.db_uri).connection() as conn:
+                with conn.cursor() as cur:
+                    apply_search_settings(
+                        cur, conn, {"hnsw.ef_search": self.ef_search, "ivfflat.probes": self.probes}
+                    )
+                    execute_prepared(
+                        cur, conn, statement, sql, (query_embedding, self.k_results, *filter_params)
+                    )
+                    results = cur.fetchall()
         except Exception as e:
             print(f"An error occurred in DirectPostgresRetriever: {e}")
+            if self.fallback is not None:
+                print(f"--- Falling back to the in-process vector index for {self.agent_name} ---")
+                return self.fallback._search(query)
             raise
-        finally:
-            if conn:
-                conn.close()
+
+        documents = []
+        for row in results:
+            doc_id, content, source, similarity, embedding = row
+            metadata = {
+                "doc_id": str(doc_id),
+                "source": source,
+                "similarity_score": similarity,
+                # Newer pgvector releases return `Vector` objects rather than arrays.
+                "embedding": embedding.to_numpy() if hasattr(embedding, "to_numpy") else embedding,
+            }
+            doc = Document(page_content=content, metadata=metadata)
+            documents.append(doc)
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # Both the embedding (CPU-bound) and psycopg2 (blocking I/O) would stall the
+        # event loop, so the whole lookup runs on a worker thread.
+        return await asyncio.to_thread(
+            self._get_relevant_documents, query, run_manager=run_manager.get_sync()
+        )
 
 
-def get_retriever(k_results: int = 5) -> BaseRetriever:
+class NumpyRetriever(BaseRetriever):
     """
-    Initializes and returns our custom direct-to-database retriever.
+    Retriever over the in-process NumPy index (see `numpy_index`). Same filters
+    and `Document` metadata as `DirectPostgresRetriever`, without a database call.
     """
-    embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+    embedding_model: Any
+    k_results: int = 5
+    agent_name: str = "shared"
+    doc_filter: Optional[DocumentFilter] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        with timed(RETRIEVAL_LATENCY, agent=self.agent_name):
+            return self._search(query)
+
+    def _search(self, query: str) -> List[Document]:
+        query_embedding = self.embedding_model.embed_query(query)
+        doc_filter = self.doc_filter.for_query(query) if self.doc_filter else None
+        results = get_numpy_index().search(query_embedding, self.k_results, doc_filter, with_vectors=True)
+        return [
+            Document(
+                page_content=record["text_snippet"] or "",
+                metadata={
+                    "doc_id": record["doc_id"],
+                    "source": record["source_type"],
+                    "similarity_score": similarity,
+                    "embedding": vector,
+                },
+            )
+            for record, similarity, vector in results
+        ]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # Embedding the query is the CPU-heavy part; keep it off the event loop.
+        return await asyncio.to_thread(
+            self._get_relevant_documents, query, run_manager=run_manager.get_sync()
+        )
+
+
+def get_retriever(
+    k_results: int = 5,
+    agent_name: str = "shared",
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    doc_filter: Optional[DocumentFilter] = None,
+) -> BaseRetriever:
+    """
+    Initializes and returns the retriever selected by `settings.RETRIEVER_BACKEND`:
+    "postgres" (default) searches pgvector directly, "numpy" searches the
+    in-process index. All retrievers share the process-wide embedding model;
+    `agent_name` labels the retrieval latency metrics. `ef_search` (HNSW, must be
+    >= k_results) and `probes` (IVFFlat) trade latency for recall when an ANN
+    index exists. `doc_filter` restricts the search by source type, region and
+    timestamp. `RETRIEVER_QUANTIZATION` switches the ANN search to half-precision
+    or binary vectors with a full-precision rerank.
+    """
+    numpy_retriever = NumpyRetriever(
+        embedding_model=get_embeddings(),
+        k_results=k_results,
+        agent_name=agent_name,
+        doc_filter=doc_filter,
+    )
+    if settings.RETRIEVER_BACKEND == "numpy":
+        return numpy_retriever
     return DirectPostgresRetriever(
-        embedding_model=embedding_model,
+        embedding_model=get_embeddings(),
         db_uri=DB_CONNECTION_STRING,
         k_results=k_results,
+        agent_name=agent_name,
+        ef_search=ef_search,
+        probes=probes,
+        doc_filter=doc_filter,
+        fallback=numpy_retriever if settings.RETRIEVER_NUMPY_FALLBACK else None,
+        quantization=settings.RETRIEVER_QUANTIZATION,
+        rerank_factor=settings.RETRIEVER_RERANK_FACTOR,
     )
 
-# --- Reusable Embedding Utility (Unchanged) ---
-
-_embedding_model_instance = None
-
-def get_embedding_model():
-    """Loads the SentenceTransformer model only once."""
-    global _embedding_model_instance
-    if _embedding_model_instance is None:
-        model_name = EMBEDDING_MODEL_NAME
-        print(f"--- Loading embedding model ({model_name}) for utility use... ---")
-        _embedding_model_instance = SentenceTransformer(model_name)
-    return _embedding_model_instance
+# --- Reusable Embedding Utility ---
+# `get_embedding_model` is re-exported from `..embeddings` for existing callers.
 
 
 def create_embedding(text: str) -> list[float]:
@@ -101,4 +314,4 @@ def create_embedding(text: str) -> list[float]:
     Takes a string of text and returns its vector embedding as a list of floats.
     """
     model = get_embedding_model()
-    return model.encode(text).tolist()
\ No newline at end of file
+    return model.encode(text).tolist()
@@ -0,0 +1,180 @@
+"""
+Background warm-up of the AI stack and per-component readiness tracking.
+
+The FastAPI lifespan starts `start_background_warmup()`, which loads the
+embedding model, fits the fast-path router, imports the RAG chains, builds the
+tool-calling executors and opens the database pools on a daemon thread.
+`/api/health/ready` reports `readiness.snapshot()`, so a load balancer only
+sends traffic to workers that have finished warming up. Components that fail
+(e.g. the database is briefly unreachable during a deploy) are retried. With
+`WARMUP_ENABLED=false` every component is marked "skipped", which counts as
+ready, and loads lazily on first use.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+
+from ..config import settings
+
+
+# Statuses under which a component does not hold back readiness.
+READY_STATUSES = ("ready", "skipped")
+
+
+class Readiness:
+    """Thread-safe status board: pending -> warming -> ready | failed, or skipped."""
+
+    def __init__(self, components: List[str]):
+        self._lock = threading.Lock()
+        self._state: Dict[str, dict] = {
+            name: {"status": "pending", "seconds": None, "error": None} for name in components
+        }
+
+    def mark(self, name: str, status: str, seconds: float = None, error: str = None):
+        with self._lock:
+            self._state[name] = {
+                "status": status,
+                "seconds": round(seconds, 3) if seconds is not None else None,
+                "error": error,
+            }
+
+    def status(self, name: str) -> str:
+        with self._lock:
+            return self._state[name]["status"]
+
+    @property
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(item["status"] in READY_STATUSES for item in self._state.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            components = {name: dict(item) for name, item in self._state.items()}
+        return {
+            "ready": all(item["status"] in READY_STATUSES for item in components.values()),
+            "components": components,
+        }
+
+
+# --- Warm-up steps ---
+
+def _warm_embedding_model():
+    from .embeddings import get_embedding_model
+
+    get_embedding_model().encode("warm-up")
+
+
+def _warm_router():
+    from .agents import fast_router
+
+    fast_router.classify("warm-up query for the local router", threshold=1.1)
+
+
+def _warm_rag_chains():
+    from .graph import _RAG_CHAINS, get_rag_chain
+
+    for agent_name in _RAG_CHAINS:
+        get_rag_chain(agent_name)
+
+
+def _warm_agent_executors():
+    from .graph import _EXECUTOR_FACTORIES, get_agent_executor
+
+    missing = [name for name in _EXECUTOR_FACTORIES if get_agent_executor(name) is None]
+    if missing:
+        raise RuntimeError(f"could not build executors: {', '.join(missing)}")
+
+
+def _warm_database():
+    from ..database import engine
+
+    # Check out a full pool's worth of connections so the TCP/TLS handshakes
+    # happen now rather than on the first requests.
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def _warm_vector_pool():
+    if settings.RETRIEVER_BACKEND == "numpy":
+        return
+    from .tools.pg_pool import get_vector_pool
+
+    get_vector_pool(settings.DB_CONNECTION_STRING).warm(settings.RETRIEVER_POOL_MIN_CONNECTIONS)
+
+
+def _warm_numpy_index():
+    if settings.RETRIEVER_BACKEND != "numpy" and not settings.RETRIEVER_NUMPY_FALLBACK:
+        return
+    from .tools.numpy_index import get_numpy_index
+
+    get_numpy_index()
+
+
+def _warm_supabase():
+    from .tools.database import supabase_client
+
+    supabase_client.from_("packaging_types").select("packaging_id").limit(1).execute()
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("embedding_model", _warm_embedding_model),
+    ("router", _warm_router),
+    ("rag_chains", _warm_rag_chains),
+    ("agent_executors", _warm_agent_executors),
+    ("database", _warm_database),
+    ("vector_pool", _warm_vector_pool),
+    ("numpy_index", _warm_numpy_index),
+    ("supabase", _warm_supabase),
+]
+
+readiness = Readiness([name for name, _ in WARMUP_STEPS])
+
+
+def _run_step(name: str, step: Callable[[], None]):
+    readiness.mark(name, "warming")
+    start = time.perf_counter()
+    try:
+        step()
+    except Exception as exc:
+        print(f"[warning] warm-up of '{name}' failed: {exc}")
+        readiness.mark(name, "failed", time.perf_counter() - start, str(exc))
+        return
+    readiness.mark(name, "ready", time.perf_counter() - start)
+    print(f"--- Warm-up: {name} ready in {time.perf_counter() - start:.2f}s ---")
+
+
+def warm_up(stop_event: threading.Event = None):
+    """Runs every warm-up step, then keeps retrying failed ones until all are ready."""
+    for name, step in WARMUP_STEPS:
+        _run_step(name, step)
+
+    while not readiness.is_ready:
+        if stop_event is not None and stop_event.wait(settings.WARMUP_RETRY_SECONDS):
+            return
+        if stop_event is None:
+            time.sleep(settings.WARMUP_RETRY_SECONDS)
+        for name, step in WARMUP_STEPS:
+            if readiness.status(name) == "failed":
+                _run_step(name, step)
+
+
+def skip_warmup():
+    """Marks every component as skipped when warm-up is disabled."""
+    for name, _ in WARMUP_STEPS:
+        readiness.mark(name, "skipped")
+
+
+def start_background_warmup(stop_event: threading.Event = None) -> threading.Thread:
+    """Starts `warm_up` on a daemon thread and returns it."""
+    thread = threading.Thread(target=warm_up, args=(stop_event,), name="ai-warmup", daemon=True)
+    thread.start()
+    return thread
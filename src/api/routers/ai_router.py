@@ -1,7 +1,20 @@
 from fastapi import APIRouter, Depends,HTTPException 
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from ...ai.graph import agent_graph  # Import from src/ai/
-from ...ai.schemas.graph_state import AgentState
+from typing import List
+import json
+from ... import security
+from ...config import settings
+from ...ai.agents.fast_router import router_stats
+from ...ai.agents.tool_fast_path import fast_path_stats
+from ...ai.response_cache import response_cache
+from ...ai.audit_log import audit_log_writer
+from ...ai.embeddings import get_embeddings
+from ...ai.incident_embedder import incident_embedder
+from ...ai.llm_scheduler import llm_scheduler
+from ...ai.single_flight import single_flight
+from ...ai.tools.tool_cache import tool_cache
+from ...services import ai_services
 import logging
 # from api.dependencies import get_current_user  # Use existing security if needed
 logger = logging.getLogger(__name__)
@@ -12,15 +25,136 @@ class QueryRequest(BaseModel):
     query: str
 
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+
+
 @router.post("/query")
-async def run_ai_query(request: QueryRequest):
+async def run_ai_query(request: QueryRequest, role: str = Depends(security.get_request_role)):
     try:
-        state = AgentState(initial_query=request.query, intermediate_steps=[])
-        result = agent_graph.invoke(state)
-        return {"response": result.get("final_response", "No response generated")}
+        response = await ai_services.run_agent_query(request.query, role=role)
+        return {"response": response}
     except Exception as e:
         logger.error(f"Error processing AI query: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"An error occurred while processing your request: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/query/batch")
+async def run_ai_query_batch(request: BatchQueryRequest):
+    """
+    Answers many queries in one call with batched routing and embeddings.
+    Results are returned in input order, each with its own `error` field.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required.")
+    if len(request.queries) > settings.AI_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {settings.AI_BATCH_MAX_QUERIES} queries.",
+        )
+    try:
+        results = await ai_services.run_agent_batch(request.queries)
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Error processing AI query batch: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while processing your batch: {str(e)}"
+        )
+
+
+@router.post("/query/stream")
+async def stream_ai_query(request: QueryRequest, role: str = Depends(security.get_request_role)):
+    """
+    Server-Sent Events variant of /query. Emits `route`, `tool_start`, `tool_end`
+    and `token` events while the graph runs, then a `final` event with the answer.
+    """
+    async def event_source():
+        try:
+            async for item in ai_services.stream_agent_query(request.query, role=role):
+                payload = json.dumps(item["data"], default=str)
+                yield f"event: {item['event']}\ndata: {payload}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming AI query: {str(e)}", exc_info=True)
+            payload = json.dumps({"detail": f"An error occurred while processing your request: {str(e)}"})
+            yield f"event: error\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/query/coalescing/stats")
+def get_query_coalescing_stats():
+    """Graph runs started vs identical concurrent queries that joined one in flight."""
+    return single_flight.stats()
+
+
+@router.get("/router/stats")
+def get_router_stats():
+    """Fast-path vs LLM routing counts and their p50 routing latencies."""
+    return router_stats.snapshot()
+
+
+class CacheInvalidationRequest(BaseModel):
+    entity_ids: List[str]
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Hit rate and latency saved by the semantic response cache."""
+    return response_cache.stats()
+
+
+@router.get("/tools/fast-path/stats")
+def get_tool_fast_path_stats():
+    """Per-agent counts of queries answered by direct tool calls vs the agent loop."""
+    return fast_path_stats.snapshot()
+
+
+@router.get("/tools/cache/stats")
+def get_tool_cache_stats():
+    """Per-tool hit/miss counts and TTLs of the database tool cache."""
+    return tool_cache.stats()
+
+
+@router.get("/embeddings/stats")
+def get_embedding_cache_stats():
+    """Hit/miss counts of the query embedding cache."""
+    return get_embeddings().cache_stats()
+
+
+@router.get("/audit/stats")
+def get_audit_log_stats():
+    """Queue depth and write/drop/spill counts of the background audit log writer."""
+    return audit_log_writer.stats()
+
+
+@router.get("/llm/stats")
+def get_llm_scheduler_stats():
+    """In-flight calls, per-priority queue depth and 429 counts of the LLM scheduler."""
+    return llm_scheduler.stats()
+
+
+@router.get("/incidents/embedding-stats")
+def get_incident_embedding_stats():
+    """Queue depth and batch counts of the background incident report embedder."""
+    return incident_embedder.stats()
+
+
+@router.post("/cache/invalidate")
+def invalidate_cache(
+    request: CacheInvalidationRequest,
+    current_user=Depends(security.get_admin_user),
+):
+    """
+    Drops cached answers mentioning the given shipment, order, vehicle or SKU IDs.
+    Intended for writers outside this API, e.g. inventory table updates.
+    """
+    removed = ai_services.invalidate_cached_answers(*request.entity_ids)
+    return {"invalidated": removed}
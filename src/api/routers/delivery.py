@@ -3,47 +3,58 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
 
 # Adjust imports based on your project structure
+from ...config import settings
 from ...database import get_db  # Correctly imports from src/database.py
 from ...models.document import Document
 from ...schemas.delivery import IncidentReport
-
-# Load the sentence transformer model
-embedding_model_name = "all-MiniLM-L6-v2"
-model = SentenceTransformer(embedding_model_name)
+from ...ai.incident_embedder import incident_embedder, incident_text
 
 router = APIRouter()
 
 @router.post("/report-incident", status_code=201)
-async def report_incident(incident: IncidentReport, db: Session = Depends(get_db)):
+def report_incident(incident: IncidentReport, db: Session = Depends(get_db)):
     """
-    Receives an incident report, generates embeddings, and stores it in the database.
+    Receives an incident report and stores it in the database. The embedding is
+    computed by the background incident embedder; the report becomes searchable
+    once it has been written.
     """
+    # A plain `def` endpoint runs on FastAPI's threadpool, so the blocking commit
+    # does not stall the event loop.
     try:
-        text_to_embed = (
-            f"Incident Type: {incident.incidentType}. "
-            f"Severity: {incident.severity}. "
-            f"Description: {incident.description}"
-        )
-        embedding_vector = model.encode(text_to_embed).tolist()
-
+        # The stored snippet is the embedded text, so a report re-queued from the
+        # table after a restart is embedded exactly like a live submission.
         new_document = Document(
             source_type="incident_report",
             source_id=incident.shipmentId,
             ts=datetime.utcnow(),
             chunk_index=0,
-            text_snippet=incident.description,
-            embedding_model=embedding_model_name,
-            embedding=embedding_vector
+            text_snippet=incident_text(incident.incidentType, incident.severity, incident.description),
+            embedding_model=settings.EMBEDDING_MODEL_NAME,
+            embedding=None,
         )
 
         db.add(new_document)
         db.commit()
         db.refresh(new_document)
 
-        return {"message": "Incident reported successfully", "doc_id": new_document.doc_id}
+        incident_embedder.submit(
+            {
+                "doc_id": str(new_document.doc_id),
+                "source_type": new_document.source_type,
+                "region_id": new_document.region_id,
+                "ts": new_document.ts.isoformat() if new_document.ts else None,
+                "text_snippet": new_document.text_snippet,
+            },
+            new_document.text_snippet,
+        )
+
+        return {
+            "message": "Incident reported successfully",
+            "doc_id": new_document.doc_id,
+            "embedding_status": "pending",
+        }
 
     except Exception as e:
         db.rollback()
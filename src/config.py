@@ -21,6 +21,101 @@ class Settings:
     SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY")
     SUPABASE_DB_PASSWORD: str = os.getenv("SUPABASE_DB_PASSWORD")
 
+    # AI Router Settings
+    ROUTER_FAST_PATH_ENABLED: bool = os.getenv("ROUTER_FAST_PATH_ENABLED", "true").lower() == "true"
+    ROUTER_CONFIDENCE_THRESHOLD: float = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", 0.7))
+
+    # Speculative Retrieval Settings
+    # While the LLM router decides, retrieval already runs for these RAG agents;
+    # results for agents the router did not pick are discarded.
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "true").lower() == "true"
+    SPECULATIVE_RETRIEVAL_AGENTS: list = os.getenv(
+        "SPECULATIVE_RETRIEVAL_AGENTS", "coordinator,mobility,supplier"
+    ).split(",")
+
+    # Tool Fast Path Settings
+    # Direct tool calls for ID-bearing tracking, cost and inventory lookups. With
+    # summarize on, one LLM call phrases the answer instead of a fixed template.
+    TOOL_FAST_PATH_ENABLED: bool = os.getenv("TOOL_FAST_PATH_ENABLED", "true").lower() == "true"
+    TOOL_FAST_PATH_SUMMARIZE: bool = os.getenv("TOOL_FAST_PATH_SUMMARIZE", "false").lower() == "true"
+
+    # AI Response Cache Settings
+    AI_CACHE_ENABLED: bool = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+    AI_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("AI_CACHE_SIMILARITY_THRESHOLD", 0.92))
+    AI_CACHE_TTL_SECONDS: int = int(os.getenv("AI_CACHE_TTL_SECONDS", 300))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", 1024))
+    # Answers that mention no shipment/order/vehicle ID or SKU are never invalidated, so they expire sooner
+    AI_CACHE_UNTAGGED_TTL_SECONDS: int = int(os.getenv("AI_CACHE_UNTAGGED_TTL_SECONDS", 60))
+    AI_CACHE_PATH: str = os.getenv("AI_CACHE_PATH")  # Optional on-disk store; single-worker deployments only
+
+    # Tool Result Cache Settings
+    TOOL_CACHE_ENABLED: bool = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+
+    # Single-Flight Settings
+    # Identical concurrent queries (same normalized text and role) share one graph run.
+    AI_SINGLE_FLIGHT_ENABLED: bool = os.getenv("AI_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+    # Batch AI Query Settings
+    AI_BATCH_CONCURRENCY: int = int(os.getenv("AI_BATCH_CONCURRENCY", 8))
+    AI_BATCH_MAX_QUERIES: int = int(os.getenv("AI_BATCH_MAX_QUERIES", 500))
+
+    # Startup Warm-up Settings
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_RETRY_SECONDS: int = int(os.getenv("WARMUP_RETRY_SECONDS", 30))
+
+    # Query Embedding Settings
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 4096))
+    EMBEDDING_BATCH_ENABLED: bool = os.getenv("EMBEDDING_BATCH_ENABLED", "true").lower() == "true"
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 32))
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", 5))
+
+    # Vector Retriever Settings
+    RETRIEVER_BACKEND: str = os.getenv("RETRIEVER_BACKEND", "postgres")  # postgres | numpy
+    RETRIEVER_NUMPY_FALLBACK: bool = os.getenv("RETRIEVER_NUMPY_FALLBACK", "false").lower() == "true"
+    NUMPY_INDEX_DIR: str = os.getenv("NUMPY_INDEX_DIR", "data/vector_index")
+    RETRIEVER_POOL_MIN_CONNECTIONS: int = int(os.getenv("RETRIEVER_POOL_MIN_CONNECTIONS", 1))
+    RETRIEVER_POOL_MAX_CONNECTIONS: int = int(os.getenv("RETRIEVER_POOL_MAX_CONNECTIONS", 10))
+    # Disable when DB_CONNECTION_STRING goes through a transaction-mode pooler.
+    RETRIEVER_PREPARED_STATEMENTS: bool = os.getenv("RETRIEVER_PREPARED_STATEMENTS", "true").lower() == "true"
+    # ANN search on a compact copy of the embedding, then a full-precision rerank of
+    # k * RETRIEVER_RERANK_FACTOR candidates. Needs the matching expression index
+    # (manage_vector_index --quantization) and pgvector >= 0.7.
+    RETRIEVER_QUANTIZATION: str = os.getenv("RETRIEVER_QUANTIZATION", "none")  # none | halfvec | binary
+    RETRIEVER_RERANK_FACTOR: int = int(os.getenv("RETRIEVER_RERANK_FACTOR", 4))
+    NUMPY_INDEX_QUANTIZATION: str = os.getenv("NUMPY_INDEX_QUANTIZATION", "none")  # none | int8
+
+    # LLM Scheduler Settings
+    # Defaults follow Groq's free-tier limits for llama-3.3-70b-versatile; 0 disables a limit.
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 30))
+    LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", 12000))
+    LLM_COMPLETION_TOKENS_ESTIMATE: int = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", 256))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", 4))
+    LLM_RETRY_BASE_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_SECONDS", 1.0))
+    LLM_RETRY_MAX_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_SECONDS", 30.0))
+
+    # RAG Context Settings
+    CONTEXT_MMR_LAMBDA: float = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))  # 1.0 = relevance only
+    CONTEXT_DUPLICATE_THRESHOLD: float = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.95))
+    CONTEXT_CHARS_PER_TOKEN: int = int(os.getenv("CONTEXT_CHARS_PER_TOKEN", 4))
+    TOOL_OUTPUT_MAX_TOKENS: int = int(os.getenv("TOOL_OUTPUT_MAX_TOKENS", 800))
+
+    # Incident Embedding Worker Settings
+    INCIDENT_EMBEDDING_QUEUE_SIZE: int = int(os.getenv("INCIDENT_EMBEDDING_QUEUE_SIZE", 1000))
+    INCIDENT_EMBEDDING_BATCH_SIZE: int = int(os.getenv("INCIDENT_EMBEDDING_BATCH_SIZE", 32))
+    INCIDENT_EMBEDDING_MAX_WAIT_MS: float = float(os.getenv("INCIDENT_EMBEDDING_MAX_WAIT_MS", 200))
+    # Backoff before re-sweeping unembedded reports after a failed batch (doubles per failure)
+    INCIDENT_EMBEDDING_RETRY_BASE_SECONDS: float = float(os.getenv("INCIDENT_EMBEDDING_RETRY_BASE_SECONDS", 1.0))
+    INCIDENT_EMBEDDING_RETRY_MAX_SECONDS: float = float(os.getenv("INCIDENT_EMBEDDING_RETRY_MAX_SECONDS", 60.0))
+
+    # Audit Log Writer Settings
+    AUDIT_LOG_QUEUE_SIZE: int = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", 10000))
+    AUDIT_LOG_BATCH_SIZE: int = int(os.getenv("AUDIT_LOG_BATCH_SIZE", 100))
+    AUDIT_LOG_FLUSH_SECONDS: float = float(os.getenv("AUDIT_LOG_FLUSH_SECONDS", 2.0))
+    AUDIT_LOG_OVERFLOW_POLICY: str = os.getenv("AUDIT_LOG_OVERFLOW_POLICY", "drop_oldest")  # block | drop_oldest | spill
+    AUDIT_LOG_BLOCK_TIMEOUT_SECONDS: float = float(os.getenv("AUDIT_LOG_BLOCK_TIMEOUT_SECONDS", 1.0))
+    AUDIT_LOG_SPILL_PATH: str = os.getenv("AUDIT_LOG_SPILL_PATH", "data/audit_log_spill.jsonl")  # pid is inserted per process
+
     # CORS Settings
     CORS_ORIGINS: list = os.getenv(
         "CORS_ORIGINS", "http://localhost:3000,http://localhost:5173"
@@ -1,9 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import threading
+import time
 from .database import engine, Base
+from .ai.audit_log import audit_log_writer
+from .ai.incident_embedder import incident_embedder
+from .ai.warmup import readiness, skip_warmup, start_background_warmup
 from .api.routers import admin, ai_router, auth, delivery, order, inventory, analytics,shipment,warehouse,vehicle
 from .config import settings
+from .metrics import HTTP_REQUEST_LATENCY, render_latest
 import logging
 
 # Import models to register them with Base
@@ -34,8 +41,25 @@ async def lifespan(app: FastAPI):
         logger.warning(f"Could not create database tables at startup: {e}")
         logger.warning("Tables will be created on first database access")
 
+    # Warm up models, agents and DB pools without delaying startup; the
+    # readiness endpoint reports when this worker can take traffic.
+    warmup_stop = threading.Event()
+    if settings.WARMUP_ENABLED:
+        start_background_warmup(warmup_stop)
+    else:
+        skip_warmup()
+
+    # Agent audit records are written in batches off the request path.
+    audit_log_writer.start()
+    # Incident reports are embedded in micro-batches off the request path.
+    incident_embedder.start()
+
     yield
 
+    warmup_stop.set()
+    incident_embedder.stop()
+    # Flush queued audit records before the process exits.
+    audit_log_writer.stop()
     logger.info("Application shutting down")
 
 app = FastAPI(
@@ -56,6 +80,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _route_template(request: Request) -> str:
+    """"/api/v1/shipments/<uuid>" -> "/api/v1/shipments/{shipment_id}", keeping label cardinality bounded"""
+    if request.scope.get("route") is None:
+        return "unmatched"
+    # Rebuilt from the path params because included routes only know their path
+    # relative to the router prefix.
+    placeholders = {str(value): f"{{{name}}}" for name, value in request.path_params.items()}
+    return "/".join(placeholders.get(segment, segment) for segment in request.url.path.split("/"))
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observes the latency of every request, labelled by its route template"""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_LATENCY.labels(
+            method=request.method,
+            route=_route_template(request),
+            status_code=str(status_code),
+        ).observe(time.perf_counter() - start)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin - User Management"])
@@ -73,6 +122,18 @@ def health_check():
     """Health check endpoint"""
     return {"status": "ok", "message": "API is running"}
 
+@app.get("/api/health/ready", tags=["Health Check"])
+def readiness_check():
+    """Readiness endpoint: 200 once every AI component is warm (or warm-up is disabled), 503 before that"""
+    snapshot = readiness.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+@app.get("/metrics", tags=["Health Check"], include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
+
 @app.get("/api/health/db", tags=["Health Check"])
 def database_health_check():
     """Database health check endpoint"""
@@ -0,0 +1,199 @@
+"""
+Prometheus metrics for the API and the agent graph.
+
+Every histogram carries an `outcome` label ("success" or "error") so slow
+failures can be told apart from slow successes. The AI histograms are
+labelled by agent (or tool) so a slow chat can be attributed to routing,
+retrieval, the LLM, a tool call or audit logging. Exposed at `/metrics`.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Buckets spanning sub-millisecond cache hits to multi-second LLM calls.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "logimas_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ["method", "route", "status_code"],
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_NODE_LATENCY = Histogram(
+    "logimas_agent_node_duration_seconds",
+    "Latency of each agent graph node, including the router and final responder.",
+    ["agent", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+RETRIEVAL_LATENCY = Histogram(
+    "logimas_retrieval_duration_seconds",
+    "Latency of vector retrieval (query embedding plus pgvector search).",
+    ["agent", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_LATENCY = Histogram(
+    "logimas_llm_call_duration_seconds",
+    "Latency of individual LLM calls, labelled by the graph node that made them.",
+    ["agent", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+TOOL_CALL_LATENCY = Histogram(
+    "logimas_tool_call_duration_seconds",
+    "Latency of database tool calls.",
+    ["tool", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+AUDIT_LOG_LATENCY = Histogram(
+    "logimas_audit_log_duration_seconds",
+    "Time an agent node spends handing its decision to the audit log.",
+    ["agent", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+AUDIT_LOG_FLUSH_LATENCY = Histogram(
+    "logimas_audit_log_flush_duration_seconds",
+    "Latency of background bulk inserts into agent_audit_logs.",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+AUDIT_LOG_QUEUE_DEPTH = Gauge(
+    "logimas_audit_log_queue_depth",
+    "Audit records waiting to be written.",
+)
+AUDIT_LOG_OVERFLOWS = Counter(
+    "logimas_audit_log_overflows_total",
+    "Audit records dropped or spilled to disk because the queue was full.",
+    ["policy", "outcome"],
+)
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "logimas_embedding_cache_lookups_total",
+    "Query embedding cache lookups.",
+    ["result"],
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "logimas_embedding_batch_size",
+    "Unique queries encoded per micro-batched encode call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "logimas_llm_queue_depth",
+    "LLM calls waiting for the scheduler, by priority.",
+    ["priority"],
+)
+LLM_QUEUE_WAIT = Histogram(
+    "logimas_llm_queue_wait_seconds",
+    "Time an LLM call waited for admission, by priority.",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_RATE_LIMITED = Counter(
+    "logimas_llm_rate_limited_total",
+    "LLM calls rejected with HTTP 429, by priority and whether they were retried.",
+    ["priority", "outcome"],
+)
+AI_QUERIES_COALESCED = Counter(
+    "logimas_ai_queries_coalesced_total",
+    "AI queries answered by joining an identical in-flight query, by caller role.",
+    ["role"],
+)
+SPECULATIVE_RETRIEVALS = Counter(
+    "logimas_speculative_retrievals_total",
+    "Retrievals started alongside the LLM router, by agent and whether their documents were used.",
+    ["agent", "outcome"],
+)
+TOOL_FAST_PATH_QUERIES = Counter(
+    "logimas_tool_fast_path_queries_total",
+    "Tool-agent queries answered by direct tool calls vs the full agent loop.",
+    ["agent", "path"],
+)
+CONTEXT_TOKENS = Histogram(
+    "logimas_context_tokens",
+    "Estimated tokens of the assembled RAG context per request.",
+    ["source"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+CONTEXT_TOKENS_SAVED = Counter(
+    "logimas_context_tokens_saved_total",
+    "Estimated prompt tokens removed by dedup, MMR selection and token budgets.",
+    ["source"],
+)
+INCIDENT_EMBEDDING_BATCH_SIZE = Histogram(
+    "logimas_incident_embedding_batch_size",
+    "Incident reports embedded per background batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+INCIDENT_EMBEDDING_LAG = Histogram(
+    "logimas_incident_embedding_lag_seconds",
+    "Time from an incident report being stored to its embedding being written.",
+    buckets=LATENCY_BUCKETS,
+)
+INCIDENT_EMBEDDING_QUEUE_DEPTH = Gauge(
+    "logimas_incident_embedding_queue_depth",
+    "Incident reports waiting to be embedded.",
+)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observes the duration of the block; `outcome` is set from whether it raised."""
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        histogram.labels(outcome=outcome, **labels).observe(time.perf_counter() - start)
+
+
+def timed_tool(tool_name: str):
+    """Decorator timing a tool function. Tools report failures as `{"error": ...}`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                if not (isinstance(result, dict) and "error" in result):
+                    outcome = "success"
+                return result
+            finally:
+                TOOL_CALL_LATENCY.labels(tool=tool_name, outcome=outcome).observe(
+                    time.perf_counter() - start
+                )
+        return wrapper
+    return decorator
+
+
+class LLMLatencyCallback(BaseCallbackHandler):
+    """Times every chat model call and attributes it to the graph node that made it."""
+
+    def __init__(self):
+        self._started: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any):
+        agent = (metadata or {}).get("langgraph_node", "unknown")
+        self._started[run_id] = (time.perf_counter(), agent)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, "success")
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, "error")
+
+    def _finish(self, run_id: UUID, outcome: str):
+        started = self._started.pop(run_id, None)
+        if started:
+            start, agent = started
+            LLM_CALL_LATENCY.labels(agent=agent, outcome=outcome).observe(time.perf_counter() - start)
+
+
+def render_latest() -> tuple:
+    """Returns the exposition payload and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
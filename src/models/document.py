@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text, LargeBinary
+from sqlalchemy import Column, String, Integer, DateTime, Text, LargeBinary, Index
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from uuid import uuid4
 from ..database import Base
@@ -16,7 +16,11 @@ except ImportError:
 class Document(Base):
     """Document model for vector embeddings and similarity search"""
     __tablename__ = "documents"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Metadata filters of the RAG retrievers (source type, region, recency)
+        Index("documents_source_region_ts_idx", "source_type", "region_id", "ts"),
+        {"schema": "public"},
+    )
     
     doc_id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
     source_type = Column(String)
@@ -26,6 +30,7 @@ class Document(Base):
     chunk_index = Column(Integer)
     text_snippet = Column(Text)
     embedding_model = Column(String)
+    content_hash = Column(String)  # sha256 of model + text; lets ingestion skip unchanged chunks
     
     # Use Vector if pgvector is available, otherwise use LargeBinary
     if PGVECTOR_AVAILABLE:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, DateTime, Float, Numeric, ForeignKey
+from sqlalchemy import Column, BigInteger, DateTime, Float, Numeric, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
 from ..database import Base
@@ -7,7 +7,11 @@ from ..database import Base
 class VehicleTelemetry(Base):
     """Vehicle telemetry model for real-time tracking"""
     __tablename__ = "vehicle_telemetry"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Latest reading per vehicle (lateral join of get_shipment_tracking)
+        Index("vehicle_telemetry_vehicle_ts_idx", "vehicle_id", text("ts DESC")),
+        {"schema": "public"},
+    )
     
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     vehicle_id = Column(PG_UUID(as_uuid=True), ForeignKey('public.vehicles.vehicle_id'))
@@ -0,0 +1,96 @@
+"""Measure how many concurrent /ai/query requests a single worker can hold.
+
+Usage:
+    python -m src.scripts.bench_ai_concurrency --url http://localhost:8000 --concurrency 32
+
+Start the API with a single worker first (`uvicorn src.main:app --workers 1`).
+The script fires `--concurrency` chat queries at once and, while they are in
+flight, polls /api/health. With a blocking graph the health probe waits behind
+every in-flight chat; with the async pipeline it keeps answering in milliseconds
+and the total wall time approaches the latency of the slowest single query.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_QUERIES = [
+    "What is the stock level of PROD0001?",
+    "Are there any traffic incidents on the Delhi to Jaipur route?",
+    "Which suppliers have the shortest lead times?",
+    "What is the best packaging for items of 500, 1200 and 300 cm3?",
+]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _timed_post(client: httpx.AsyncClient, url: str, query: str):
+    start = time.perf_counter()
+    try:
+        response = await client.post(url, json={"query": query})
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+async def _probe_health(client: httpx.AsyncClient, url: str, stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(url)
+        except httpx.HTTPError:
+            pass
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.1)
+
+
+async def run(base_url: str, concurrency: int, timeout: float):
+    query_url = f"{base_url}/ai/query"
+    health_url = f"{base_url}/api/health"
+    queries = [DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)] for i in range(concurrency)]
+    health_samples: list = []
+    stop = asyncio.Event()
+
+    limits = httpx.Limits(max_connections=concurrency + 4)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        prober = asyncio.create_task(_probe_health(client, health_url, stop, health_samples))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(_timed_post(client, query_url, q) for q in queries))
+        wall = time.perf_counter() - start
+        stop.set()
+        await prober
+
+    latencies = [elapsed for _, elapsed in results]
+    succeeded = sum(1 for ok, _ in results if ok)
+    print(f"Concurrent queries:     {concurrency} ({succeeded} succeeded)")
+    print(f"Wall time:              {wall:.2f}s")
+    print(f"Sum of query latencies: {sum(latencies):.2f}s")
+    print(f"Effective concurrency:  {sum(latencies) / wall:.1f}x")
+    print(f"Query p50 / p95:        {statistics.median(latencies):.2f}s / {_percentile(latencies, 95):.2f}s")
+    if health_samples:
+        print(
+            f"Health p50 / max:       {statistics.median(health_samples) * 1000:.1f}ms"
+            f" / {max(health_samples) * 1000:.1f}ms ({len(health_samples)} probes)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.url.rstrip("/"), args.concurrency, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
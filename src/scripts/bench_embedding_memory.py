@@ -0,0 +1,74 @@
+"""Compare RSS and load time of the legacy per-component embedding models vs the shared registry.
+
+Usage:
+    python -m src.scripts.bench_embedding_memory
+
+Each mode runs in a fresh interpreter so the numbers do not contaminate each other:
+
+- legacy: what the app used to do at startup and on first query — three
+  `HuggingFaceEmbeddings` (coordinator, mobility and supplier retrievers), one
+  `SentenceTransformer` in the delivery router and one in `get_embedding_model()`.
+- shared: the same five consumers resolved through `src.ai.embeddings`.
+"""
+import json
+import subprocess
+import sys
+
+LEGACY_SNIPPET = """
+from langchain_huggingface import HuggingFaceEmbeddings
+from sentence_transformers import SentenceTransformer
+models = [HuggingFaceEmbeddings(model_name=NAME) for _ in range(3)]
+models += [SentenceTransformer(NAME) for _ in range(2)]
+"""
+
+SHARED_SNIPPET = """
+from src.ai.embeddings import get_embedding_model, get_embeddings
+models = [get_embeddings().model for _ in range(3)]
+models += [get_embedding_model() for _ in range(2)]
+"""
+
+RUNNER = """
+import json, resource, time
+from src.config import settings
+NAME = settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2"
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+import torch, sentence_transformers  # exclude library import cost from both modes
+baseline = rss_mb()
+start = time.perf_counter()
+{snippet}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"rss_mb": rss_mb() - baseline, "load_seconds": elapsed, "instances": len({{id(getattr(m, "_client", m)) for m in models}})}}))
+"""
+
+
+def measure(snippet: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", RUNNER.format(snippet=snippet)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    legacy = measure(LEGACY_SNIPPET)
+    shared = measure(SHARED_SNIPPET)
+    print(f"{'mode':<8}{'model instances':>18}{'RSS delta (MB)':>18}{'load time (s)':>16}")
+    for name, result in (("legacy", legacy), ("shared", shared)):
+        print(f"{name:<8}{result['instances']:>18}{result['rss_mb']:>18.1f}{result['load_seconds']:>16.2f}")
+    print(
+        f"Saved {legacy['rss_mb'] - shared['rss_mb']:.1f} MB RSS and "
+        f"{legacy['load_seconds'] - shared['load_seconds']:.2f}s of model loading per worker."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Memory, index size and recall of quantized vector search vs full-precision search.
+
+Usage:
+    python -m src.scripts.bench_quantization --queries 200 --k 5
+    python -m src.scripts.bench_quantization --skip-postgres
+
+Ground truth is an exact float32 cosine scan over every embedded row of
+`documents`. Query vectors are stored document embeddings with a little
+Gaussian noise, so they look like real queries against this corpus.
+
+- numpy: `NumpyVectorIndex` with float32 rows vs int8 rows, with and without
+  the float32 rerank (a rerank factor of 1 keeps the int8 ranking as is).
+- postgres: `DirectPostgresRetriever` with each RETRIEVER_QUANTIZATION whose
+  index exists (build them with `manage_vector_index build --quantization ...`),
+  plus the on-disk size of every ANN index on `documents`. Needs pgvector >= 0.7
+  for halfvec and binary.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from src.ai.tools.numpy_index import NumpyVectorIndex
+from src.ai.tools.vector_store import DirectPostgresRetriever
+from src.config import settings
+from src.scripts.bench_retrieval import _PrecomputedEmbeddings, _percentile
+
+
+def _recall(results, truth) -> float:
+    return statistics.mean(len(set(found) & set(expected)) / len(expected) for found, expected in zip(results, truth))
+
+
+def _report(name, results, latencies, truth, extra=""):
+    print(
+        f"{name:<28}{_recall(results, truth):>10.3f}{statistics.mean(latencies) * 1000:>12.2f}"
+        f"{_percentile(latencies, 95) * 1000:>12.2f}  {extra}"
+    )
+
+
+def _load_corpus(db_uri):
+    import psycopg2
+    from pgvector.psycopg2 import register_vector
+
+    conn = psycopg2.connect(db_uri)
+    try:
+        register_vector(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT doc_id::text, embedding FROM documents WHERE embedding IS NOT NULL")
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    doc_ids = [row[0] for row in rows]
+    embeddings = np.vstack([
+        np.asarray(row[1].to_numpy() if hasattr(row[1], "to_numpy") else row[1], dtype=np.float32)
+        for row in rows
+    ])
+    return doc_ids, embeddings
+
+
+def bench_numpy(doc_ids, embeddings, queries, truth, k):
+    records = [{"doc_id": doc_id} for doc_id in doc_ids]
+    model_name = settings.EMBEDDING_MODEL_NAME
+    full = NumpyVectorIndex.from_arrays(embeddings, records, model_name)
+    quantized = NumpyVectorIndex.from_arrays(embeddings, records, model_name, quantization="int8")
+
+    print(f"\nNumPy index, {len(doc_ids)} rows")
+    for name, index in (("float32", full), ("int8", quantized)):
+        print(f"  {name:<8} scan bytes: {index.stats()['scan_bytes'] / 2**20:8.2f} MiB")
+    print(f"{'mode':<28}{'recall@k':>10}{'mean (ms)':>12}{'p95 (ms)':>12}")
+
+    configured_factor = settings.RETRIEVER_RERANK_FACTOR
+    runs = [("float32", full, configured_factor), ("int8, no rerank", quantized, 1),
+            (f"int8, rerank x{configured_factor}", quantized, configured_factor)]
+    for name, index, factor in runs:
+        settings.RETRIEVER_RERANK_FACTOR = factor
+        results, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            found = index.search(query, k)
+            latencies.append(time.perf_counter() - start)
+            results.append([record["doc_id"] for record, _ in found])
+        _report(name, results, latencies, truth)
+    settings.RETRIEVER_RERANK_FACTOR = configured_factor
+
+
+def _index_sizes(db_uri):
+    import psycopg2
+
+    conn = psycopg2.connect(db_uri)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            version = cur.fetchone()[0]
+            cur.execute(
+                """
+                SELECT i.indexname, i.indexdef, pg_relation_size(c.oid)
+                FROM pg_indexes i JOIN pg_class c ON c.relname = i.indexname
+                WHERE i.tablename = 'documents' AND i.indexdef ~* 'USING (hnsw|ivfflat) '
+                ORDER BY 1
+                """
+            )
+            indexes = cur.fetchall()
+            cur.execute("SELECT sum(pg_column_size(embedding)) FROM documents")
+            column_bytes = cur.fetchone()[0] or 0
+    finally:
+        conn.close()
+    return version, indexes, column_bytes
+
+
+def bench_postgres(db_uri, queries, truth, k):
+    version, indexes, column_bytes = _index_sizes(db_uri)
+    print(f"\npgvector {version}; embedding column: {column_bytes / 2**20:.2f} MiB")
+    for name, definition, size in indexes:
+        print(f"  {name:<48} {size / 2**20:8.2f} MiB  {definition.split(' USING ', 1)[1]}")
+
+    available = {"none"}
+    for _, definition, _ in indexes:
+        if "halfvec_cosine_ops" in definition:
+            available.add("halfvec")
+        if "bit_hamming_ops" in definition:
+            available.add("binary")
+    print(f"{'mode':<28}{'recall@k':>10}{'mean (ms)':>12}{'p95 (ms)':>12}")
+
+    model = _PrecomputedEmbeddings()
+    for quantization in ("none", "halfvec", "binary"):
+        if quantization not in available:
+            print(f"{quantization:<28}   (no {quantization} index; skipped)")
+            continue
+        factors = [1] if quantization == "none" else [1, settings.RETRIEVER_RERANK_FACTOR]
+        for factor in factors:
+            retriever = DirectPostgresRetriever(
+                embedding_model=model, db_uri=db_uri, k_results=k,
+                quantization=quantization, rerank_factor=factor,
+                ef_search=max(40, k * factor),
+            )
+            results, latencies = [], []
+            for query in queries:
+                model.vector = query
+                start = time.perf_counter()
+                documents = retriever._search("benchmark")
+                latencies.append(time.perf_counter() - start)
+                results.append([document.metadata["doc_id"] for document in documents])
+            label = quantization if quantization == "none" else f"{quantization}, rerank x{factor}"
+            _report(label, results, latencies, truth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.05, help="std of the noise added to query vectors")
+    parser.add_argument("--skip-postgres", action="store_true")
+    parser.add_argument("--db-uri", default=settings.DB_CONNECTION_STRING)
+    args = parser.parse_args()
+
+    doc_ids, embeddings = _load_corpus(args.db_uri)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(doc_ids), size=min(args.queries, len(doc_ids)), replace=False)
+    queries = normalized[sample] + rng.normal(scale=args.noise, size=(len(sample), normalized.shape[1]))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    scores = queries @ normalized.T
+    top = np.argsort(-scores, axis=1)[:, : args.k]
+    truth = [[doc_ids[i] for i in row] for row in top]
+
+    bench_numpy(doc_ids, embeddings, queries, truth, args.k)
+    if not args.skip_postgres:
+        bench_postgres(args.db_uri, queries, truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
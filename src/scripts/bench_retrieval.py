@@ -0,0 +1,111 @@
+"""Micro-benchmark of pgvector retrieval latency: connect-per-query vs the pooled retriever.
+
+Usage:
+    python -m src.scripts.bench_retrieval --iterations 200
+
+Query embeddings are computed once up front so only the database round trip is
+timed. Both modes run the same similarity search against DB_CONNECTION_STRING:
+
+- legacy: `psycopg2.connect` + `register_vector` per query, embedding sent twice,
+  connection closed afterwards (what `DirectPostgresRetriever` used to do).
+- pooled: `DirectPostgresRetriever` on the shared pool, with the statement
+  prepared once per connection and the embedding sent once.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import psycopg2
+from pgvector.psycopg2 import register_vector
+
+from src.ai.embeddings import get_embedding_model
+from src.ai.tools.vector_store import DirectPostgresRetriever
+from src.config import settings
+
+SAMPLE_QUERIES = [
+    "Why were deliveries in the west region delayed?",
+    "What is our policy on damaged goods?",
+    "Is there traffic on the Delhi to Jaipur highway?",
+    "Which suppliers have the shortest lead times?",
+    "Summarise recent incidents across our operations.",
+]
+
+LEGACY_SQL = """
+    SELECT doc_id, text_snippet, source_type, 1 - (embedding <=> %s::vector) AS similarity
+    FROM documents
+    ORDER BY embedding <=> %s::vector
+    LIMIT %s;
+"""
+
+
+class _PrecomputedEmbeddings:
+    """Hands the retriever a precomputed vector so only the database is timed."""
+
+    def __init__(self):
+        self.vector = None
+
+    def embed_query(self, text):
+        return self.vector
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench_legacy(db_uri, embeddings, iterations, k):
+    latencies = []
+    for i in range(iterations):
+        vector = embeddings[i % len(embeddings)].tolist()
+        start = time.perf_counter()
+        conn = psycopg2.connect(db_uri)
+        try:
+            register_vector(conn)
+            cur = conn.cursor()
+            cur.execute(LEGACY_SQL, (vector, vector, k))
+            cur.fetchall()
+        finally:
+            conn.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_pooled(db_uri, embeddings, iterations, k):
+    model = _PrecomputedEmbeddings()
+    retriever = DirectPostgresRetriever(embedding_model=model, db_uri=db_uri, k_results=k)
+    latencies = []
+    for i in range(iterations):
+        model.vector = embeddings[i % len(embeddings)]
+        start = time.perf_counter()
+        retriever._search("benchmark")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--db-uri", default=settings.DB_CONNECTION_STRING)
+    args = parser.parse_args()
+
+    embeddings = np.asarray(get_embedding_model().encode(SAMPLE_QUERIES), dtype=np.float32)
+
+    results = {
+        "legacy": bench_legacy(args.db_uri, embeddings, args.iterations, args.k),
+        "pooled": bench_pooled(args.db_uri, embeddings, args.iterations, args.k),
+    }
+
+    print(f"{'mode':<8}{'mean (ms)':>12}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for name, latencies in results.items():
+        print(
+            f"{name:<8}{statistics.mean(latencies) * 1000:>12.2f}"
+            f"{_percentile(latencies, 50) * 1000:>12.2f}{_percentile(latencies, 95) * 1000:>12.2f}"
+        )
+    saved = statistics.mean(results["legacy"]) - statistics.mean(results["pooled"])
+    print(f"Pooling saves {saved * 1000:.2f} ms per retrieval on average.")
+
+
+if __name__ == "__main__":
+    main()
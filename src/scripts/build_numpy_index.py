@@ -0,0 +1,42 @@
+"""Build the in-process NumPy vector index files used by RETRIEVER_BACKEND=numpy.
+
+Usage:
+    python -m src.scripts.build_numpy_index                # from the documents table
+    python -m src.scripts.build_numpy_index --source json  # from data/documents.json
+
+Writes `embeddings.npy` and the `documents.json` ID sidecar to NUMPY_INDEX_DIR
+(or --output). Workers memory-map the files on startup, so rebuild after large
+ingests; documents added at runtime are appended in memory until then.
+"""
+import argparse
+import time
+
+from ..ai.tools.numpy_index import DOCUMENTS_JSON_PATH, NumpyVectorIndex
+from ..config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", choices=["db", "json"], default="db")
+    parser.add_argument("--json-path", default=DOCUMENTS_JSON_PATH)
+    parser.add_argument("--output", default=settings.NUMPY_INDEX_DIR)
+    args = parser.parse_args()
+
+    model_name = settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2"
+    start = time.perf_counter()
+    if args.source == "db":
+        index = NumpyVectorIndex.from_database(settings.DB_CONNECTION_STRING, model_name)
+    else:
+        index = NumpyVectorIndex.from_json(args.json_path, model_name)
+    index.save(args.output)
+
+    stats = index.stats()
+    size_mb = stats["documents"] * stats["dim"] * 4 / 1024 / 1024
+    print(
+        f"Wrote {stats['documents']} documents ({size_mb:.1f} MB of embeddings) to {args.output} "
+        f"in {time.perf_counter() - start:.2f}s."
+    )
+
+
+if __name__ == "__main__":
+    main()
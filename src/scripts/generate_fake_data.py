@@ -286,7 +286,9 @@ def gen_documents(n: int = 10) -> List[Dict[str, Any]]:
                 "ts": datetime.utcnow().isoformat(),
                 "chunk_index": 0,
                 "text_snippet": fake.paragraph(nb_sentences=5),
-                "embedding_model": "text-embedding-3-small",
+                # Not embedded yet: `python -m src.scripts.ingest_documents` embeds
+                # these with the configured 384-dimension model and sets the label.
+                "embedding_model": None,
             }
         )
     return rows
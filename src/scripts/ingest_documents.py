@@ -0,0 +1,305 @@
+"""Bulk-load a knowledge base into `documents`: chunk, embed in batches, COPY.
+
+Usage:
+    python -m src.scripts.ingest_documents data/documents.json
+    python -m src.scripts.ingest_documents kb/ --source-type policy --region-id west
+    python -m src.scripts.ingest_documents exports/incidents.ndjson --batch-size 1024
+
+Inputs are files or directories of:
+- .json: a list of records (or a single record);
+- .ndjson / .jsonl: one record per line;
+- anything else (.txt, .md, ...): the whole file is one record.
+A record's text is taken from `text`, `text_snippet` or `content`; `source_type`,
+`source_id`, `region_id` and `ts` are carried over (CLI flags fill the gaps).
+
+Records are split with langchain-text-splitters, embedded with the shared
+SentenceTransformer in large batches and loaded with COPY into a staging table
+followed by one INSERT ... ON CONFLICT per batch. Chunk IDs are deterministic
+and each row stores a content hash, so re-running the command only embeds
+chunks whose text (or embedding model) changed. Progress is checkpointed after
+every committed batch; an interrupted run resumes where it stopped.
+
+For a large initial load, drop the ANN index first and rebuild it afterwards
+(`python -m src.scripts.manage_vector_index`); maintaining HNSW row by row is
+slower than building it once.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from ..config import settings
+
+# Chunk IDs are uuid5(namespace, "source_type:source_id:chunk_index").
+CHUNK_NAMESPACE = uuid.UUID("8a4e4f5c-2f0b-4d55-9a43-6c3f1f0e7a21")
+DEFAULT_CHECKPOINT = os.path.join("data", "ingest_checkpoint.json")
+COLUMNS = (
+    "doc_id", "source_type", "source_id", "region_id", "ts", "chunk_index",
+    "text_snippet", "embedding_model", "content_hash", "embedding",
+)
+
+UPSERT_SQL = f"""
+    INSERT INTO documents ({", ".join(COLUMNS)})
+    SELECT {", ".join(COLUMNS)} FROM ingest_staging
+    ON CONFLICT (doc_id) DO UPDATE SET
+        {", ".join(f"{column} = EXCLUDED.{column}" for column in COLUMNS if column != "doc_id")}
+"""
+
+
+# --- Reading ---
+
+def _iter_files(paths: List[str]) -> Iterator[Path]:
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.is_file())
+        else:
+            yield path
+
+
+def _iter_records(path: Path) -> Iterator[dict]:
+    suffix = path.suffix.lower()
+    if suffix in (".ndjson", ".jsonl"):
+        with path.open(encoding="utf-8") as source:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+    elif suffix == ".json":
+        with path.open(encoding="utf-8") as source:
+            data = json.load(source)
+        yield from (data if isinstance(data, list) else [data])
+    else:
+        yield {"text": path.read_text(encoding="utf-8", errors="replace"), "source_id": str(path)}
+
+
+def _record_text(record: dict) -> str:
+    return record.get("text") or record.get("text_snippet") or record.get("content") or ""
+
+
+# --- Chunking ---
+
+def _content_hash(text: str, model_name: str) -> str:
+    # The model is part of the hash so switching models re-embeds everything.
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _chunk_rows(record: dict, splitter, args, model_name: str) -> List[dict]:
+    source_type = record.get("source_type") or args.source_type
+    # Records without an ID are identified by their text, so re-ingesting them
+    # updates the same rows instead of adding copies.
+    text = _record_text(record)
+    source_id = str(
+        record.get("source_id")
+        or record.get("doc_id")
+        or uuid.uuid5(CHUNK_NAMESPACE, hashlib.sha256(text.encode("utf-8")).hexdigest())
+    )
+    rows = []
+    for chunk_index, chunk in enumerate(splitter.split_text(text)):
+        doc_id = record.get("doc_id") if chunk_index == 0 and record.get("doc_id") else None
+        rows.append({
+            "doc_id": doc_id or str(uuid.uuid5(CHUNK_NAMESPACE, f"{source_type}:{source_id}:{chunk_index}")),
+            "source_type": source_type,
+            "source_id": source_id,
+            "region_id": record.get("region_id") or args.region_id,
+            "ts": record.get("ts") or args.ts,
+            "chunk_index": chunk_index,
+            "text_snippet": chunk,
+            "embedding_model": model_name,
+            "content_hash": _content_hash(chunk, model_name),
+        })
+    return rows
+
+
+# --- Checkpoint ---
+
+def _file_key(path: Path) -> str:
+    stat = path.stat()
+    return f"{path.resolve()}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def _load_checkpoint(path: str) -> Dict[str, int]:
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as source:
+            return json.load(source)
+    return {}
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, int]):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as target:
+        json.dump(checkpoint, target)
+    os.replace(f"{path}.tmp", path)
+
+
+# --- Loading ---
+
+class Loader:
+    """
+    Filters unchanged chunks and COPYs new ones. Hash lookups and loads use
+    separate connections so the next batch can be checked while one is loading.
+    """
+
+    def __init__(self, db_uri: str):
+        import psycopg2
+
+        self.conn = psycopg2.connect(db_uri)
+        self.read_conn = psycopg2.connect(db_uri)
+        self.read_conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash text")
+        self.conn.commit()
+
+    def unchanged(self, rows: List[dict]) -> set:
+        """doc_ids whose stored content hash already matches."""
+        with self.read_conn.cursor() as cur:
+            cur.execute(
+                "SELECT doc_id::text, content_hash FROM documents "
+                "WHERE doc_id = ANY(%s::uuid[]) AND embedding IS NOT NULL",
+                ([row["doc_id"] for row in rows],),
+            )
+            stored = dict(cur.fetchall())
+        return {row["doc_id"] for row in rows if stored.get(row["doc_id"]) == row["content_hash"]}
+
+    def load(self, rows: List[dict], embeddings) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row, vector in zip(rows, embeddings):
+            values = [row[column] for column in COLUMNS[:-1]]
+            writer.writerow(
+                ["" if value is None else value for value in values]
+                + ["[" + ",".join(map("{:.7g}".format, vector.tolist())) + "]"]
+            )
+        buffer.seek(0)
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS ingest_staging "
+                "(LIKE documents INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            cur.copy_expert(
+                f"COPY ingest_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+                buffer,
+            )
+            cur.execute(UPSERT_SQL)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+        self.read_conn.close()
+
+
+class Progress:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.records = self.chunks = self.embedded = self.skipped = 0
+
+    def report(self, final: bool = False):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(
+            f"{'Done' if final else 'Progress'}: {self.records} docs, {self.chunks} chunks "
+            f"({self.embedded} embedded, {self.skipped} unchanged) in {elapsed:.1f}s - "
+            f"{self.records / elapsed:.1f} docs/s, {self.chunks / elapsed:.1f} chunks/s"
+        )
+
+
+def ingest(args) -> Progress:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from ..ai.embeddings import get_embedding_model
+
+    model_name = settings.EMBEDDING_MODEL_NAME or "all-MiniLM-L6-v2"
+    model = get_embedding_model(model_name)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    loader = Loader(args.db_uri)
+    checkpoint = {} if args.restart else _load_checkpoint(args.checkpoint)
+    progress = Progress()
+
+    # Embedding batch N+1 overlaps with loading batch N on a single writer thread.
+    writer = ThreadPoolExecutor(max_workers=1)
+    pending = None
+
+    def flush(rows: List[dict], file_key: str, records_done: int):
+        nonlocal pending
+        # A doc_id may only appear once per INSERT ... ON CONFLICT; the last one wins.
+        rows = list({row["doc_id"]: row for row in rows}.values())
+        unchanged = loader.unchanged(rows)
+        fresh = [row for row in rows if row["doc_id"] not in unchanged]
+        progress.skipped += len(rows) - len(fresh)
+        embeddings = (
+            model.encode([row["text_snippet"] for row in fresh], batch_size=args.embed_batch_size)
+            if fresh else []
+        )
+        progress.embedded += len(fresh)
+        if pending is not None:
+            pending.result()
+        pending = writer.submit(_commit, fresh, embeddings, file_key, records_done)
+
+    def _commit(rows, embeddings, file_key, records_done):
+        if rows:
+            loader.load(rows, embeddings)
+        checkpoint[file_key] = records_done
+        _save_checkpoint(args.checkpoint, checkpoint)
+        progress.report()
+
+    try:
+        for path in _iter_files(args.paths):
+            file_key = _file_key(path)
+            already_done = checkpoint.get(file_key, 0)
+            if already_done:
+                print(f"Resuming {path} after {already_done} records")
+            batch: List[dict] = []
+            records_done = 0
+            for records_done, record in enumerate(_iter_records(path), start=1):
+                if records_done <= already_done:
+                    continue
+                batch.extend(_chunk_rows(record, splitter, args, model_name))
+                progress.records += 1
+                if len(batch) >= args.batch_size:
+                    progress.chunks += len(batch)
+                    flush(batch, file_key, records_done)
+                    batch = []
+            if batch or records_done > already_done:
+                progress.chunks += len(batch)
+                flush(batch, file_key, records_done)
+        if pending is not None:
+            pending.result()
+    finally:
+        writer.shutdown(wait=True)
+        loader.close()
+    progress.report(final=True)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="files or directories to ingest")
+    parser.add_argument("--source-type", default="document", help="for records without a source_type")
+    parser.add_argument("--region-id", help="for records without a region_id")
+    parser.add_argument("--ts", default=datetime.now(timezone.utc).isoformat(), help="for records without a ts")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="characters per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=512, help="chunks per embed + COPY batch")
+    parser.add_argument("--embed-batch-size", type=int, default=128, help="SentenceTransformer batch size")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    parser.add_argument("--db-uri", default=settings.DB_CONNECTION_STRING)
+    args = parser.parse_args()
+
+    if not args.db_uri:
+        print("DB_CONNECTION_STRING is not configured. Set it in .env or environment.")
+        sys.exit(1)
+    ingest(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Build, rebuild, drop or inspect the pgvector ANN index on documents.embedding.
+
+Usage:
+    python -m src.scripts.manage_vector_index status
+    python -m src.scripts.manage_vector_index build --method hnsw --m 16 --ef-construction 64
+    python -m src.scripts.manage_vector_index build --method ivfflat --lists 100
+    python -m src.scripts.manage_vector_index rebuild
+    python -m src.scripts.manage_vector_index drop --method ivfflat
+    python -m src.scripts.manage_vector_index build --source-types incident_report,shipment
+    python -m src.scripts.manage_vector_index build --quantization halfvec
+
+The index uses `vector_cosine_ops` because the retriever orders by `<=>`.
+Indexes are created CONCURRENTLY so ingestion and retrieval keep running. Once it
+exists, recall vs latency is tuned per query through `ef_search` (HNSW) or
+`probes` (IVFFlat) on `DirectPostgresRetriever`; see `get_retriever()`.
+
+--source-types builds a partial index covering only those document types, for
+the per-agent default filters (e.g. the mobility chain's incident reports and
+shipments). A filtered query only uses it when its `source_type` list is covered
+by the index predicate, so build one per chain filter that matters.
+
+HNSW gives the better recall/latency curve and can be built on an empty table.
+IVFFlat builds faster and uses less memory, but its lists are trained from the
+rows present at build time, so `rebuild` it after large ingests. When --lists is
+omitted it defaults to rows / 1000 (sqrt(rows) above a million rows).
+
+--quantization indexes a compact expression of the column instead of the column
+itself: `embedding::halfvec(384)` (half the size, near-identical ranking) or
+`binary_quantize(embedding)::bit(384)` (1/32 of the size, coarse ranking). The
+table keeps the float32 vectors, which the retriever uses to rerank the ANN
+candidates when RETRIEVER_QUANTIZATION matches. Both need pgvector >= 0.7.
+"""
+import argparse
+import math
+import sys
+
+from ..config import settings
+
+TABLE = "documents"
+COLUMN = "embedding"
+INDEX_NAMES = {
+    "hnsw": "documents_embedding_hnsw_idx",
+    "ivfflat": "documents_embedding_ivfflat_idx",
+}
+DIM = 384
+# quantization -> (indexed expression, operator class); the expressions must
+# match `QUANTIZED_ORDERINGS` in src/ai/tools/vector_store.py.
+INDEXED_EXPRESSIONS = {
+    "none": (COLUMN, "vector_cosine_ops"),
+    "halfvec": (f"({COLUMN}::halfvec({DIM}))", "halfvec_cosine_ops"),
+    "binary": (f"(binary_quantize({COLUMN})::bit({DIM}))", "bit_hamming_ops"),
+}
+
+
+def _connect():
+    import psycopg2
+
+    conn = psycopg2.connect(settings.DB_CONNECTION_STRING)
+    # CREATE/DROP/REINDEX ... CONCURRENTLY cannot run inside a transaction block.
+    conn.autocommit = True
+    return conn
+
+
+def _default_lists(cur) -> int:
+    cur.execute(f"SELECT count(*) FROM {TABLE} WHERE {COLUMN} IS NOT NULL")
+    rows = cur.fetchone()[0]
+    if rows > 1_000_000:
+        return max(1, int(math.sqrt(rows)))
+    return max(1, rows // 1000)
+
+
+def _source_types(args) -> list:
+    if not args.source_types:
+        return []
+    return sorted({value.strip() for value in args.source_types.split(",") if value.strip()})
+
+
+def _index_name(args) -> str:
+    name = INDEX_NAMES[args.method]
+    if args.quantization != "none":
+        name = name.replace("_idx", f"_{args.quantization}_idx")
+    source_types = _source_types(args)
+    if source_types:
+        name = name.replace("_idx", f"_{'_'.join(source_types)}_idx")
+    return name[:63]  # PostgreSQL identifier limit
+
+
+def _index_sql(args, cur) -> str:
+    if args.method == "hnsw":
+        options = f"m = {args.m}, ef_construction = {args.ef_construction}"
+    else:
+        options = f"lists = {args.lists or _default_lists(cur)}"
+    expression, opclass = INDEXED_EXPRESSIONS[args.quantization]
+    sql = (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_index_name(args)} "
+        f"ON {TABLE} USING {args.method} ({expression} {opclass}) WITH ({options})"
+    )
+    source_types = _source_types(args)
+    if source_types:
+        values = ", ".join(cur.mogrify("%s", (value,)).decode() for value in source_types)
+        sql += f" WHERE source_type = ANY (ARRAY[{values}]::varchar[])"
+    return sql
+
+
+def _set_build_memory(cur, args):
+    if args.maintenance_work_mem:
+        cur.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+    if args.parallel_workers is not None:
+        cur.execute(f"SET max_parallel_maintenance_workers = {int(args.parallel_workers)}")
+
+
+def _existing_indexes(cur) -> list:
+    cur.execute(
+        """
+        SELECT i.indexname, i.indexdef, pg_size_pretty(pg_relation_size(c.oid))
+        FROM pg_indexes i
+        JOIN pg_class c ON c.relname = i.indexname
+        WHERE i.tablename = %s AND i.indexdef ~* %s
+        """,
+        (TABLE, r"USING (hnsw|ivfflat) "),
+    )
+    return cur.fetchall()
+
+
+def status(cur, args):
+    indexes = _existing_indexes(cur)
+    if not indexes:
+        print(f"No ANN index on {TABLE}.{COLUMN}; similarity search is a sequential scan.")
+        return
+    for name, definition, size in indexes:
+        print(f"{name} ({size}): {definition}")
+
+
+def build(cur, args):
+    _set_build_memory(cur, args)
+    sql = _index_sql(args, cur)
+    print(f"Building: {sql}")
+    cur.execute(sql)
+    cur.execute(f"ANALYZE {TABLE}")
+    print(f"Built {_index_name(args)}.")
+
+
+def rebuild(cur, args):
+    _set_build_memory(cur, args)
+    name = _index_name(args)
+    if args.recreate:
+        # Picks up changed build parameters (m, ef_construction, lists).
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        build(cur, args)
+        return
+    print(f"Reindexing {name}...")
+    cur.execute(f"REINDEX INDEX CONCURRENTLY {name}")
+    cur.execute(f"ANALYZE {TABLE}")
+    print(f"Rebuilt {name}.")
+
+
+def drop(cur, args):
+    name = _index_name(args)
+    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    print(f"Dropped {name}.")
+
+
+COMMANDS = {"status": status, "build": build, "rebuild": rebuild, "drop": drop}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--method", choices=sorted(INDEX_NAMES), default="hnsw")
+    parser.add_argument("--m", type=int, default=16, help="HNSW: max connections per layer")
+    parser.add_argument("--ef-construction", type=int, default=64, help="HNSW: candidate list size while building")
+    parser.add_argument("--lists", type=int, help="IVFFlat: number of inverted lists")
+    parser.add_argument(
+        "--quantization", choices=sorted(INDEXED_EXPRESSIONS), default="none",
+        help="index a half-precision or binary copy of the embedding (pgvector >= 0.7)",
+    )
+    parser.add_argument("--source-types", help="comma-separated; build a partial index over these source types only")
+    parser.add_argument("--recreate", action="store_true", help="rebuild: drop and create with new parameters")
+    parser.add_argument("--maintenance-work-mem", help="e.g. '1GB'; HNSW builds are much faster when the graph fits")
+    parser.add_argument("--parallel-workers", type=int, help="max_parallel_maintenance_workers for the build")
+    args = parser.parse_args()
+
+    if not settings.DB_CONNECTION_STRING:
+        print("DB_CONNECTION_STRING is not configured. Set it in .env or environment.")
+        sys.exit(1)
+
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            COMMANDS[args.command](cur, args)
+    except Exception as e:
+        print(f"Vector index command '{args.command}' failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
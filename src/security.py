@@ -11,6 +11,8 @@ from .services import user_service
 from .schemas import user as user_schema
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
+# Same scheme for endpoints that also serve anonymous callers
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -118,3 +120,17 @@ def get_admin_user(current_user: Customer = Depends(get_current_user)) -> Custom
             detail="Admin access required"
         )
     return current_user
+
+
+def get_request_role(token: Optional[str] = Depends(optional_oauth2_scheme)) -> str:
+    """
+    Role claim of the caller's access token, or "anonymous" without a valid one.
+    Only scopes shared work (e.g. coalesced AI queries); it does not authorize.
+    """
+    if not token:
+        return "anonymous"
+    try:
+        payload = verify_token(token, token_type="access")
+    except HTTPException:
+        return "anonymous"
+    return payload.get("role") or "anonymous"
@@ -0,0 +1,182 @@
+# src/services/ai_services.py
+
+import asyncio
+import time
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, List
+
+from ..config import settings
+from ..ai.embeddings import get_embeddings
+from ..ai.graph import _RAG_CHAINS, agent_graph, route_batch
+from ..ai.llm_scheduler import Priority, llm_priority
+from ..ai.response_cache import response_cache
+from ..ai.schemas.graph_state import AgentState
+from ..ai.single_flight import flight_key, single_flight
+
+# Graph nodes whose LLM tokens are not part of the user-facing answer.
+_SILENT_NODES = {"router"}
+
+
+async def _lookup_cached(query: str, role: str):
+    """The cached response (or None) and the query embedding to store a fresh answer under."""
+    if not settings.AI_CACHE_ENABLED:
+        return None, None
+
+    def lookup():
+        embedding = response_cache.embed(query)
+        return response_cache.lookup(query, role, embedding), embedding
+
+    return await asyncio.to_thread(lookup)
+
+
+async def _store_cached(query: str, final_response: str, started_at: float, role: str, embedding):
+    if settings.AI_CACHE_ENABLED and final_response:
+        await asyncio.to_thread(
+            response_cache.store, query, final_response, time.perf_counter() - started_at, role, embedding
+        )
+
+
+async def _run_graph(query: str, role: str, embedding=None):
+    start = time.perf_counter()
+    state = AgentState(initial_query=query, intermediate_steps=[])
+    result = await agent_graph.ainvoke(state)
+    final_response = result.get("final_response")
+    await _store_cached(query, final_response, start, role, embedding)
+    return final_response
+
+
+async def run_agent_query(query: str, role: str = "anonymous") -> str:
+    """
+    Answers a user query with the agent graph, serving semantically equivalent
+    repeat questions from the response cache. Identical queries from callers
+    with the same role that arrive while one is running share its graph run.
+
+    The role scopes both the cache and the coalescing, so one role's answer is
+    never served to another; it does not reach the graph itself.
+    """
+    cached, embedding = await _lookup_cached(query, role)
+    if cached is not None:
+        return cached
+
+    if settings.AI_SINGLE_FLIGHT_ENABLED:
+        final_response = await single_flight.run(
+            flight_key(query, role), lambda: _run_graph(query, role, embedding)
+        )
+    else:
+        final_response = await _run_graph(query, role, embedding)
+    return final_response or "No response generated"
+
+
+def _field(value: Any, name: str):
+    """Reads a field from a node output, which may be an AgentState or a plain dict."""
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+
+async def stream_agent_query(query: str, role: str = "anonymous") -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs the agent graph and yields progress events as they happen:
+    `route` once the router has decided, `tool_start`/`tool_end` around every tool
+    call made by the agent executors, `token` for each generated answer token and
+    a closing `final` event carrying the complete response. When an identical
+    query is already running, only the `final` event of that run is sent.
+    Cached and coalesced answers are scoped to the caller's role.
+    """
+    cached, embedding = await _lookup_cached(query, role)
+    if cached is not None:
+        yield {"event": "final", "data": {"response": cached, "cached": True}}
+        return
+
+    key = flight_key(query, role)
+    if settings.AI_SINGLE_FLIGHT_ENABLED and single_flight.in_flight(key):
+        final_response = await single_flight.run(key, lambda: _run_graph(query, role, embedding))
+        yield {
+            "event": "final",
+            "data": {"response": final_response or "No response generated", "cached": False, "coalesced": True},
+        }
+        return
+
+    flight = single_flight.lead(key) if settings.AI_SINGLE_FLIGHT_ENABLED else nullcontext()
+    with flight as result:
+        async for event in _stream_graph(query, result, role, embedding):
+            yield event
+
+
+async def _stream_graph(query: str, result, role: str, embedding=None) -> AsyncIterator[Dict[str, Any]]:
+    """The events of one streamed graph run; `result` (if any) receives the final answer."""
+    start = time.perf_counter()
+    state = AgentState(initial_query=query, intermediate_steps=[])
+    final_response = None
+
+    async for event in agent_graph.astream_events(state, version="v2"):
+        kind = event["event"]
+        name = event.get("name")
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chain_end" and name == "router" and node == "router":
+            yield {"event": "route", "data": {"agents": _field(event["data"].get("output"), "next_agents")}}
+        elif kind == "on_tool_start":
+            yield {"event": "tool_start", "data": {"tool": name, "input": event["data"].get("input")}}
+        elif kind == "on_tool_end":
+            yield {"event": "tool_end", "data": {"tool": name, "output": event["data"].get("output")}}
+        elif kind == "on_chat_model_stream" and node not in _SILENT_NODES:
+            content = event["data"]["chunk"].content
+            if content:
+                yield {"event": "token", "data": {"text": content, "agent": node}}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            # The outermost run finishing is the graph itself.
+            final_response = _field(event["data"].get("output"), "final_response")
+
+    await _store_cached(query, final_response, start, role, embedding)
+    if result is not None:
+        result.set_result(final_response)
+    yield {
+        "event": "final",
+        "data": {"response": final_response or "No response generated", "cached": False},
+    }
+
+
+async def run_agent_batch(queries: List[str]) -> List[Dict[str, Any]]:
+    """
+    Answers many independent queries. Routing happens once for the whole batch,
+    the queries bound for retrieval agents are embedded in a single `encode`
+    call, and at most `AI_BATCH_CONCURRENCY` graph runs are in flight at a time.
+    Results come back in input order; a failing item carries an `error` instead
+    of failing the batch.
+    """
+    with llm_priority(Priority.BATCH):
+        routes = await route_batch(queries)
+
+    retrieval_queries = [
+        query for query, agents in zip(queries, routes) if any(agent in _RAG_CHAINS for agent in agents)
+    ]
+    if retrieval_queries:
+        await asyncio.to_thread(get_embeddings().prime, retrieval_queries)
+
+    semaphore = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
+
+    async def run_one(index: int, query: str, agents: List[str]) -> Dict[str, Any]:
+        item = {"index": index, "query": query, "agents": agents, "response": None, "error": None}
+        async with semaphore:
+            try:
+                state = AgentState(initial_query=query, next_agents=agents, intermediate_steps=[])
+                # Interactive chat gets the LLM first when both are waiting.
+                with llm_priority(Priority.BATCH):
+                    result = await agent_graph.ainvoke(state)
+                item["response"] = result.get("final_response") or "No response generated"
+            except Exception as e:
+                item["error"] = str(e)
+        return item
+
+    return await asyncio.gather(
+        *(run_one(index, query, agents) for index, (query, agents) in enumerate(zip(queries, routes)))
+    )
+
+
+def invalidate_cached_answers(*entity_ids) -> int:
+    """
+    Drops cached AI answers that mention any of the given shipment, order,
+    vehicle or SKU IDs. Call this whenever those entities change.
+    """
+    return response_cache.invalidate_entities(entity_ids)
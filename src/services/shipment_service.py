@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session, joinedload
 from fastapi import HTTPException, status
 
 from .. import models
+from ..ai.response_cache import response_cache
+from ..ai.tools.tool_cache import tool_cache
 
 # Using your actual warehouse data
 WAREHOUSES = [
@@ -77,6 +79,10 @@ def create_shipment_for_order(db: Session, order_id: UUID):
     db.commit()
     db.refresh(db_shipment)
 
+    # 6. Cached AI answers and tool results about this order or vehicle are now stale
+    response_cache.invalidate_entities([order.order_id, vehicle.vehicle_id])
+    tool_cache.invalidate("order-details-lookup", order_id=order.order_id)
+
     return db_shipment
 
 
@@ -128,4 +134,11 @@ def update_shipment_status(db: Session, shipment_id: UUID, new_status: str, driv
     # 5. Commit the transaction
     db.commit()
     db.refresh(shipment)
+
+    # 6. Cached AI answers and tool results about this shipment, its order or its vehicle are now stale
+    response_cache.invalidate_entities([shipment.shipment_id, shipment.order_id, shipment.vehicle_id])
+    tool_cache.invalidate("shipment-status-lookup", shipment_id=shipment.shipment_id)
+    tool_cache.invalidate("shipment-tracking-lookup", shipment_id=shipment.shipment_id)
+    tool_cache.clear("bulk-shipment-tracking-lookup")
+    tool_cache.invalidate("order-details-lookup", order_id=shipment.order_id)
     return shipment
\ No newline at end of file
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session, joinedload
 from uuid import UUID
 from .. import models
+from ..ai.response_cache import response_cache
+from ..ai.tools.tool_cache import tool_cache
 from ..schemas import vehicle as vehicle_schema
 
 def get_all_vehicles(db: Session):
@@ -47,6 +49,7 @@ def update_vehicle(db: Session, vehicle_id: UUID, vehicle_update: vehicle_schema
         
     db.commit()
     db.refresh(db_vehicle)
+    response_cache.invalidate_entities([vehicle_id])
     return db_vehicle
 
 
@@ -60,4 +63,6 @@ def delete_vehicle(db: Session, vehicle_id: UUID):
         
     db.delete(db_vehicle)
     db.commit()
+    response_cache.invalidate_entities([vehicle_id])
+    tool_cache.invalidate("vehicle-location-lookup", vehicle_id=vehicle_id)
     return True
\ No newline at end of file
@@ -0,0 +1,17 @@
+-- Indexes backing the metadata filters of the RAG retrievers
+-- (DocumentFilter in src/ai/tools/vector_store.py).
+
+-- Pre-filter on source type, region and time window. When a filter is selective
+-- enough, the planner scans these rows and ranks them exactly instead of walking
+-- the ANN index.
+CREATE INDEX IF NOT EXISTS documents_source_region_ts_idx
+  ON public.documents (source_type, region_id, ts);
+
+-- Recent incident reports are the mobility agent's main source.
+CREATE INDEX IF NOT EXISTS documents_incident_report_ts_idx
+  ON public.documents (ts DESC)
+  WHERE source_type = 'incident_report';
+
+-- Partial ANN indexes for the per-agent source types are built with
+--   python -m src.scripts.manage_vector_index build --source-types incident_report,shipment
+--   python -m src.scripts.manage_vector_index build --source-types faq,policy
@@ -0,0 +1,3 @@
+-- Content hash of each chunk (sha256 of embedding model + text), written by
+-- src/scripts/ingest_documents.py so re-ingestion skips unchanged chunks.
+ALTER TABLE public.documents ADD COLUMN IF NOT EXISTS content_hash text;
@@ -0,0 +1,43 @@
+-- Shipment status plus the latest telemetry of its vehicle in one round trip,
+-- backing the shipment-tracking tools in src/ai/tools/database.py. Replaces a
+-- shipments lookup followed by an ORDER BY ts DESC LIMIT 1 over vehicle_telemetry.
+
+-- Latest reading per vehicle: the lateral join below is a single index probe.
+CREATE INDEX IF NOT EXISTS vehicle_telemetry_vehicle_ts_idx
+  ON public.vehicle_telemetry (vehicle_id, ts DESC);
+
+-- Takes one or many shipment IDs; unknown IDs are simply absent from the result.
+CREATE OR REPLACE FUNCTION get_shipment_tracking(shipment_ids UUID[])
+RETURNS TABLE (
+  shipment_id UUID,
+  status TEXT,
+  current_eta TIMESTAMPTZ,
+  expected_arrival TIMESTAMPTZ,
+  vehicle_id UUID,
+  lat FLOAT,
+  lon FLOAT,
+  speed_kmph NUMERIC,
+  fuel_pct NUMERIC,
+  telemetry_ts TIMESTAMPTZ
+) AS $$
+  SELECT
+    s.shipment_id,
+    s.status::TEXT,
+    s.current_eta,
+    s.expected_arrival,
+    s.vehicle_id,
+    t.lat,
+    t.lon,
+    t.speed_kmph,
+    t.fuel_pct,
+    t.ts AS telemetry_ts
+  FROM public.shipments s
+  LEFT JOIN LATERAL (
+    SELECT vt.lat, vt.lon, vt.speed_kmph, vt.fuel_pct, vt.ts
+    FROM public.vehicle_telemetry vt
+    WHERE vt.vehicle_id = s.vehicle_id
+    ORDER BY vt.ts DESC
+    LIMIT 1
+  ) t ON true
+  WHERE s.shipment_id = ANY(shipment_ids);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;